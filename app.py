@@ -1,9 +1,20 @@
 # app.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import asyncio
+import contextvars
+import functools
 import importlib
+import json
+import os
+import sys
+import threading
 from logger_config import logger
+from inference_scheduler import InferenceScheduler, SchedulerOverloaded
+from model_registry import registry
+import telemetry
 
 # Initialize FastAPI
 app = FastAPI(title="Voice Bot API", version="1.0")
@@ -13,6 +24,10 @@ class BotRequest(BaseModel):
     transcript: str
     metadata: Optional[Dict[str, Any]] = None
 
+class BotBatchRequest(BaseModel):
+    items: List[BotRequest]
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))
 
 try:
     main_bot = importlib.import_module("main_bot")
@@ -20,7 +35,60 @@ except Exception as e:
     main_bot = None
     logger.info(f"[error] Could not import main_bot: {e}")
 
+try:
+    streaming = importlib.import_module("streaming") if main_bot is not None else None
+except Exception as e:
+    streaming = None
+    logger.info(f"[error] Could not import streaming: {e}")
+
+# Micro-batching scheduler in front of the model pipeline
+SCHEDULER_ENABLED = os.getenv("BOT_SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TIMEOUT_S = float(os.getenv("BOT_SCHEDULER_TIMEOUT_S", "30"))
+
+scheduler = None
+if SCHEDULER_ENABLED and main_bot is not None and hasattr(main_bot, "process_batch"):
+    # CRM calls are made on the request threads, not on the scheduler's model worker
+    scheduler = InferenceScheduler(functools.partial(main_bot.process_batch, dispatch=False))
+
+
+# Load and warm the models in the background so the process answers /healthz immediately
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1"
+
+
+def preload_models():
+    # retried with backoff: a model that fails at startup must not leave /readyz at 503 for good
+    registry.preload(main_bot.warmup if main_bot is not None and hasattr(main_bot, "warmup") else None)
+
+
+@app.on_event("startup")
+def start_model_preload():
+    if MODEL_PRELOAD:
+        threading.Thread(target=preload_models, name="model-preload", daemon=True).start()
+    else:
+        # models load (and are retried) on first use: readiness does not wait for them
+        registry.lazy = True
+
+
+@app.on_event("startup")
+def start_scheduler():
+    if scheduler is not None:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    if scheduler is not None:
+        scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def close_crm_client():
+    if main_bot is not None and hasattr(main_bot, "crm_client"):
+        main_bot.crm_client.close()
+        await main_bot.crm_client.aclose()
+
 def format_error(error_type: str, details: str, status_code: int = 500):
+    telemetry.ERRORS.inc(error_type)
     return {
         "intent": "UNKNOWN",
         "error": {
@@ -30,8 +98,29 @@ def format_error(error_type: str, details: str, status_code: int = 500):
     }, status_code
 
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: every required model is loaded and the warmup pass has run (lazy mode: no required model is failing)."""
+    report = registry.report()
+    if main_bot is None:
+        report["ready"] = False
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/models")
+def models_report():
+    """Per-model load state and load time."""
+    return registry.report()
+
+
 @app.post("/bot/handle")
-def handle_bot(req: BotRequest):
+def handle_bot(req: BotRequest, response: Response):
     """
     POST endpoint to handle user transcript and return model output.
     """
@@ -58,7 +147,29 @@ def handle_bot(req: BotRequest):
     #Prepare payload
     payload = {"transcript": req.transcript, "metadata": req.metadata or {}}
     try:
-        result = main_bot.process_request(payload)
+        with telemetry.traced() as timings:
+            # Repeated transcripts skip the scheduler's batching window entirely
+            # (a miss here is counted by the pipeline's own lookup)
+            cached = main_bot.cached_result(payload, count_miss=False) if hasattr(main_bot, "cached_result") else None
+            if cached is not None:
+                result = main_bot.dispatch_crm(cached)
+            elif scheduler is not None and scheduler.running:
+                future = scheduler.submit(payload)
+                result = future.result(timeout=SCHEDULER_TIMEOUT_S)
+                # The batch ran on a scheduler worker thread: its breakdown travels on the future
+                timings.update(getattr(future, "stage_timings", {}))
+                # process_batch reports pipeline failures per item instead of raising
+                if isinstance(result, dict) and result.get("error", {}).get("type") == "PARSING_ERROR":
+                    raise HTTPException(status_code=500, detail=result)
+                result = main_bot.dispatch_crm(result)
+            else:
+                result = main_bot.process_request(payload)
+        response.headers["Server-Timing"] = telemetry.server_timing(timings)
+    except HTTPException:
+        raise
+    except SchedulerOverloaded as e:
+        error, code = format_error("OVERLOADED", str(e), 503)
+        raise HTTPException(status_code=code, detail=error)
     except Exception as e:
         error, code = format_error("CRM_ERROR", f"Error running model pipeline: {str(e)}", 500)
         raise HTTPException(status_code=code, detail=error)
@@ -70,3 +181,245 @@ def handle_bot(req: BotRequest):
         raise HTTPException(status_code=code, detail=error)
     
     return result
+
+
+@app.post("/bot/handle/async")
+async def handle_bot_async(req: BotRequest, response: Response):
+    """
+    POST endpoint running the concurrent pipeline, with per-stage timeouts: the rule-based
+    extractors run alongside intent scoring, and the model-backed ones (NER, status) start once
+    the intent's extraction plan needs them. Same response shape as /bot/handle.
+    """
+
+    logger.info(f"[API] /bot/handle/async called by user_id={(req.metadata or {}).get('user_id', 'unknown')}")
+
+    if not req.transcript or not isinstance(req.transcript, str):
+        error, code = format_error(
+            "VALIDATION_ERROR",
+            "Invalid input format. Expected {'transcript': <string>, 'metadata': {'user_id': 'optional'}}.",
+            400
+        )
+        raise HTTPException(status_code=code, detail=error)
+
+    if main_bot is None or not hasattr(main_bot, "process_request_async"):
+        error, code = format_error(
+            "PARSING_ERROR",
+            "main_bot.process_request_async() missing or not importable. Verify main_bot.py exists.",
+            500
+        )
+        raise HTTPException(status_code=code, detail=error)
+
+    payload = {"transcript": req.transcript, "metadata": req.metadata or {}}
+    try:
+        with telemetry.traced() as timings:
+            result = await main_bot.process_request_async(payload)
+        response.headers["Server-Timing"] = telemetry.server_timing(timings)
+    except Exception as e:
+        error, code = format_error("CRM_ERROR", f"Error running model pipeline: {str(e)}", 500)
+        raise HTTPException(status_code=code, detail=error)
+
+    if not isinstance(result, dict):
+        error, code = format_error("PARSING_ERROR", "Model returned invalid output format (expected dict).", 500)
+        raise HTTPException(status_code=code, detail=error)
+
+    return result
+
+
+@app.post("/bot/handle/batch")
+def handle_bot_batch(req: BotBatchRequest, response: Response):
+    """
+    POST endpoint to handle many transcripts in one call (e.g. draining queued voicemails).
+    Returns {"results": [...]} with one result or per-item error per input, in input order.
+    """
+
+    logger.info(f"[API] /bot/handle/batch called with {len(req.items)} items")
+
+    if not req.items or len(req.items) > BATCH_MAX_ITEMS:
+        error, code = format_error(
+            "VALIDATION_ERROR",
+            f"Invalid batch size. Expected 1 to {BATCH_MAX_ITEMS} items of {{'transcript': <string>, 'metadata': {{...}}}}.",
+            400
+        )
+        raise HTTPException(status_code=code, detail=error)
+
+    if main_bot is None or not hasattr(main_bot, "process_batch"):
+        error, code = format_error(
+            "PARSING_ERROR",
+            "main_bot.process_batch() missing or not importable. Verify main_bot.py exists.",
+            500
+        )
+        raise HTTPException(status_code=code, detail=error)
+
+    payloads = [{"transcript": item.transcript, "metadata": item.metadata or {}} for item in req.items]
+    try:
+        with telemetry.traced() as timings:
+            results = main_bot.process_batch(payloads)
+        response.headers["Server-Timing"] = telemetry.server_timing(timings)
+    except Exception as e:
+        error, code = format_error("CRM_ERROR", f"Error running model pipeline: {str(e)}", 500)
+        raise HTTPException(status_code=code, detail=error)
+
+    return {"results": results}
+
+
+@app.websocket("/bot/stream")
+async def handle_bot_stream(websocket: WebSocket):
+    """
+    Streaming endpoint for live calls. Send partial STT hypotheses as
+    {"transcript": ..., "final": false, "metadata": {...}}; each changed hypothesis
+    yields an "interim" event (plus "intent_committed" once the intent is stable),
+    and the final hypothesis yields a "final" event with the /bot/handle result.
+    When partials arrive faster than they are processed, only the newest is processed.
+    """
+    await websocket.accept()
+    logger.info("[API] /bot/stream connected")
+    if streaming is None:
+        error, _ = format_error("PARSING_ERROR", "streaming / main_bot missing or not importable.", 500)
+        await websocket.send_json({"event": "error", **error})
+        await websocket.close(code=1011)
+        return
+
+    session = streaming.StreamSession()
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    async def read():
+        try:
+            while True:
+                await inbox.put(await websocket.receive_text())
+        except WebSocketDisconnect:
+            await inbox.put(None)
+        except Exception as e:
+            # e.g. a binary frame (KeyError): hand the failure to the loop below, which closes the socket
+            await inbox.put(e)
+
+    def parse(raw: str):
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            msg = None
+        if not isinstance(msg, dict) or not isinstance(msg.get("transcript"), str):
+            return None
+        return msg
+
+    async def run(fn, *args):
+        # blocking pipeline work on the threadpool, inside this request's context
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(None, ctx.run, fn, *args)
+
+    reader = asyncio.ensure_future(read())
+    read_error: Optional[Exception] = None
+    try:
+        closed = False
+        while not closed:
+            raw = await inbox.get()
+            if raw is None or isinstance(raw, Exception):
+                read_error = raw
+                break
+            msg = parse(raw)
+            # coalesce: skip stale partials, but never skip past a final or an invalid message
+            while msg is not None and not msg.get("final") and not inbox.empty():
+                nxt = inbox.get_nowait()
+                if nxt is None or isinstance(nxt, Exception):
+                    closed, read_error = True, nxt
+                    break
+                streaming.STREAM_UPDATES.inc("coalesced")
+                msg = parse(nxt)
+
+            if msg is None:
+                error, _ = format_error(
+                    "VALIDATION_ERROR",
+                    "Invalid message. Expected {'transcript': <string>, 'final': <bool>, 'metadata': {...}}.",
+                    400
+                )
+                await websocket.send_json({"event": "error", **error})
+                continue
+            if isinstance(msg.get("metadata"), dict):
+                session.metadata = msg["metadata"]
+
+            try:
+                if msg.get("final"):
+                    await websocket.send_json(await run(session.finish, msg["transcript"]))
+                else:
+                    for event in await run(session.feed, msg["transcript"]):
+                        await websocket.send_json(event)
+            except WebSocketDisconnect:
+                break
+            except Exception as e:
+                error, _ = format_error("PARSING_ERROR", f"Error running model pipeline: {str(e)}", 500)
+                await websocket.send_json({"event": "error", **error})
+                session.reset()
+
+        if read_error is not None:
+            logger.info(f"[API] /bot/stream could not read a message: {type(read_error).__name__}: {read_error}")
+            error, _ = format_error("VALIDATION_ERROR", "Unreadable message (send JSON text frames). Closing the stream.", 400)
+            try:
+                await websocket.send_json({"event": "error", **error})
+                await websocket.close(code=1003)
+            except Exception:
+                pass  # the socket is already gone
+    finally:
+        reader.cancel()
+        logger.info("[API] /bot/stream disconnected")
+
+
+@app.get("/bot/scheduler/stats")
+def scheduler_stats():
+    """Batch-size distribution and queueing delay of the micro-batching scheduler."""
+    if scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, "running": scheduler.running, **scheduler.stats()}
+
+
+@app.get("/bot/crm/stats")
+def crm_stats():
+    """CRM dispatch target and circuit-breaker state."""
+    if main_bot is None or not hasattr(main_bot, "crm_client"):
+        return {"enabled": False}
+    return main_bot.crm_client.stats()
+
+
+@app.get("/bot/cache/stats")
+def cache_stats():
+    """Response-cache size, hit ratio, evictions and expirations."""
+    if main_bot is None or not hasattr(main_bot, "response_cache"):
+        return {"enabled": False}
+    return main_bot.response_cache.stats()
+
+
+# Values owned by other components, read at scrape time
+def collect_runtime_metrics():
+    families = []
+    if main_bot is not None and hasattr(main_bot, "response_cache"):
+        stats = main_bot.response_cache.stats()
+        for key in ("hits", "misses", "evictions", "expirations"):
+            families.append((f"bot_response_cache_{key}_total", "counter", f"Response-cache {key}.", [({}, stats[key])]))
+        families.append(("bot_response_cache_size", "gauge", "Response-cache entries.", [({}, stats["size"])]))
+    knn = sys.modules.get("intent_transformer_knn")
+    if knn is not None:
+        stats = knn.embedding_cache.stats()
+        for key in ("hits", "misses"):
+            families.append((f"bot_embedding_cache_{key}_total", "counter", f"Embedding-cache {key}.", [({}, stats[key])]))
+    extractors = sys.modules.get("extract_entities_tools")
+    if extractors is not None:
+        paths = extractors.datetime_path_stats()
+        families.append(("bot_datetime_path_total", "counter", "Extracted dates by resolving path.", [({"path": p}, n) for p, n in paths.items()]))
+    if scheduler is not None:
+        stats = scheduler.stats()
+        families.append(("bot_scheduler_queue_depth", "gauge", "Requests waiting for a micro-batch.", [({}, stats["queue_depth"])]))
+        families.append(("bot_scheduler_rejected_total", "counter", "Requests rejected with a full queue.", [({}, stats["rejected"])]))
+        families.append(("bot_scheduler_failed_batches_total", "counter", "Micro-batches that raised.", [({}, stats["failed_batches"])]))
+    if main_bot is not None and hasattr(main_bot, "crm_client"):
+        crm = main_bot.crm_client.stats()
+        families.append(("bot_crm_circuit_open", "gauge", "1 while the CRM circuit breaker is open or half-open.", [({}, int(crm["circuit"] != "closed"))]))
+    models = registry.report()["models"]
+    families.append(("bot_model_loaded", "gauge", "1 if the model is loaded.", [({"model": n}, int(m["state"] == "loaded")) for n, m in models.items()]))
+    return families
+
+
+telemetry.metrics.register_collector(collect_runtime_metrics)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus exposition: stage histograms, intent / error counters, cache and scheduler state."""
+    return PlainTextResponse(telemetry.metrics.render(), media_type=telemetry.CONTENT_TYPE)
@@ -0,0 +1,254 @@
+# benchmark.py
+"""
+Latency / throughput / memory benchmark for the bot pipeline on a fixed transcript corpus.
+
+    python benchmark.py run --out benchmarks/baseline.json            # record a baseline
+    python benchmark.py run --out benchmarks/current.json
+    python benchmark.py compare benchmarks/baseline.json benchmarks/current.json --threshold 0.2
+
+Stages: encode, knn, regex, ner, phone, datetime, dateparser, status, zero_shot
+(BART, only with --zero-shot or when the status backend uses it), validation and
+the full request. compare exits with status 1 when a stage's p50 or p95 latency,
+the throughput or the peak RSS regresses past the threshold.
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REPEAT = 5
+DEFAULT_BATCH_SIZE = 16
+NOISE_FLOOR_MS = 0.05  # absolute slowdowns below this are never reported as regressions
+
+
+def load_corpus(path: Optional[str] = None) -> List[str]:
+    """Transcripts from a JSON list or a one-per-line text file; the sample corpus by default."""
+    if not path:
+        from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+        return list(SAMPLE_TRANSCRIPTS)
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return [item["transcript"] if isinstance(item, dict) else str(item) for item in json.loads(content)]
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(arr.size),
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+    }
+
+
+def time_stage(fn: Callable[[str], object], corpus: List[str], repeat: int) -> dict:
+    """Per-call latency of fn over the corpus, after one untimed warmup pass."""
+    for text in corpus:
+        fn(text)
+    samples = []
+    for _ in range(repeat):
+        for text in corpus:
+            start = time.perf_counter()
+            fn(text)
+            samples.append((time.perf_counter() - start) * 1000.0)
+    return summarize(samples)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(corpus: List[str], repeat: int = DEFAULT_REPEAT, batch_size: int = DEFAULT_BATCH_SIZE, zero_shot: bool = False) -> dict:
+    # Imported here so model-load time and RSS are measured from a cold pipeline
+    import_start = time.perf_counter()
+    import intent_transformer_knn as knn
+    import extract_entities_tools as ext
+    import main_bot
+    import status_prototypes
+    from model_registry import registry
+    from syntheticData.regex_parser import regex_score
+    from transcript_analysis import analyze, find_phones
+    from validators.validate_output import validate_intent_output
+    import_s = time.perf_counter() - import_start
+
+    load_start = time.perf_counter()
+    registry.load_all()
+    load_s = time.perf_counter() - load_start
+    if zero_shot or status_prototypes.uses_zero_shot():
+        registry.load_all(["status_classifier"])
+        zero_shot = registry.is_loaded("status_classifier")
+
+    # The caches would turn every repeat into a hit: measure the uncached pipeline
+    knn.embedding_cache.maxsize = 0
+    knn.embedding_cache.clear()
+    main_bot.response_cache.maxsize = 0
+    main_bot.response_cache.clear()
+    # No CRM calls either: a run must not write leads, and CRM latency is not pipeline time
+
+    encoder = knn.get_encoder()
+    index = knn.get_intent_index()
+    ner = registry.get("ner")
+    embs = {t: encoder.encode([t], normalize_embeddings=True) for t in corpus}
+    results = {t: main_bot.process_request({"transcript": t, "metadata": {"user_id": "bench"}}, dispatch=False) for t in corpus}
+
+    stages: Dict[str, Callable[[str], object]] = {
+        "encode": lambda t: encoder.encode([t], normalize_embeddings=True),
+        "knn": lambda t: index.score(embs[t]),
+        "regex": lambda t: regex_score(t, per_match_score=0.5, max_per_intent=2.0),
+        "phone": lambda t: find_phones(t),
+        "datetime": lambda t: ext.extract_datetime(t),
+        "dateparser": lambda t: ext.search_dates(analyze(t).masked, languages=ext.DATEPARSER_LANGUAGES, settings=ext.DATEPARSER_SETTINGS),
+        "status": lambda t: status_prototypes.classify_status(t),
+        "validation": lambda t: validate_intent_output(results[t]),
+        "request": lambda t: main_bot.process_request({"transcript": t, "metadata": {"user_id": "bench"}}, dispatch=False),
+    }
+    if ner is not None:
+        stages["ner"] = lambda t: ner(t)
+    if zero_shot:
+        zs = registry.get("status_classifier")
+        stages["zero_shot"] = lambda t: zs(t, candidate_labels=status_prototypes.STATUS_LABELS)
+
+    report_stages = {name: time_stage(fn, corpus, repeat) for name, fn in stages.items()}
+
+    # Throughput: sequential single requests vs. process_batch chunks
+    n_requests = len(corpus) * repeat
+    items = [{"transcript": corpus[i % len(corpus)], "metadata": {"user_id": "bench"}} for i in range(n_requests)]
+    start = time.perf_counter()
+    for item in items:
+        main_bot.process_request(item, dispatch=False)
+    single_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(0, n_requests, batch_size):
+        main_bot.process_batch(items[i:i + batch_size], dispatch=False)
+    batched_s = time.perf_counter() - start
+
+    models = registry.report()["models"]
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus_size": len(corpus),
+            "repeat": repeat,
+            "config": {
+                key: os.getenv(key)
+                for key in ("EMBED_BACKEND", "NLP_QUANTIZE", "STATUS_BACKEND", "TORCH_INTRA_OP_THREADS", "BOT_STUB_MODELS")
+            },
+        },
+        "stages": report_stages,
+        "throughput": {
+            "requests": n_requests,
+            "single_rps": n_requests / single_s,
+            "batched_rps": n_requests / batched_s,
+            "batch_size": batch_size,
+        },
+        "model_load": {
+            "import_s": import_s,
+            "load_all_s": load_s,
+            "models": {name: m["load_time_s"] for name, m in models.items() if m["state"] == "loaded"},
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, noise_floor_ms: float = NOISE_FLOOR_MS) -> List[dict]:
+    """Rows of (metric, baseline, current, change, regressed); higher-is-worse except throughput.
+    A baseline stage absent from the current report is a regressed "<stage>.missing" row."""
+    rows = []
+
+    def row(metric, base, cur, higher_is_better=False, floor=0.0):
+        if base is None or cur is None:
+            return
+        change = (cur - base) / base if base else 0.0
+        worse = -change if higher_is_better else change
+        regressed = worse > threshold and abs(cur - base) > floor
+        rows.append({"metric": metric, "baseline": base, "current": cur, "change": change, "regressed": regressed})
+
+    for stage, base in baseline.get("stages", {}).items():
+        cur = current.get("stages", {}).get(stage)
+        if cur is None:
+            # a stage that stopped reporting is a regression, not a skipped row
+            rows.append({"metric": f"{stage}.missing", "baseline": base["p50_ms"], "current": None, "change": None, "regressed": True})
+            continue
+        for stat in ("p50_ms", "p95_ms"):
+            row(f"{stage}.{stat}", base[stat], cur[stat], floor=noise_floor_ms)
+        row(f"{stage}.p99_ms", base["p99_ms"], cur["p99_ms"], floor=float("inf"))  # reported, never gating
+
+    for key in ("single_rps", "batched_rps"):
+        row(f"throughput.{key}", baseline.get("throughput", {}).get(key), current.get("throughput", {}).get(key), higher_is_better=True)
+    row("peak_rss_mb", baseline.get("peak_rss_mb"), current.get("peak_rss_mb"))
+    return rows
+
+
+def print_rows(rows: List[dict]) -> None:
+    print(f"{'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for r in rows:
+        flag = "  REGRESSED" if r["regressed"] else ""
+        if r["current"] is None:
+            print(f"{r['metric']:<28} {r['baseline']:>12.3f} {'missing':>12} {'':>9}{flag}")
+            continue
+        print(f"{r['metric']:<28} {r['baseline']:>12.3f} {r['current']:>12.3f} {r['change']:>+8.1%}{flag}")
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Pipeline latency / throughput / memory benchmark")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="Benchmark the pipeline and write a JSON report")
+    run.add_argument("--out", default=None, help="Write the report here (default: stdout only)")
+    run.add_argument("--corpus", default=None, help="JSON list or one-transcript-per-line file (default: sample transcripts)")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    run.add_argument("--zero-shot", action="store_true", help="Also load and time the BART zero-shot classifier")
+    cmp = sub.add_parser("compare", help="Compare a report against a baseline; exit 1 on regression")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown (default 0.2 = 20%%)")
+    cmp.add_argument("--noise-floor-ms", type=float, default=NOISE_FLOOR_MS)
+    args = p.parse_args()
+
+    if args.cmd == "run":
+        report = run_benchmark(load_corpus(args.corpus), repeat=args.repeat, batch_size=args.batch_size, zero_shot=args.zero_shot)
+        text = json.dumps(report, indent=2)
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        print(text)
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        rows = compare(baseline, current, threshold=args.threshold, noise_floor_ms=args.noise_floor_ms)
+        print_rows(rows)
+        regressed = [r["metric"] for r in rows if r["regressed"]]
+        if regressed:
+            print(f"\nRegressed past {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+        print("\nNo regressions.")
@@ -0,0 +1,338 @@
+# crm_client.py
+"""
+CRM dispatch: turns a validated bot result into the matching mock_crm call.
+
+    LEAD_CREATE     POST /crm/leads
+    VISIT_SCHEDULE  POST /crm/visits
+    LEAD_UPDATE     POST /crm/leads/{lead_id}/status
+
+Spoken short lead ids ("7b1b8f54", "8f2a") are first resolved to the full id
+with GET /crm/leads/resolve; a prefix matching no lead or several leads stops
+the dispatch and is reported in crm_call instead.
+
+Calls go through pooled keep-alive httpx clients (one sync, one async) with
+connect/read timeouts, bounded retries with full-jitter backoff and a
+circuit breaker that fails fast while the CRM is down. Dispatch is off until
+CRM_BASE_URL is set.
+
+    CRM_BASE_URL=                 e.g. http://127.0.0.1:8001 (empty: no CRM calls)
+    CRM_CONNECT_TIMEOUT_S=1.0     CRM_READ_TIMEOUT_S=3.0
+    CRM_MAX_RETRIES=2             retries after the first attempt
+    CRM_BACKOFF_BASE_S=0.05       CRM_BACKOFF_MAX_S=1.0
+    CRM_POOL_SIZE=32              keep-alive connections per client
+    CRM_BREAKER_FAILURES=5        consecutive failures that open the circuit
+    CRM_BREAKER_RESET_S=30        open time before a single probe call is let through
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from logger_config import logger
+import telemetry
+
+CRM_BASE_URL = os.getenv("CRM_BASE_URL", "").rstrip("/")
+CRM_CONNECT_TIMEOUT_S = float(os.getenv("CRM_CONNECT_TIMEOUT_S", "1.0"))
+CRM_READ_TIMEOUT_S = float(os.getenv("CRM_READ_TIMEOUT_S", "3.0"))
+CRM_MAX_RETRIES = int(os.getenv("CRM_MAX_RETRIES", "2"))
+CRM_BACKOFF_BASE_S = float(os.getenv("CRM_BACKOFF_BASE_S", "0.05"))
+CRM_BACKOFF_MAX_S = float(os.getenv("CRM_BACKOFF_MAX_S", "1.0"))
+CRM_POOL_SIZE = int(os.getenv("CRM_POOL_SIZE", "32"))
+CRM_BREAKER_FAILURES = int(os.getenv("CRM_BREAKER_FAILURES", "5"))
+CRM_BREAKER_RESET_S = float(os.getenv("CRM_BREAKER_RESET_S", "30"))
+
+# Statuses worth another attempt: the CRM is shedding load or briefly unavailable
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Intents addressing an existing lead, and what a full lead id looks like
+LEAD_ID_INTENTS = ("VISIT_SCHEDULE", "LEAD_UPDATE")
+_FULL_LEAD_ID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+CRM_CALLS = telemetry.metrics.counter("bot_crm_calls_total", "CRM calls by operation and outcome (status code or error).", ("operation", "outcome"))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the CRM while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open after N failures -> half-open probe after reset_s."""
+
+    def __init__(self, failure_threshold: int = CRM_BREAKER_FAILURES, reset_s: float = CRM_BREAKER_RESET_S, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_s = reset_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_s:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True  # exactly one probe at a time
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("[CRM] Circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.info(f"[CRM] Circuit opened after {self.failures} consecutive failure(s)")
+                self.state = "open"
+                self.opened_at = self._clock()
+
+
+def build_request(intent: str, entities: Dict[str, Any]) -> Optional[Tuple[str, str, str, dict, bool]]:
+    """(operation, method, path, json body, idempotent) for a validated result; None if nothing to call."""
+    entities = entities or {}
+    if intent == "LEAD_CREATE":
+        body = {k: entities.get(k) for k in ("name", "phone", "city", "source")}
+        return "create_lead", "POST", "/crm/leads", body, False
+    if intent == "VISIT_SCHEDULE" and entities.get("lead_id"):
+        body = {"lead_id": entities["lead_id"], "visit_time": entities.get("visit_time")}
+        return "schedule_visit", "POST", "/crm/visits", body, False
+    if intent == "LEAD_UPDATE" and entities.get("lead_id"):
+        body = {"status": entities.get("status")}
+        return "update_status", "POST", f"/crm/leads/{entities['lead_id']}/status", body, True
+    return None
+
+
+def _short_lead_id(intent: str, entities: Dict[str, Any]) -> Optional[str]:
+    """The lead id to resolve first, if the intent addresses a lead by a partial id."""
+    lead_id = (entities or {}).get("lead_id")
+    if intent not in LEAD_ID_INTENTS or not lead_id:
+        return None
+    lead_id = lead_id.lower()
+    return None if _FULL_LEAD_ID_RE.match(lead_id) else lead_id
+
+
+def _resolve_request(prefix: str) -> Tuple[str, str, str, None, bool]:
+    return "resolve_lead", "GET", f"/crm/leads/resolve?prefix={quote(prefix)}", None, True
+
+
+def _resolved(call: dict, prefix: str) -> Optional[dict]:
+    """lead_resolution for a successful resolve call; otherwise None (and call carries a readable error)."""
+    body = call.get("response")
+    if call.get("status_code") == 200 and isinstance(body, dict) and body.get("lead_id"):
+        return {"prefix": prefix, "lead_id": body["lead_id"], "latency_ms": call["latency_ms"]}
+    detail = body.get("detail") if isinstance(body, dict) else None
+    reason = detail.get("reason") if isinstance(detail, dict) else None
+    if reason == "ambiguous":
+        call["error"] = f"lead id '{prefix}' matches several leads: {', '.join(detail['candidates'])}"
+    elif reason == "not_found":
+        call["error"] = f"no lead matches id '{prefix}'"
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0.0, min(CRM_BACKOFF_MAX_S, CRM_BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def _retryable(exc: Optional[Exception], status: Optional[int], idempotent: bool) -> bool:
+    if exc is None:
+        return status in RETRY_STATUSES
+    # Nothing reached the CRM: always safe to resend
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    # The CRM may have applied the request: only resend idempotent calls
+    return idempotent and isinstance(exc, (httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.ReadError))
+
+
+class CRMClient:
+    """Pooled sync + async CRM client sharing one circuit breaker."""
+
+    def __init__(
+        self,
+        base_url: str = CRM_BASE_URL,
+        max_retries: int = CRM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None,
+        sync_client: Optional[httpx.Client] = None,
+        async_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(0, max_retries)
+        self.breaker = breaker or CircuitBreaker()
+        self._sync_client = sync_client
+        self._async_client = async_client
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url) or self._sync_client is not None or self._async_client is not None
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(CRM_READ_TIMEOUT_S, connect=CRM_CONNECT_TIMEOUT_S),
+            "limits": httpx.Limits(max_connections=CRM_POOL_SIZE, max_keepalive_connections=CRM_POOL_SIZE),
+        }
+
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(**self._client_kwargs())
+        return self._sync_client
+
+    def async_client(self) -> httpx.AsyncClient:
+        # created lazily inside the running loop that uses it
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_kwargs())
+        return self._async_client
+
+    def close(self) -> None:
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    # outcome of one logical call (all attempts)
+    def _result(self, operation, method, path, start, attempts, status=None, body=None, error=None) -> dict:
+        latency_s = time.perf_counter() - start
+        telemetry.record("crm", latency_s)
+        outcome = str(status) if status is not None else (type(error).__name__ if error is not None else "unknown")
+        CRM_CALLS.inc(operation, outcome)
+        out = {
+            "endpoint": path,
+            "method": method,
+            "status_code": status,
+            "latency_ms": round(latency_s * 1000.0, 2),
+            "attempts": attempts,
+        }
+        if body is not None:
+            out["response"] = body
+        if error is not None:
+            out["error"] = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        return out
+
+    def _settle(self, status: Optional[int], exc: Optional[Exception]) -> None:
+        # 4xx is the CRM answering normally (bad or unknown input), not the CRM failing
+        if exc is None and status is not None and status < 500:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    @staticmethod
+    def _body(resp: httpx.Response):
+        try:
+            return resp.json()
+        except ValueError:
+            return resp.text or None
+
+    def call(self, operation: str, method: str, path: str, body: dict, idempotent: bool = False) -> dict:
+        start = time.perf_counter()
+        attempts, status, exc, resp = 0, None, None, None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                if attempts:
+                    # opened by our own failed attempt: report what that attempt got
+                    break
+                return self._result(operation, method, path, start, attempts, error=CircuitOpen("CRM circuit is open"))
+            attempts += 1
+            try:
+                resp = self.sync_client().request(method, path, json=body)
+                status, exc = resp.status_code, None
+            except httpx.HTTPError as e:
+                status, exc, resp = None, e, None
+            self._settle(status, exc)
+            if attempt == self.max_retries or not _retryable(exc, status, idempotent):
+                break
+            time.sleep(_backoff(attempt))
+        return self._result(operation, method, path, start, attempts, status, self._body(resp) if resp is not None else None, exc)
+
+    async def acall(self, operation: str, method: str, path: str, body: dict, idempotent: bool = False) -> dict:
+        start = time.perf_counter()
+        attempts, status, exc, resp = 0, None, None, None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                if attempts:
+                    # opened by our own failed attempt: report what that attempt got
+                    break
+                return self._result(operation, method, path, start, attempts, error=CircuitOpen("CRM circuit is open"))
+            attempts += 1
+            try:
+                resp = await self.async_client().request(method, path, json=body)
+                status, exc = resp.status_code, None
+            except httpx.HTTPError as e:
+                status, exc, resp = None, e, None
+            self._settle(status, exc)
+            if attempt == self.max_retries or not _retryable(exc, status, idempotent):
+                break
+            await asyncio.sleep(_backoff(attempt))
+        return self._result(operation, method, path, start, attempts, status, self._body(resp) if resp is not None else None, exc)
+
+    def dispatch(self, intent: str, entities: Dict[str, Any]) -> Optional[dict]:
+        """crm_call for a validated result, or None when the intent needs no CRM call."""
+        resolution = None
+        prefix = _short_lead_id(intent, entities)
+        if prefix is not None:
+            found = self.call(*_resolve_request(prefix))
+            resolution = _resolved(found, prefix)
+            if resolution is None:
+                return found
+            entities = {**entities, "lead_id": resolution["lead_id"]}
+        request = build_request(intent, entities)
+        if request is None:
+            return None
+        crm_call = self.call(*request)
+        if resolution is not None:
+            crm_call["lead_resolution"] = resolution
+        return crm_call
+
+    async def adispatch(self, intent: str, entities: Dict[str, Any]) -> Optional[dict]:
+        resolution = None
+        prefix = _short_lead_id(intent, entities)
+        if prefix is not None:
+            found = await self.acall(*_resolve_request(prefix))
+            resolution = _resolved(found, prefix)
+            if resolution is None:
+                return found
+            entities = {**entities, "lead_id": resolution["lead_id"]}
+        request = build_request(intent, entities)
+        if request is None:
+            return None
+        crm_call = await self.acall(*request)
+        if resolution is not None:
+            crm_call["lead_resolution"] = resolution
+        return crm_call
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "base_url": self.base_url or None,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+# Process-wide client used by main_bot
+crm_client = CRMClient()
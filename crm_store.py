@@ -0,0 +1,774 @@
+# crm_store.py
+"""
+Storage backends for mock_crm.
+
+    CRM_STORE=sqlite                          (default) persistent, shared by every worker
+    CRM_STORE=memory                          per-process, for tests
+    CRM_DB_PATH=<repo>/artifacts/mock_crm.db
+
+Both backends keep secondary indexes on phone, city, status and visit time
+and page with opaque keyset cursors, so a filtered page costs O(log n + page)
+at any table size instead of an OFFSET scan. SQLite runs in WAL mode (readers
+never block the writer) with one connection per thread; the fixed SQL strings
+below are compiled once per connection by sqlite3's statement cache.
+
+create_or_match() is the deduplicating create: a lead with the same phone
+(exact hash / index lookup on the normalized E.164 number), or with a name
+similar to one in the same city (character-trigram Jaccard over an inverted
+index) when one of the two has no phone, is returned instead of inserting a
+new one. A similar name with a different phone is still created, and the
+match comes back as a possible duplicate. Only the rarest few
+trigrams of the name are probed (prefix filtering: any name above the
+threshold must share one of them), so a check reads a handful of short
+posting lists no matter how many leads are stored.
+
+    CRM_DEDUP_NAME_THRESHOLD=0.7   trigram Jaccard for a name + city match
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+BASE_DIR = os.path.dirname(__file__)
+CRM_STORE = os.getenv("CRM_STORE", "sqlite")
+CRM_DB_PATH = os.getenv("CRM_DB_PATH", os.path.join(BASE_DIR, "artifacts", "mock_crm.db"))
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Shortest lead-id prefix accepted for resolution, and how many candidates an ambiguous prefix reports
+MIN_PREFIX_LEN = 4
+MAX_PREFIX_CANDIDATES = 5
+
+# Duplicate detection: name similarity threshold and a bound on the names scored per check
+DEDUP_NAME_THRESHOLD = float(os.getenv("CRM_DEDUP_NAME_THRESHOLD", "0.7"))
+DEDUP_POSTING_LIMIT = 128  # newest postings read per probed trigram (duplicates are usually recent)
+DEDUP_MAX_CANDIDATES = 16  # best-ranked (most shared trigrams) names scored per check
+
+# Above this many leads per insert, append + re-sort the id index instead of one insort per id
+_BULK_RESORT_MIN = 64
+
+LEAD_FIELDS = ("lead_id", "name", "phone", "city", "source", "status", "notes", "created_at")
+VISIT_FIELDS = ("visit_id", "lead_id", "visit_time", "notes", "status", "created_at")
+
+# Page = (items, next_cursor or None)
+Page = Tuple[List[Dict[str, Any]], Optional[str]]
+
+
+class InvalidCursor(ValueError):
+    """Cursor that was not produced by this store."""
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return max(1, min(MAX_PAGE_SIZE, limit or DEFAULT_PAGE_SIZE))
+
+
+_PHONE_JUNK_RE = re.compile(r"[^\d+]")
+_NAME_JUNK_RE = re.compile(r"[^a-z ]+")
+
+
+def normalize_phone(phone: str) -> str:
+    """'+91 98765-43210' -> '+919876543210' (the bot already sends E.164)."""
+    return _PHONE_JUNK_RE.sub("", phone or "")
+
+
+def _city_key(city: str) -> str:
+    return " ".join((city or "").lower().split())
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(_NAME_JUNK_RE.sub(" ", (name or "").lower()).split())
+
+
+@lru_cache(maxsize=65536)
+def name_grams(name: str) -> frozenset:
+    """Character trigrams of the normalized, space-padded name (cached: recent leads are scored again and again)."""
+    padded = f" {_normalize_name(name)} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _gram_keys(name: str, city: str) -> List[str]:
+    # postings are per city, so only names in the caller's city are ever compared
+    city = _city_key(city)
+    return [f"{city}|{gram}" for gram in name_grams(name)]
+
+
+def _name_key(name: str, city: str) -> str:
+    """Exact normalized name + city, stored next to the trigram postings."""
+    return f"{_city_key(city)}|={_normalize_name(name)}"
+
+
+def _index_keys(name: str, city: str) -> List[str]:
+    return _gram_keys(name, city) + [_name_key(name, city)]
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _probe_keys(keys: List[str], freqs: Dict[str, int]) -> Tuple[List[str], int]:
+    """
+    Prefix filter: Jaccard >= t needs an overlap of at least a = ceil(t * |keys|),
+    so a matching name shares at least k of the |keys| - a + k rarest keys.
+    Returns those keys and k (2 when possible: far fewer false candidates).
+    """
+    needed = math.ceil(DEDUP_NAME_THRESHOLD * len(keys))
+    min_hits = 2 if needed >= 2 else 1
+    return sorted(keys, key=lambda k: freqs.get(k, 0))[:len(keys) - needed + min_hits], min_hits
+
+
+def _best_name_match(payload: Dict[str, Any], candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    grams = name_grams(payload["name"])
+    best, best_score = None, DEDUP_NAME_THRESHOLD
+    for lead in candidates:
+        score = _jaccard(grams, name_grams(lead["name"]))
+        if score >= best_score:
+            best, best_score = lead, score
+            if score == 1.0:
+                break
+    return {"lead": best, "by": "name_city", "score": best_score} if best is not None else None
+
+
+def _new_lead(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "lead_id": str(uuid4()),
+        "name": payload["name"],
+        "phone": normalize_phone(payload["phone"]),
+        "city": payload["city"],
+        "source": payload.get("source"),
+        "status": "NEW",
+        "notes": None,
+        "created_at": time.time(),
+    }
+
+
+def utc_visit_time(value: Any) -> Optional[str]:
+    """
+    A visit time (datetime or ISO-8601 string, naive = UTC) as a UTC ISO string to the second.
+    Only same-offset, same-width ISO strings sort chronologically, which the visit-time index and
+    the start/end range filters rely on: "+05:30", "Z" and naive inputs all land on this one form.
+    """
+    if value is None or value == "":
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def _new_visit(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "visit_id": str(uuid4()),
+        "lead_id": payload["lead_id"],
+        "visit_time": utc_visit_time(payload["visit_time"]),
+        "notes": payload.get("notes"),
+        "status": "SCHEDULED",
+        "created_at": time.time(),
+    }
+
+
+def _prefix_upper(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# Cursors: the sort key of the last row returned
+def _lead_cursor(seq: int) -> str:
+    return str(seq)
+
+
+def _parse_lead_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(cursor)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+def _visit_cursor(visit_time: str, seq: int) -> str:
+    return f"{visit_time}|{seq}"
+
+
+def _parse_visit_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not cursor:
+        return None
+    visit_time, _, seq = cursor.rpartition("|")
+    try:
+        return visit_time, int(seq)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+class LeadStore(ABC):
+    """Backend interface used by mock_crm."""
+
+    def create_lead(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self.create_leads([payload])[0]
+
+    @abstractmethod
+    def create_leads(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Bulk insert, no duplicate check."""
+
+    def find_duplicate(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        {"lead", "by": "phone" | "name_city", "score", "existing"} for a lead matching payload, else None.
+        existing is False for a possible duplicate: same city and a similar name, but another phone.
+        """
+        phone = normalize_phone(payload.get("phone") or "")
+        lead = self._first_by_phone(phone) if phone else None
+        if lead is not None:
+            return {"lead": lead, "by": "phone", "score": 1.0, "existing": True}
+        if not _normalize_name(payload["name"]):
+            return None
+        same_name = self._latest_postings(_name_key(payload["name"], payload["city"]), 1)
+        if same_name:
+            match = {"lead": self._leads_by_seq(same_name)[0], "by": "name_city", "score": 1.0}
+        else:
+            keys = _gram_keys(payload["name"], payload["city"])
+            candidates = self._name_candidates(*_probe_keys(keys, self._doc_freq(keys)))
+            match = _best_name_match(payload, candidates) if candidates else None
+        if match is not None:
+            # two different numbers are two people, however alike the names
+            match["existing"] = not phone or not match["lead"]["phone"]
+        return match
+
+    # Index primitives behind find_duplicate
+    def _name_candidates(self, probe: List[str], min_hits: int) -> List[Dict[str, Any]]:
+        """Leads in the newest postings of at least min_hits probe keys, most hits (then newest) first."""
+        hits = Counter()
+        for key in probe:
+            hits.update(self._latest_postings(key, DEDUP_POSTING_LIMIT))
+        ranked = sorted((seq for seq, n in hits.items() if n >= min_hits), key=lambda seq: (-hits[seq], -seq))
+        return self._leads_by_seq(ranked[:DEDUP_MAX_CANDIDATES])
+
+    @abstractmethod
+    def _first_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _latest_postings(self, key: str, limit: int) -> List[int]:
+        """Newest-first seqs of the leads indexed under key."""
+
+    @abstractmethod
+    def _doc_freq(self, keys: List[str]) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def _leads_by_seq(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        """Leads in the order of seqs."""
+
+    @abstractmethod
+    def create_or_match(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        (lead, None) for a new lead, (existing lead, match) for a duplicate, (new lead, match) for a
+        possible duplicate (match["existing"] False); check and insert are atomic.
+        """
+
+    @abstractmethod
+    def get_lead(self, lead_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_status(self, lead_id: str, status: str, notes: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def resolve_prefix(self, prefix: str, limit: int = MAX_PREFIX_CANDIDATES) -> List[str]:
+        """Up to limit lead ids starting with prefix, in id order (one result: unambiguous), in O(log n + limit)."""
+
+    @abstractmethod
+    def list_leads(self, phone: Optional[str] = None, city: Optional[str] = None, status: Optional[str] = None,
+                   limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+        ...
+
+    @abstractmethod
+    def create_visit(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """None if the lead does not exist."""
+
+    @abstractmethod
+    def list_visits(self, lead_id: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                    limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+        """Visits ordered by visit time, optionally within [start, end) (compared in UTC, naive = UTC)."""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStore(LeadStore):
+    """Dicts plus sorted secondary indexes; same ordering and cursors as SQLiteStore."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._leads: Dict[int, Dict[str, Any]] = {}  # seq -> lead
+        self._lead_seq: Dict[str, int] = {}  # lead_id -> seq
+        self._lead_order: List[int] = []  # every seq, ascending
+        self._lead_ids: List[str] = []  # every lead id, sorted: prefix lookups by bisect
+        self._grams: Dict[str, List[int]] = {}  # "city|trigram" -> seqs
+        self._by_field: Dict[str, Dict[Any, List[int]]] = {"phone": {}, "city": {}, "status": {}}
+        self._visits: Dict[int, Dict[str, Any]] = {}
+        self._visit_times: List[Tuple[str, int]] = []  # sorted (visit_time, seq)
+        self._visits_by_lead: Dict[str, List[int]] = {}
+        self._next_seq = 1
+
+    def _seq(self) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+
+    def create_leads(self, payloads):
+        created = []
+        with self._lock:
+            for payload in payloads:
+                lead = _new_lead(payload)
+                seq = self._seq()
+                self._leads[seq] = lead
+                self._lead_seq[lead["lead_id"]] = seq
+                self._lead_order.append(seq)
+                for field, index in self._by_field.items():
+                    # seqs only grow, so appending keeps every posting list sorted
+                    index.setdefault(lead[field], []).append(seq)
+                for key in _index_keys(lead["name"], lead["city"]):
+                    self._grams.setdefault(key, []).append(seq)
+                created.append(dict(lead))
+            new_ids = [lead["lead_id"] for lead in created]
+            if len(new_ids) >= _BULK_RESORT_MIN:
+                # timsort merges the sorted old run with the new ids in about O(n)
+                self._lead_ids.extend(new_ids)
+                self._lead_ids.sort()
+            else:
+                for lead_id in new_ids:
+                    insort(self._lead_ids, lead_id)
+        return created
+
+    def get_lead(self, lead_id):
+        with self._lock:
+            seq = self._lead_seq.get(lead_id)
+            return dict(self._leads[seq]) if seq is not None else None
+
+    def update_status(self, lead_id, status, notes=None):
+        with self._lock:
+            seq = self._lead_seq.get(lead_id)
+            if seq is None:
+                return None
+            lead = self._leads[seq]
+            if lead["status"] != status:
+                postings = self._by_field["status"][lead["status"]]
+                del postings[bisect_right(postings, seq) - 1]
+                insort(self._by_field["status"].setdefault(status, []), seq)
+                lead["status"] = status
+            if notes is not None:
+                lead["notes"] = notes
+            return dict(lead)
+
+    def find_duplicate(self, payload):
+        with self._lock:
+            match = super().find_duplicate(payload)
+            if match is not None:
+                match["lead"] = dict(match["lead"])
+            return match
+
+    def _first_by_phone(self, phone):
+        seqs = self._by_field["phone"].get(phone)
+        return self._leads[seqs[0]] if seqs else None
+
+    def _latest_postings(self, key, limit):
+        postings = self._grams.get(key, ())
+        return postings[:-limit - 1:-1] if postings else []
+
+    def _doc_freq(self, keys):
+        return {k: len(self._grams.get(k, ())) for k in keys}
+
+    def _leads_by_seq(self, seqs):
+        return [self._leads[seq] for seq in seqs]
+
+    def create_or_match(self, payload):
+        with self._lock:
+            match = self.find_duplicate(payload)
+            if match is not None and match["existing"]:
+                return match["lead"], match
+            return self.create_lead(payload), match
+
+    def resolve_prefix(self, prefix, limit=MAX_PREFIX_CANDIDATES):
+        with self._lock:
+            lo = bisect_left(self._lead_ids, prefix)
+            hi = bisect_left(self._lead_ids, _prefix_upper(prefix), lo, min(lo + limit, len(self._lead_ids)))
+            return self._lead_ids[lo:hi]
+
+    def list_leads(self, phone=None, city=None, status=None, limit=None, cursor=None):
+        after, size = _parse_lead_cursor(cursor), _page_size(limit)
+        filters = [(f, v) for f, v in (("phone", phone), ("city", city), ("status", status)) if v is not None]
+        with self._lock:
+            if filters:
+                # walk the most selective posting list, check the other filters per row
+                postings = min((self._by_field[f].get(v, []) for f, v in filters), key=len)
+            else:
+                postings = self._lead_order
+            items, last = [], None
+            for k in range(bisect_right(postings, after), len(postings)):
+                lead = self._leads[postings[k]]
+                if all(lead[f] == v for f, v in filters):
+                    items.append(dict(lead))
+                    last = postings[k]
+                    if len(items) == size:
+                        break
+        return items, (_lead_cursor(last) if len(items) == size else None)
+
+    def create_visit(self, payload):
+        with self._lock:
+            if payload["lead_id"] not in self._lead_seq:
+                return None
+            visit = _new_visit(payload)
+            seq = self._seq()
+            self._visits[seq] = visit
+            insort(self._visit_times, (visit["visit_time"], seq))
+            self._visits_by_lead.setdefault(visit["lead_id"], []).append(seq)
+            return dict(visit)
+
+    def list_visits(self, lead_id=None, start=None, end=None, limit=None, cursor=None):
+        after, size = _parse_visit_cursor(cursor), _page_size(limit)
+        start, end = utc_visit_time(start), utc_visit_time(end)
+        with self._lock:
+            if lead_id is not None:
+                keys = sorted((self._visits[seq]["visit_time"], seq) for seq in self._visits_by_lead.get(lead_id, []))
+            else:
+                keys = self._visit_times
+            if after is not None:
+                lo = bisect_right(keys, after)
+            else:
+                lo = bisect_right(keys, (start, -1)) if start else 0
+            items, last = [], None
+            for k in range(lo, len(keys)):
+                visit_time, seq = keys[k]
+                if end and visit_time >= end:
+                    break
+                items.append(dict(self._visits[seq]))
+                last = (visit_time, seq)
+                if len(items) == size:
+                    break
+        return items, (_visit_cursor(*last) if len(items) == size else None)
+
+    def counts(self):
+        with self._lock:
+            return {"leads": len(self._leads), "visits": len(self._visits)}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    lead_id    TEXT NOT NULL UNIQUE,
+    name       TEXT NOT NULL,
+    phone      TEXT NOT NULL,
+    city       TEXT NOT NULL,
+    source     TEXT,
+    status     TEXT NOT NULL,
+    notes      TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leads_phone  ON leads (phone, seq);
+CREATE INDEX IF NOT EXISTS leads_city   ON leads (city, seq);
+CREATE INDEX IF NOT EXISTS leads_status ON leads (status, seq);
+
+CREATE TABLE IF NOT EXISTS visits (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    visit_id   TEXT NOT NULL UNIQUE,
+    lead_id    TEXT NOT NULL REFERENCES leads (lead_id),
+    visit_time TEXT NOT NULL,
+    notes      TEXT,
+    status     TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS visits_time ON visits (visit_time, seq);
+CREATE INDEX IF NOT EXISTS visits_lead ON visits (lead_id, visit_time, seq);
+
+-- duplicate detection: per-city name trigram postings and their lengths
+CREATE TABLE IF NOT EXISTS lead_grams (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (key, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lead_gram_counts (
+    key TEXT PRIMARY KEY,
+    n   INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_INSERT_LEAD = "INSERT INTO leads (lead_id, name, phone, city, source, status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_SELECT_LEAD = "SELECT lead_id, name, phone, city, source, status, notes, created_at FROM leads WHERE lead_id = ?"
+_UPDATE_STATUS = "UPDATE leads SET status = ?, notes = COALESCE(?, notes) WHERE lead_id = ?"
+_INSERT_VISIT = "INSERT INTO visits (visit_id, lead_id, visit_time, notes, status, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+_LEAD_EXISTS = "SELECT 1 FROM leads WHERE lead_id = ?"
+# range scan on the UNIQUE lead_id index
+_RESOLVE_PREFIX = "SELECT lead_id FROM leads WHERE lead_id >= ? AND lead_id < ? ORDER BY lead_id LIMIT ?"
+_INSERT_GRAM = "INSERT OR IGNORE INTO lead_grams (key, seq) VALUES (?, ?)"
+_COUNT_GRAM = "INSERT INTO lead_gram_counts (key, n) VALUES (?, 1) ON CONFLICT (key) DO UPDATE SET n = n + 1"
+_LATEST_POSTINGS = "SELECT seq FROM lead_grams WHERE key = ? ORDER BY seq DESC LIMIT ?"
+_FIRST_BY_PHONE = "SELECT lead_id, name, phone, city, source, status, notes, created_at FROM leads WHERE phone = ? ORDER BY seq LIMIT 1"
+
+
+class SQLiteStore(LeadStore):
+    """SQLite in WAL mode; safe to share one database file between processes."""
+
+    def __init__(self, path: str = CRM_DB_PATH):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._conn().executescript(_SCHEMA)
+        self._backfill_grams()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # one connection per thread; autocommit, explicit transactions for multi-row writes
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _insert_leads(self, conn: sqlite3.Connection, leads: List[Dict[str, Any]]) -> None:
+        """Insert leads and their trigram postings; caller holds the write transaction."""
+        conn.executemany(_INSERT_LEAD, ([lead[f] for f in LEAD_FIELDS] for lead in leads))
+        # a single writer inside BEGIN IMMEDIATE: the AUTOINCREMENT seqs are consecutive
+        first_seq = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(leads) + 1
+        postings = [(key, first_seq + i) for i, lead in enumerate(leads) for key in _index_keys(lead["name"], lead["city"])]
+        conn.executemany(_INSERT_GRAM, postings)
+        conn.executemany(_COUNT_GRAM, ((key,) for key, _ in postings))
+
+    def _write(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return out
+
+    def _backfill_grams(self) -> None:
+        # databases created before duplicate detection: index the existing leads once
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM lead_grams LIMIT 1").fetchone() or not conn.execute("SELECT 1 FROM leads LIMIT 1").fetchone():
+            return
+
+        def backfill(conn):
+            postings = [(key, seq) for seq, name, city in conn.execute("SELECT seq, name, city FROM leads") for key in _index_keys(name, city)]
+            conn.executemany(_INSERT_GRAM, postings)
+            conn.executemany(_COUNT_GRAM, ((key,) for key, _ in postings))
+
+        self._write(backfill)
+
+    def create_leads(self, payloads):
+        leads = [_new_lead(p) for p in payloads]
+        self._write(lambda conn: self._insert_leads(conn, leads))
+        return leads
+
+    def _first_by_phone(self, phone):
+        row = self._conn().execute(_FIRST_BY_PHONE, (phone,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _latest_postings(self, key, limit):
+        cur = self._conn().cursor()
+        cur.row_factory = None  # plain tuples: Row objects cost more than the query here
+        return [seq for (seq,) in cur.execute(_LATEST_POSTINGS, (key, limit))]
+
+    def _name_candidates(self, probe, min_hits):
+        # one statement: SQLite merges the posting lists and counts hits, only the candidates come back
+        postings = " UNION ALL ".join(["SELECT seq FROM (SELECT seq FROM lead_grams WHERE key = ? ORDER BY seq DESC LIMIT ?)"] * len(probe))
+        sql = (
+            f"SELECT {', '.join('l.' + f for f in LEAD_FIELDS)} FROM "
+            f"(SELECT seq, COUNT(*) AS hits FROM ({postings}) GROUP BY seq HAVING hits >= ? ORDER BY hits DESC, seq DESC LIMIT ?) c "
+            "JOIN leads l ON l.seq = c.seq ORDER BY c.hits DESC, c.seq DESC"
+        )
+        params = [p for key in probe for p in (key, DEDUP_POSTING_LIMIT)] + [min_hits, DEDUP_MAX_CANDIDATES]
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def _doc_freq(self, keys):
+        marks = ", ".join("?" * len(keys))
+        return dict(self._conn().execute(f"SELECT key, n FROM lead_gram_counts WHERE key IN ({marks})", keys).fetchall())
+
+    def _leads_by_seq(self, seqs):
+        marks = ", ".join("?" * len(seqs))
+        rows = self._conn().execute(f"SELECT seq, {', '.join(LEAD_FIELDS)} FROM leads WHERE seq IN ({marks})", seqs).fetchall()
+        by_seq = {row["seq"]: {f: row[f] for f in LEAD_FIELDS} for row in rows}
+        return [by_seq[seq] for seq in seqs if seq in by_seq]
+
+    def create_or_match(self, payload):
+        def create(conn):
+            # same thread-local connection: the check runs inside this write transaction
+            match = self.find_duplicate(payload)
+            if match is not None and match["existing"]:
+                return match["lead"], match
+            lead = _new_lead(payload)
+            self._insert_leads(conn, [lead])
+            return lead, match
+
+        # BEGIN IMMEDIATE: concurrent creates (any worker) are checked one after another
+        return self._write(create)
+
+    def get_lead(self, lead_id):
+        row = self._conn().execute(_SELECT_LEAD, (lead_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def update_status(self, lead_id, status, notes=None):
+        cur = self._conn().execute(_UPDATE_STATUS, (status, notes, lead_id))
+        return self.get_lead(lead_id) if cur.rowcount else None
+
+    def resolve_prefix(self, prefix, limit=MAX_PREFIX_CANDIDATES):
+        rows = self._conn().execute(_RESOLVE_PREFIX, (prefix, _prefix_upper(prefix), limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def list_leads(self, phone=None, city=None, status=None, limit=None, cursor=None):
+        after, size = _parse_lead_cursor(cursor), _page_size(limit)
+        where, params = ["seq > ?"], [after]
+        for field, value in (("phone", phone), ("city", city), ("status", status)):
+            if value is not None:
+                where.append(f"{field} = ?")
+                params.append(value)
+        sql = f"SELECT seq, {', '.join(LEAD_FIELDS)} FROM leads WHERE {' AND '.join(where)} ORDER BY seq LIMIT ?"
+        rows = self._conn().execute(sql, (*params, size)).fetchall()
+        items = [{f: row[f] for f in LEAD_FIELDS} for row in rows]
+        return items, (_lead_cursor(rows[-1]["seq"]) if len(rows) == size else None)
+
+    def create_visit(self, payload):
+        visit = _new_visit(payload)
+
+        def insert(conn):
+            if conn.execute(_LEAD_EXISTS, (visit["lead_id"],)).fetchone() is None:
+                return None
+            conn.execute(_INSERT_VISIT, [visit[f] for f in VISIT_FIELDS])
+            return visit
+
+        return self._write(insert)
+
+    def list_visits(self, lead_id=None, start=None, end=None, limit=None, cursor=None):
+        after, size = _parse_visit_cursor(cursor), _page_size(limit)
+        start, end = utc_visit_time(start), utc_visit_time(end)
+        where, params = [], []
+        if lead_id is not None:
+            where.append("lead_id = ?")
+            params.append(lead_id)
+        if after is not None:
+            where.append("(visit_time, seq) > (?, ?)")
+            params.extend(after)
+        elif start:
+            where.append("visit_time >= ?")
+            params.append(start)
+        if end:
+            where.append("visit_time < ?")
+            params.append(end)
+        sql = (f"SELECT seq, {', '.join(VISIT_FIELDS)} FROM visits"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY visit_time, seq LIMIT ?")
+        rows = self._conn().execute(sql, (*params, size)).fetchall()
+        items = [{f: row[f] for f in VISIT_FIELDS} for row in rows]
+        return items, (_visit_cursor(rows[-1]["visit_time"], rows[-1]["seq"]) if len(rows) == size else None)
+
+    def counts(self):
+        conn = self._conn()
+        return {
+            "leads": conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0],
+            "visits": conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0],
+        }
+
+    def close(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+
+
+def create_store(kind: str = CRM_STORE, path: str = CRM_DB_PATH) -> LeadStore:
+    if kind == "memory":
+        return MemoryStore()
+    if kind == "sqlite":
+        return SQLiteStore(path)
+    raise ValueError(f"Unknown CRM_STORE '{kind}' (expected sqlite or memory)")
+
+
+# CLI (FOR TESTING)
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Bulk-load synthetic leads and time indexed lookups")
+    p.add_argument("--store", default=CRM_STORE, choices=("sqlite", "memory"))
+    p.add_argument("--path", default=CRM_DB_PATH)
+    p.add_argument("--leads", type=int, default=100000)
+    p.add_argument("--chunk", type=int, default=10000)
+    args = p.parse_args()
+
+    store = create_store(args.store, args.path)
+    cities = ["Gurgaon", "Noida", "Pune", "Mumbai", "Delhi", "Bangalore", "Chennai", "Hyderabad"]
+    syllables = ["ra", "hul", "an", "ki", "sha", "rma", "ve", "nu", "pri", "ya", "dev", "ko", "mal", "sun", "ita", "jo", "shi", "ar", "ju", "na"]
+
+    def synthetic_name(i: int) -> str:
+        digits = [(i // 20 ** k) % 20 for k in range(5)]
+        first = "".join(syllables[d] for d in digits[:2]).title()
+        last = "".join(syllables[d] for d in digits[2:]).title()
+        return f"{first} {last}"
+    start = time.perf_counter()
+    for offset in range(0, args.leads, args.chunk):
+        n = min(args.chunk, args.leads - offset)
+        store.create_leads([
+            {"name": synthetic_name(i), "phone": f"+9198{i:08d}", "city": cities[i % len(cities)], "source": "loadgen"}
+            for i in range(offset, offset + n)
+        ])
+    elapsed = time.perf_counter() - start
+    print(f"inserted {args.leads} leads in {elapsed:.2f}s ({args.leads / elapsed:.0f}/s); totals {store.counts()}")
+
+    start = time.perf_counter()
+    items, cursor = store.list_leads(city="Pune", limit=100)
+    pages = 1
+    while cursor and pages < 50:
+        items, cursor = store.list_leads(city="Pune", limit=100, cursor=cursor)
+        pages += 1
+    print(f"{pages} pages of city=Pune: {(time.perf_counter() - start) / pages * 1000:.3f} ms per page")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        store.list_leads(phone=f"+9198{(i * 7919) % args.leads:08d}", limit=1)
+    print(f"phone lookup: {(time.perf_counter() - start):.3f} ms avg")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        j = (i * 7919) % args.leads
+        # same name and city, different phone: found through the trigram index
+        store.find_duplicate({"name": synthetic_name(j), "phone": "+10000000000", "city": cities[j % len(cities)]})
+    print(f"duplicate check (name + city): {(time.perf_counter() - start):.3f} ms avg")
+
+    start, found = time.perf_counter(), 0
+    for i in range(1000):
+        j = args.leads - 1 - (i * 7919) % min(args.leads, 10000)
+        name = synthetic_name(j)
+        # a misheard name for one of the last 10k leads: one character dropped from the surname
+        found += store.find_duplicate({"name": name[:-2] + name[-1], "phone": "+10000000000", "city": cities[j % len(cities)]}) is not None
+    print(f"duplicate check (fuzzy name + city): {(time.perf_counter() - start):.3f} ms avg, {found / 10:.1f}% found")
+
+    ids = [lead["lead_id"] for lead in store.list_leads(limit=1000)[0]]
+    start = time.perf_counter()
+    for lead_id in ids:
+        store.resolve_prefix(lead_id[:8])
+    print(f"8-char prefix resolution: {(time.perf_counter() - start) / len(ids) * 1000:.3f} ms avg")
@@ -0,0 +1,156 @@
+# datetime_grammar.py
+"""
+Deterministic date/time grammar for the forms agents actually say.
+
+    dates : 2026-03-12, 12-03-2026, 12/03/26 (day first), 12th March, March 12,
+            today, tomorrow, day after tomorrow, (next) Monday
+    times : 3 pm, 3:30pm, 3.30 p.m., 18:30, optionally followed by IST / UTC / GMT
+
+parse_datetime returns None when the transcript has no such form, or has date
+words or forms the grammar does not model (next week, in 3 days, evening,
+10/11, sat, ...); the caller then falls back to dateparser.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+TIMEZONES = {
+    "ist": timezone(timedelta(hours=5, minutes=30)),
+    "utc": timezone.utc,
+    "gmt": timezone.utc,
+}
+
+_MONTH = r"(?P<mon>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_ORDINAL = r"(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(?:of\s+)?(?P<y>\d{4}))?"
+
+# Date forms, tried in order; the first form found anywhere in the text wins
+DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})\b")),
+    ("dmy", re.compile(r"\b(?P<d>\d{1,2})[/\-.](?P<m>\d{1,2})[/\-.](?P<y>\d{4}|\d{2})\b")),
+    ("day_month", re.compile(r"\b(?:the\s+)?(?P<d>\d{1,2})" + _ORDINAL + r"\s+(?:of\s+)?" + _MONTH + r"\b\.?" + _YEAR + r"\b", re.IGNORECASE)),
+    ("month_day", re.compile(r"\b" + _MONTH + r"\.?\s+(?:the\s+)?(?P<d>\d{1,2})" + _ORDINAL + r"\b" + _YEAR + r"\b", re.IGNORECASE)),
+    ("relative", re.compile(r"\b(?P<rel>day\s+after\s+tomorrow|tomorrow|today)\b", re.IGNORECASE)),
+    ("weekday", re.compile(r"\b(?:(?:next|this|coming|on)\s+)?(?P<wd>" + "|".join(WEEKDAYS) + r")\b", re.IGNORECASE)),
+]
+
+_TZ = r"(?:\s*(?P<tz>" + "|".join(TIMEZONES) + r")\b)?"
+TIME_PATTERNS = [
+    re.compile(r"\b(?P<h>\d{1,2})(?:[:.](?P<min>[0-5]\d))?\s*(?P<ampm>[ap])\.?\s?m\b\.?" + _TZ, re.IGNORECASE),
+    re.compile(r"\b(?P<h>[01]?\d|2[0-3]):(?P<min>[0-5]\d)\b" + _TZ, re.IGNORECASE),
+]
+
+# Date/time words this grammar does not model: leave those transcripts to dateparser
+UNHANDLED = re.compile(
+    r"\b(?:week|weeks|weekend|month|months|year|years|fortnight|hour|hours|minute|minutes|days"
+    r"|morning|afternoon|evening|night|tonight|noon|midnight|ago|hence|later|yesterday|o'?clock)\b",
+    re.IGNORECASE,
+)
+
+# A month name outside a recognised date means the grammar misread the date
+MONTH_WORD = re.compile(r"\b" + _MONTH + r"\b", re.IGNORECASE)
+
+# A year-less day/month ("10/11") or an abbreviated weekday ("sat") outside a
+# recognised date: a date form the grammar does not model
+NUMERIC_DAY_MONTH = re.compile(r"\b\d{1,2}[/-]\d{1,2}\b")
+WEEKDAY_ABBR = re.compile(r"\b(?:mon|tues?|wed|thu(?:rs?)?|fri|sat|sun)\b\.?", re.IGNORECASE)
+
+# A bare hour ("at 5") the grammar will not guess am/pm for
+BARE_HOUR = re.compile(r"\b(?:at|by|around|before|after)\s+\d{1,2}\b(?![:.]\d)", re.IGNORECASE)
+
+
+def _first_date(text: str):
+    """(kind, match) of the date form that occurs first in text, or None."""
+    found = [(m.start(), kind, m) for kind, rx in DATE_PATTERNS for m in [rx.search(text)] if m]
+    if not found:
+        return None
+    _, kind, m = min(found, key=lambda f: f[0])
+    return kind, m
+
+
+def _first_time(text: str):
+    found = [m for rx in TIME_PATTERNS for m in [rx.search(text)] if m]
+    return min(found, key=lambda m: m.start()) if found else None
+
+
+def _next_month_day(month: int, day: int, now: datetime) -> datetime:
+    """Next occurrence (today included) of a day-of-month given without a year."""
+    candidate = now.replace(month=month, day=day, hour=0, minute=0, second=0, microsecond=0)
+    if candidate.date() < now.date():
+        candidate = candidate.replace(year=now.year + 1)
+    return candidate
+
+
+def _resolve_date(kind: str, m, now: datetime) -> datetime:
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ("iso", "dmy"):
+        year = int(m.group("y"))
+        if year < 100:
+            year += 2000
+        return midnight.replace(year=year, month=int(m.group("m")), day=int(m.group("d")))
+    if kind in ("day_month", "month_day"):
+        month, day = MONTHS[m.group("mon")[:3].lower()], int(m.group("d"))
+        if m.group("y"):
+            return midnight.replace(year=int(m.group("y")), month=month, day=day)
+        return _next_month_day(month, day, now)
+    if kind == "relative":
+        rel = " ".join(m.group("rel").lower().split())
+        # like dateparser, a bare relative day keeps the current time of day
+        return now + timedelta(days={"today": 0, "tomorrow": 1, "day after tomorrow": 2}[rel])
+    # weekday: next occurrence, a week ahead if it is today
+    days_ahead = (WEEKDAYS.index(m.group("wd").lower()) - now.weekday()) % 7 or 7
+    return midnight + timedelta(days=days_ahead)
+
+
+def parse_datetime(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Resolve the first date and first time in text; None if the grammar does not cover it."""
+    if not text or UNHANDLED.search(text):
+        return None
+
+    date_m = _first_date(text)
+    time_m = _first_time(text)
+    if time_m is None and BARE_HOUR.search(text):
+        return None
+    if date_m is None and time_m is None:
+        return None
+    if MONTH_WORD.search(text) and (date_m is None or date_m[0] not in ("day_month", "month_day")):
+        return None
+    rest = text[:date_m[1].start()] + " " + text[date_m[1].end():] if date_m is not None else text
+    if NUMERIC_DAY_MONTH.search(rest) or WEEKDAY_ABBR.search(rest):
+        return None
+
+    tz = TIMEZONES[time_m.group("tz").lower()] if time_m is not None and time_m.group("tz") else None
+    if now is None:
+        now = datetime.now(tz) if tz else datetime.now()
+    elif tz:
+        now = now.astimezone(tz) if now.tzinfo else now.replace(tzinfo=tz)
+
+    try:
+        date = _resolve_date(*date_m, now) if date_m is not None else None
+    except ValueError:
+        # e.g. 31-02-2026: not a real date
+        return None
+    if time_m is None:
+        return date
+
+    hour, minute = int(time_m.group("h")), int(time_m.group("min") or 0)
+    ampm = (time_m.groupdict().get("ampm") or "").lower()
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        if ampm == "p" and hour != 12:
+            hour += 12
+        elif ampm == "a" and hour == 12:
+            hour = 0
+
+    if date is None:
+        # time only: the next time the clock shows it
+        dt = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return dt if dt >= now else dt + timedelta(days=1)
+    return date.replace(hour=hour, minute=minute, second=0, microsecond=0)
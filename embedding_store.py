@@ -0,0 +1,166 @@
+# embedding_store.py
+"""
+On-disk store for the precomputed intent-vocabulary embeddings.
+
+Each vocabulary is saved as a memory-mappable .npy file next to a manifest.json
+keyed by a hash of the model name and the vocabulary contents. At startup the
+arrays are memory-mapped when the hash matches and rebuilt (and re-saved) only
+when the synthetic data or the model changes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from logger_config import logger
+from stub_models import STUB_MODELS
+
+BASE_DIR = os.path.dirname(__file__)
+# Stub-model embeddings are kept apart so they never replace the real artifacts
+ARTIFACT_DIR = os.getenv("EMBED_ARTIFACT_DIR", os.path.join(BASE_DIR, "artifacts", "embeddings-stub" if STUB_MODELS else "embeddings"))
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def artifact_set_dir(name: str) -> str:
+    """Directory of one named artifact set (e.g. "intent", "status") under ARTIFACT_DIR."""
+    return os.path.join(ARTIFACT_DIR, name)
+
+
+def vocabulary_hash(model_name: str, vocabularies: Dict[str, List[str]]) -> str:
+    """Content hash of the model name and every vocabulary (names, tokens and their order)."""
+    payload = json.dumps(
+        {"format": FORMAT_VERSION, "model": model_name, "vocabularies": vocabularies},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_manifest(artifact_dir: str = ARTIFACT_DIR) -> Optional[dict]:
+    path = os.path.join(artifact_dir, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_embeddings(model_name: str, vocabularies: Dict[str, List[str]], artifact_dir: str = ARTIFACT_DIR) -> Optional[Dict[str, np.ndarray]]:
+    """Memory-map the stored arrays if the manifest hash matches, else None."""
+    manifest = read_manifest(artifact_dir)
+    expected = vocabulary_hash(model_name, vocabularies)
+    if not manifest or manifest.get("hash") != expected:
+        return None
+
+    arrays = {}
+    try:
+        for name, tokens in vocabularies.items():
+            entry = manifest["vocabularies"][name]
+            arr = np.load(os.path.join(artifact_dir, entry["file"]), mmap_mode="r")
+            if arr.shape[0] != len(tokens):
+                return None
+            arrays[name] = arr
+    except (KeyError, OSError, ValueError) as e:
+        logger.info(f"[warn] Embedding artifact in {artifact_dir} is unreadable: {e}")
+        return None
+    return arrays
+
+
+def save_embeddings(model_name: str, vocabularies: Dict[str, List[str]], arrays: Dict[str, np.ndarray], artifact_dir: str = ARTIFACT_DIR) -> str:
+    """Write every array plus the manifest; the directory is swapped in atomically. Returns the hash."""
+    digest = vocabulary_hash(model_name, vocabularies)
+    parent = os.path.dirname(os.path.abspath(artifact_dir))
+    os.makedirs(parent, exist_ok=True)
+
+    tmp_dir = tempfile.mkdtemp(prefix=".embeddings-", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)  # built as root at image-build time, read by the service user
+        manifest = {
+            "hash": digest,
+            "model": model_name,
+            "format": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "vocabularies": {},
+        }
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr, dtype=np.float32)
+            filename = f"{name}.npy"
+            np.save(os.path.join(tmp_dir, filename), arr)
+            manifest["vocabularies"][name] = {
+                "file": filename,
+                "rows": int(arr.shape[0]),
+                "dim": int(arr.shape[1]) if arr.ndim > 1 else 0,
+                "dtype": str(arr.dtype),
+            }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.isdir(artifact_dir):
+            shutil.rmtree(artifact_dir)
+        os.replace(tmp_dir, artifact_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return digest
+
+
+def load_or_build(
+    model_name: str,
+    vocabularies: Dict[str, List[str]],
+    encode_fn: Callable[[List[str]], np.ndarray],
+    artifact_dir: str = ARTIFACT_DIR,
+) -> Dict[str, np.ndarray]:
+    """Return embeddings for every vocabulary: memory-mapped from disk, or encoded and saved."""
+    arrays = load_embeddings(model_name, vocabularies, artifact_dir)
+    if arrays is not None:
+        logger.info(f"[info] Loaded reference embeddings from {artifact_dir}")
+        return arrays
+
+    logger.info(f"[info] Reference embeddings missing or stale in {artifact_dir}, encoding vocabularies")
+    arrays = {name: np.asarray(encode_fn(tokens), dtype=np.float32) for name, tokens in vocabularies.items()}
+    try:
+        save_embeddings(model_name, vocabularies, arrays, artifact_dir)
+    except OSError as e:
+        # e.g. read-only image; serve from memory and rebuild next start
+        logger.info(f"[warn] Could not save reference embeddings to {artifact_dir}: {e}")
+    return arrays
+
+
+# CLI (prebuild at image-build time)
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Prebuild the reference-embedding artifacts (no-op if already current)")
+    p.add_argument("--force", action="store_true", help="Rebuild even if the artifacts are current")
+    args = p.parse_args()
+
+    if args.force and os.path.isdir(ARTIFACT_DIR):
+        shutil.rmtree(ARTIFACT_DIR)
+
+    # Building each index loads (or encodes and saves) the artifact set it needs
+    import intent_transformer_knn as knn
+    import status_prototypes
+    knn.get_intent_index()
+    status_prototypes.get_status_index()
+
+    sets = {
+        "intent": vocabulary_hash(knn.EMBED_MODEL_ID, knn.REFERENCE_VOCABULARIES),
+        "status": vocabulary_hash(knn.EMBED_MODEL_ID, status_prototypes.STATUS_VOCABULARIES),
+    }
+    out = {}
+    for name, expected in sets.items():
+        manifest = read_manifest(artifact_set_dir(name)) or {}
+        out[name] = {
+            "artifact_dir": artifact_set_dir(name),
+            "expected_hash": expected,
+            "stored_hash": manifest.get("hash"),
+            "current": manifest.get("hash") == expected,
+            "vocabularies": manifest.get("vocabularies", {}),
+        }
+    print(json.dumps(out, indent=2))
@@ -0,0 +1,246 @@
+# encoder_backends.py
+"""
+Pluggable sentence-encoder backends for intent detection.
+
+    sentence-transformers : eager PyTorch fp32 (default)
+    onnx                  : exported ONNX model on ONNX Runtime (CPU)
+    onnx-int8             : same, with int8 dynamic quantization of the weights
+    stub                  : deterministic hashed bag-of-words, no weights (BOT_STUB_MODELS=1)
+
+The backend is picked with EMBED_BACKEND. ONNX models are produced by the
+export command below and read from ONNX_MODEL_DIR.
+
+    python encoder_backends.py export [--quantize]
+    python encoder_backends.py parity --backend onnx-int8
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+from logger_config import logger
+from stub_models import STUB_MODELS, StubEncoder
+
+BASE_DIR = os.path.dirname(__file__)
+# BOT_STUB_MODELS=1 swaps in the deterministic stub encoder (stub_models.py)
+EMBED_BACKEND = "stub" if STUB_MODELS else os.getenv("EMBED_BACKEND", "sentence-transformers")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(BASE_DIR, "artifacts", "onnx"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets ONNX Runtime decide
+ONNX_BATCH_SIZE = 32
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8", "stub")
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+class EncoderBackend(ABC):
+    """Minimal encoder interface used by intent_transformer_knn (mirrors SentenceTransformer.encode)."""
+
+    name = "base"
+
+    @abstractmethod
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        ...
+
+
+class SentenceTransformerBackend(EncoderBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        return self.model.encode(texts, normalize_embeddings=normalize_embeddings)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxEncoderBackend(EncoderBackend):
+    """Exported transformer on ONNX Runtime, with the same mean pooling + L2 normalization as the SBERT model."""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = False):
+        self.name = "onnx-int8" if quantized else "onnx"
+        path = os.path.join(model_dir, ONNX_FILES[self.name])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run 'python encoder_backends.py export{' --quantize' if quantized else ''}'")
+
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "encoder_meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.max_seq_length = int(self.meta.get("max_seq_length", 384))
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS > 0:
+            opts.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feeds = {name: enc[name].astype(np.int64) for name in ("input_ids", "attention_mask") if name in self.input_names}
+        token_embs = self.session.run(None, feeds)[0]
+
+        # mean pooling over real tokens
+        mask = enc["attention_mask"].astype(np.float32)[:, :, None]
+        summed = (token_embs * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        embs = np.vstack([self._encode_batch(texts[i:i + ONNX_BATCH_SIZE]) for i in range(0, len(texts), ONNX_BATCH_SIZE)])
+        if normalize_embeddings:
+            norms = np.linalg.norm(embs, axis=1, keepdims=True)
+            embs = embs / np.clip(norms, 1e-12, None)
+        return embs
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.meta["dim"])
+
+
+def create_encoder(model_name: str, backend: str = EMBED_BACKEND, model_dir: str = ONNX_MODEL_DIR) -> EncoderBackend:
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        encoder = OnnxEncoderBackend(model_dir, quantized=(backend == "onnx-int8"))
+        if encoder.meta.get("model") != model_name:
+            logger.info(f"[warn] ONNX model in {model_dir} was exported from {encoder.meta.get('model')}, expected {model_name}")
+        return encoder
+    if backend == "stub":
+        return StubEncoder()
+    raise ValueError(f"Unknown EMBED_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+
+# Export
+def export_onnx(model_name: str, out_dir: str = ONNX_MODEL_DIR, quantize: bool = False, opset: int = 17) -> dict:
+    """Export the SBERT transformer to ONNX (and optionally an int8 dynamically quantized copy)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    os.makedirs(out_dir, exist_ok=True)
+
+    class _TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    sample = tokenizer(["Schedule a visit for lead 7b1b8f54 at 3 pm tomorrow."], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, ONNX_FILES["onnx"])
+    with torch.inference_mode():
+        torch.onnx.export(
+            _TokenEmbeddings(transformer),
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_embeddings": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(out_dir)
+
+    meta = {
+        "model": model_name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "pooling": "mean",
+        "files": {"onnx": ONNX_FILES["onnx"]},
+    }
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(out_dir, ONNX_FILES["onnx-int8"])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        meta["files"]["onnx-int8"] = ONNX_FILES["onnx-int8"]
+
+    with open(os.path.join(out_dir, "encoder_meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    logger.info(f"[info] Exported {model_name} to {out_dir} (quantized={quantize})")
+    return meta
+
+
+# Parity check
+def parity_report(reference: EncoderBackend, candidate: EncoderBackend, texts: List[str]) -> dict:
+    """Cosine drift of candidate vs reference embeddings, and how often both pick the same intent."""
+    import intent_transformer_knn as knn
+    from knn_index import FusedIntentIndex
+    from main_bot import normalize_intent
+    from syntheticData.regex_parser import regex_score
+
+    def intents_for(encoder: EncoderBackend) -> List[str]:
+        index = FusedIntentIndex(knn.INTENTS, knn.K)
+        for name, tokens in knn.REFERENCE_VOCABULARIES.items():
+            labels = knn.verb_labels if name == "verbs" else knn.kw_labels
+            index.add(name, tokens, labels, encoder.encode(tokens, normalize_embeddings=True))
+        scores = index.build().score(encoder.encode(texts, normalize_embeddings=True))
+        out = []
+        for text, verb_scores, kw_scores in zip(texts, scores["verbs"], scores["keywords"]):
+            regex_scores, _ = regex_score(text, per_match_score=0.5, max_per_intent=2.0)
+            out.append(normalize_intent(knn._combine_scores(verb_scores, kw_scores, regex_scores)))
+        return out
+
+    ref = reference.encode(texts, normalize_embeddings=True)
+    cand = candidate.encode(texts, normalize_embeddings=True)
+    cos = np.sum(ref * cand, axis=1)
+    ref_intents, cand_intents = intents_for(reference), intents_for(candidate)
+    disagreements = [
+        {"text": t, reference.name: a, candidate.name: b}
+        for t, a, b in zip(texts, ref_intents, cand_intents) if a != b
+    ]
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "n_texts": len(texts),
+        "cosine": {"mean": float(cos.mean()), "min": float(cos.min())},
+        "cosine_drift": {"mean": float(1.0 - cos.mean()), "max": float(1.0 - cos.min())},
+        "intent_agreement": 1.0 - len(disagreements) / max(len(texts), 1),
+        "disagreements": disagreements,
+    }
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+    from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+    from intent_transformer_knn import EMBED_MODEL_NAME
+
+    p = argparse.ArgumentParser(description="Sentence-encoder backends: ONNX export and parity check")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="Export the encoder to ONNX")
+    ex.add_argument("--out", default=ONNX_MODEL_DIR)
+    ex.add_argument("--quantize", action="store_true", help="Also write an int8 dynamically quantized model")
+    par = sub.add_parser("parity", help="Compare a backend against sentence-transformers on the sample transcripts")
+    par.add_argument("--backend", default="onnx-int8", choices=BACKENDS)
+    par.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    args = p.parse_args()
+
+    if args.cmd == "export":
+        print(json.dumps(export_onnx(EMBED_MODEL_NAME, args.out, quantize=args.quantize), indent=2))
+    else:
+        reference = create_encoder(EMBED_MODEL_NAME, "sentence-transformers")
+        candidate = create_encoder(EMBED_MODEL_NAME, args.backend, args.model_dir)
+        print(json.dumps(parity_report(reference, candidate, SAMPLE_TRANSCRIPTS), indent=2))
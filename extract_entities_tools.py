@@ -1,42 +1,70 @@
 
 import re
+import threading
 import uuid
-import phonenumbers
 from email_validator import validate_email, EmailNotValidError
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, Union
 from datetime import datetime, timedelta
 from dateparser.search import search_dates
 from dateparser import parse as date_parse
+from datetime_grammar import parse_datetime
 import pytz
 from logger_config import logger
+from model_registry import registry
+from telemetry import stage, MODEL_ERRORS
+from pipeline_optim import optimize_pipeline
+from stub_models import STUB_MODELS, StubNERPipeline, StubZeroShotPipeline
+from keyword_automaton import KeywordAutomaton
+from transcript_analysis import TranscriptAnalysis, analyze, find_phones, PHONE_REGION
+from status_prototypes import STATUS_LABELS, classify_status, classify_status_batch, uses_zero_shot
+from validators.validate_output import REQUIRED_FIELDS, OPTIONAL_FIELDS
 
 
-# Load NER (dslim/bert-large-NER)
-try:
+# Model config
+NER_MODEL_NAME = "Davlan/xlm-roberta-base-ner-hrl"
+STATUS_MODEL_NAME = "facebook/bart-large-mnli"
+
+
+# Models are loaded lazily (or at startup) through the model registry, then
+# quantized / thread-tuned per pipeline_optim settings
+def _load_ner_fp32():
+    from transformers import pipeline
+    return pipeline("ner", model=NER_MODEL_NAME, aggregation_strategy="simple")
+
+
+def _load_status_classifier_fp32():
     from transformers import pipeline
-    ner = pipeline("ner", model="Davlan/xlm-roberta-base-ner-hrl", aggregation_strategy="simple")
-except Exception as e:
-    logger.info("[warn] Could not load NER model:", e)
-    ner = None
-logger.info("[info] Loading NER model: Davlan/xlm-roberta-base-ner-hrl")
+    return pipeline("zero-shot-classification", model=STATUS_MODEL_NAME)
+
+
+def _load_ner():
+    if STUB_MODELS:
+        return StubNERPipeline()
+    return optimize_pipeline(_load_ner_fp32())
+
+
+def _load_status_classifier():
+    if STUB_MODELS:
+        return StubZeroShotPipeline()
+    return optimize_pipeline(_load_status_classifier_fp32())
 
 
-# Load zero-shot model once (global)
-try:
-    status_classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-except Exception as e:
-    logger.info("[warn] Could not load BART-MNLI model:", e)
-    status_classifier = None
-logger.info("[info] Loading NER model: zero-shot-classification")
+registry.register("ner", _load_ner)
+# BART zero-shot is only needed for STATUS_BACKEND=zero-shot or the low-margin fallback
+registry.register("status_classifier", _load_status_classifier, required=uses_zero_shot())
 
 
 
 # Extractors
+# Each takes the transcript or its TranscriptAnalysis; the pipeline builds the
+# analysis once per request and hands the same object to every stage.
+Transcript = Union[str, TranscriptAnalysis]
 
-def extract_email(text: str) -> Optional[str]:
-    m = re.search(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", text)
-    if m:
-        email = m.group(0)
+
+def extract_email(text: Transcript) -> Optional[str]:
+    analysis = analyze(text)
+    if analysis.emails:
+        email = analysis.emails[0].value
         try:
             validate_email(email)
             return email
@@ -45,20 +73,15 @@ def extract_email(text: str) -> Optional[str]:
     return None
 
 
-def extract_phone(text: str, default_region: str = "IN") -> Optional[str]:
+def extract_phone(text: Transcript, default_region: str = PHONE_REGION) -> Optional[str]:
+    analysis = analyze(text)
+    text = analysis.text
     if not text:
         return None
 
-    try:
-        for match in phonenumbers.PhoneNumberMatcher(text, default_region):
-            try:
-                return phonenumbers.format_number(match.number, phonenumbers.PhoneNumberFormat.E164)
-            except Exception:
-                # fallback to raw national number if formatting fails
-                return phonenumbers.format_number(match.number, phonenumbers.PhoneNumberFormat.E164)
-    except Exception:
-        # If phonenumbers fails for any reason, proceed to regex fallback
-        pass
+    phones = analysis.phones if default_region == PHONE_REGION else find_phones(text, default_region)
+    if phones:
+        return phones[0].value
 
     # Regex fallback: find 8-15 digit sequences possibly separated by spaces, dashes, parentheses
     # e.g. "91234-56789", "+91 9123456789", "(91) 91234 56789"
@@ -76,37 +99,68 @@ def extract_phone(text: str, default_region: str = "IN") -> Optional[str]:
     return None
 
 
-def extract_datetime(text: str) -> Optional[str]:
-    """Extract datetime from text with fallback for 'today/tomorrow/day after' + time."""
-    if not text:
-        return None
+# English-only dateparser for what the grammar misses (skips language detection)
+DATEPARSER_LANGUAGES = ["en"]
+DATEPARSER_SETTINGS = {"PREFER_DATES_FROM": "future"}
 
-    # --- Remove detected phone numbers ---
-    try:
-        for match in phonenumbers.PhoneNumberMatcher(text, "IN"):
-            phone_raw = match.raw_string
-            text = text.replace(phone_raw, "")
-    except Exception:
-        pass
+# Which path resolved each extracted date: grammar | dateparser | fallback | none
+DATETIME_PATHS = ("grammar", "dateparser", "fallback", "none")
+_datetime_path_counts = {path: 0 for path in DATETIME_PATHS}
+_datetime_path_lock = threading.Lock()
 
-    # --- Try normal parsing first ---
+
+def datetime_path_stats() -> Dict[str, int]:
+    with _datetime_path_lock:
+        return dict(_datetime_path_counts)
+
+
+def extract_datetime(text: Transcript) -> Optional[str]:
+    """Extract datetime from text: compiled grammar, then English dateparser, then 'today/tomorrow' + time."""
+    return resolve_datetime(text)[0]
+
+
+def resolve_datetime(text: Transcript) -> Tuple[Optional[str], str]:
+    """(ISO datetime or None, path that resolved it)."""
+    analysis = analyze(text)
+    if not analysis.text:
+        return None, "none"
+    value, path = _resolve_datetime(analysis)
+    with _datetime_path_lock:
+        _datetime_path_counts[path] += 1
+    return value, path
+
+
+def _resolve_datetime(analysis: TranscriptAnalysis) -> Tuple[Optional[str], str]:
+    # --- Phone numbers are already masked out ---
+    text = analysis.masked
+
+    # --- Fast path: deterministic grammar for the common forms ---
+    with stage("datetime_grammar"):
+        dt = parse_datetime(text)
+    if dt is not None:
+        return dt.isoformat(), "grammar"
+
+    # --- Then English-only dateparser ---
     try:
-        found = search_dates(text, settings={"PREFER_DATES_FROM": "future"})
+        with stage("dateparser"):
+            found = search_dates(text, languages=DATEPARSER_LANGUAGES, settings=DATEPARSER_SETTINGS)
     except Exception:
         found = None
 
     if found:
-        now = datetime.now()
-        one_year = now + timedelta(days=365)
-        valid_dates = [dt for _, dt in found if now <= dt <= one_year]
+        valid_dates = []
+        for _, dt in found:
+            now = datetime.now(dt.tzinfo)
+            if now <= dt <= now + timedelta(days=365):
+                valid_dates.append(dt)
         if not valid_dates:
-            valid_dates = [dt for _, dt in found if dt <= one_year]
+            valid_dates = [dt for _, dt in found if dt <= datetime.now(dt.tzinfo) + timedelta(days=365)]
         if valid_dates:
-            earliest = min(valid_dates)
-            return earliest.isoformat()
+            earliest = min(valid_dates, key=lambda dt: dt.timestamp())
+            return earliest.isoformat(), "dateparser"
 
     #Fallback manual logic
-    lower = text.lower()
+    lower = analysis.masked_lower
     today = datetime.now().replace(second=0, microsecond=0)
     base_date = None
 
@@ -123,7 +177,7 @@ def extract_datetime(text: str) -> Optional[str]:
 
     # if no relative found, stop
     if not base_date:
-        return None
+        return None, "none"
 
     # Find time (e.g. 3pm, 3 pm, 9:30 am)
     time_match = re.search(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b", lower)
@@ -140,28 +194,39 @@ def extract_datetime(text: str) -> Optional[str]:
         base_date = base_date.replace(hour=hour, minute=minute)
 
     else:
-        return None
-
-    return base_date.isoformat()
+        return None, "none"
 
+    return base_date.isoformat(), "fallback"
 
 
-def extract_name_city(text: str) -> Tuple[Optional[str], Optional[str]]:
-    name, city = None, None
 
+def extract_name_city(text: Transcript) -> Tuple[Optional[str], Optional[str]]:
+    text = analyze(text).text
+    ents = []
+    ner = registry.get("ner")
     if ner is not None:
         try:
-            ents = ner(text)
-            for e in ents:
-                label = e.get("entity_group", "").upper().strip()
-                word = e.get("word", "").strip().strip(",.")
-                # Handle multi-word entities and punctuation cleanly
-                if label in ("PER", "PERSON"):
-                    name = (name + " " + word).strip() if name else word
-                elif label in ("LOC", "GPE", "CITY", "LOCATION"):
-                    city = (city + " " + word).strip() if city else word
+            with stage("ner"):
+                ents = ner(text)
         except Exception as ex:
-            logger.info("[warn] NER extraction failed:", ex)
+            logger.info(f"[warn] NER extraction failed: {ex}")
+            MODEL_ERRORS.inc("ner", "inference")
+            ents = []
+    return _name_city_from_ner(text, ents)
+
+
+def _name_city_from_ner(text: str, ents: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+    """Turn raw NER pipeline output for text into (name, city), with regex fallbacks."""
+    name, city = None, None
+
+    for e in ents or []:
+        label = e.get("entity_group", "").upper().strip()
+        word = e.get("word", "").strip().strip(",.")
+        # Handle multi-word entities and punctuation cleanly
+        if label in ("PER", "PERSON"):
+            name = (name + " " + word).strip() if name else word
+        elif label in ("LOC", "GPE", "CITY", "LOCATION"):
+            city = (city + " " + word).strip() if city else word
 
     # Regex fallbacks
     if not name:
@@ -180,118 +245,237 @@ def extract_name_city(text: str) -> Tuple[Optional[str], Optional[str]]:
 
 
 
-def extract_lead_id(text: str):
-    if not text:
-        return None
-    
-    #Remove any detected phone numbers from the text
-    try:
-        for match in phonenumbers.PhoneNumberMatcher(text, "IN"):
-            phone_raw = match.raw_string
-            text = text.replace(phone_raw, "")
-    except Exception:
-        pass
+_HEX_ID_RE = re.compile(r"[a-f0-9]+")
 
-    text_lower = text.lower()
 
-    # Alphanumeric ID (UUID-like or short hex)
-    match = re.search(r"\b[a-fA-F0-9]{4,36}\b", text)
-    if match:
-        candidate = match.group(0)
-        # ensure it's not the full text itself
-        if candidate.strip().lower() != text_lower:
-            return candidate
+def extract_lead_id(text: Transcript):
+    analysis = analyze(text)
+    if not analysis.text:
+        return None
+
+    # Alphanumeric ID (UUID-like or short hex): the first whole token of 4-36
+    # hex digits that is not part of a detected phone number
+    for start, end, token in analysis.tokens:
+        if 4 <= len(token) <= 36 and _HEX_ID_RE.fullmatch(token) and not analysis.in_phone(start, end):
+            # ensure it's not the full text itself
+            if token != analysis.masked_lower:
+                return analysis.text[start:end]
+            return None
 
     return None
 
 
-def extract_source(text: str) -> Optional[str]:
-    if not text:
+# Source keyword -> source; on several hits the keyword listed first wins
+SOURCE_KEYWORDS = {
+    "instagram": "Instagram",
+    "insta": "Instagram",
+    "facebook": "Facebook",
+    "fb": "Facebook",
+    "linkedin": "LinkedIn",
+    "linkedin.com": "LinkedIn",
+    "google": "Google",
+    "whatsapp": "WhatsApp",
+    "wa.me": "WhatsApp",
+    "website": "Website",
+    "form": "Website",
+    "walk-in": "Walk-in",
+    "walk in": "Walk-in",
+    "referral": "Referral",
+    "refer": "Referral",
+    "call": "Call",
+    "phone": "Call",
+}
+
+# Whole-word matching, so "fb" no longer fires inside other words
+SOURCE_AUTOMATON = KeywordAutomaton(
+    (keyword, (priority, label)) for priority, (keyword, label) in enumerate(SOURCE_KEYWORDS.items())
+).build()
+
+
+def extract_source(text: Transcript) -> Optional[str]:
+    analysis = analyze(text)
+    if not analysis.text:
         return None
 
-    text_lower = text.lower()
-
-    SOURCE_KEYWORDS = {
-        "instagram": "Instagram",
-        "insta": "Instagram",
-        "facebook": "Facebook",
-        "fb": "Facebook",
-        "linkedin": "LinkedIn",
-        "linkedin.com": "LinkedIn",
-        "google": "Google",
-        "whatsapp": "WhatsApp",
-        "wa.me": "WhatsApp",
-        "website": "Website",
-        "form": "Website",
-        "walk-in": "Walk-in",
-        "walk in": "Walk-in",
-        "referral": "Referral",
-        "refer": "Referral",
-        "call": "Call",
-        "phone": "Call",
-    }
-
-    for keyword, label in SOURCE_KEYWORDS.items():
-        if keyword in text_lower:
-            return label
-        
-
-    match = re.search(r"(instagram\.com|linkedin\.com|facebook\.com|wa\.me|whatsapp\.com)", text_lower)
-    if match:
-        if "instagram" in match.group(1):
-            return "Instagram"
-        if "linkedin" in match.group(1):
-            return "LinkedIn"
-        if "facebook" in match.group(1):
-            return "Facebook"
-        if "whatsapp" in match.group(1) or "wa.me" in match.group(1):
-            return "WhatsApp"
-
-    return None
+    hits = SOURCE_AUTOMATON.find_all(analysis.text)
+    if not hits:
+        return None
+    _, label = min(hit.label for hit in hits)
+    return label
 
 
-def extract_status(text: str) -> Optional[Dict[str, float]]:
+def _status_detail(res: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: res.get(k) for k in ("label", "confidence", "margin", "method")}
 
-    STATUS_LABELS = ["NEW", "IN_PROGRESS", "FOLLOW_UP", "WON", "LOST"]
 
+def classify_transcript_status(text: Transcript) -> Optional[Dict[str, Any]]:
+    """The status stage: {label, confidence, margin, method}; only the label reaches the entities."""
+    text = analyze(text).text
     if not text or not text.strip():
         return None
 
-    if status_classifier is None:
-        return None
-
     try:
-        result = status_classifier(text, candidate_labels=STATUS_LABELS)
-        # Return label with highest confidence
-        return result["labels"][0]
+        # Prototype kNN on the encoder (BART zero-shot only as configured fallback)
+        return _status_detail(classify_status(text))
     except Exception as e:
         logger.info(f"[error] extract_status failed: {e}")
-        return "UNKNOWN"
+        MODEL_ERRORS.inc("status", "inference")
+        return {"label": "UNKNOWN", "confidence": None, "margin": None, "method": "error"}
 
 
-# Unified interface
-def extract_entities_basic(text: str) -> Dict[str, Optional[Any]]:
-    """Extracts core entities and returns a normalized dict."""
-    name, city = extract_name_city(text)
-    phone = extract_phone(text)
-    email = extract_email(text)
-    datetime_str = extract_datetime(text)
-    lead_id = extract_lead_id(text)
-    status = extract_status(text)
-    source = extract_source(text)
+def extract_status(text: Transcript) -> Optional[str]:
+    detail = classify_transcript_status(text)
+    return detail["label"] if detail is not None else None
 
+
+# Extractor registry: stage name -> extractor. The pipeline (sync, batch or
+# async) runs these stages and assembles their outputs with assemble_entities.
+EXTRACTORS = {
+    "name_city": extract_name_city,
+    "phone": extract_phone,
+    "email": extract_email,
+    "visit_time": extract_datetime,
+    "lead_id": extract_lead_id,
+    "status": classify_transcript_status,
+    "source": extract_source,
+}
+
+
+def assemble_entities(stage_results: Dict[str, Any]) -> Dict[str, Optional[Any]]:
+    """Build the normalized entity dict from per-stage outputs; missing stages become None."""
+    name, city = stage_results.get("name_city") or (None, None)
+    status = stage_results.get("status")
     return {
         "name": name,
         "city": city,
-        "phone": phone,
-        "email": email,
-        "visit_time": datetime_str,
-        "lead_id": lead_id,
-        "status": status,
-        "source": source,
+        "phone": stage_results.get("phone"),
+        "email": stage_results.get("email"),
+        "visit_time": stage_results.get("visit_time"),
+        "lead_id": stage_results.get("lead_id"),
+        "status": status["label"] if isinstance(status, dict) else status,
+        "source": stage_results.get("source"),
     }
 
 
+def stage_details(stage_results: Dict[str, Any]) -> Dict[str, Any]:
+    """What the stages know beyond the entities (status confidence, margin and method), for debug output."""
+    status = stage_results.get("status")
+    return {"status": status} if isinstance(status, dict) else {}
+
+
+# Entity field -> extractor stage that fills it
+FIELD_STAGES = {
+    "name": "name_city",
+    "city": "name_city",
+    "phone": "phone",
+    "email": "email",
+    "visit_time": "visit_time",
+    "lead_id": "lead_id",
+    "status": "status",
+    "source": "source",
+}
+
+# Stages backed by a transformer model; the rest are cheap rule-based extractors
+MODEL_STAGES = ("name_city", "status")
+
+
+# Extraction planner
+def plan_extractors(intent: Optional[str] = None) -> List[str]:
+    """
+    Extractor stages needed for an intent, from REQUIRED_FIELDS + OPTIONAL_FIELDS.
+    Unknown (or not yet detected) intents get the full plan.
+    """
+    if intent not in REQUIRED_FIELDS:
+        return list(EXTRACTORS)
+    fields = REQUIRED_FIELDS[intent] + OPTIONAL_FIELDS.get(intent, [])
+    needed = {FIELD_STAGES[f] for f in fields}
+    return [stage for stage in EXTRACTORS if stage in needed]
+
+
+# Unified interface
+def extract_entities_basic(text: str, plan: Optional[List[str]] = None, details: Optional[Dict[str, Any]] = None) -> Dict[str, Optional[Any]]:
+    """Extracts core entities and returns a normalized dict. Stages outside plan are skipped (None); details gets stage_details."""
+    stages = EXTRACTORS if plan is None else plan
+    with stage("analysis"):
+        analysis = analyze(text)
+    results = {}
+    for name in stages:
+        with stage(name):
+            results[name] = EXTRACTORS[name](analysis)
+    if details is not None:
+        details.update(stage_details(results))
+    return assemble_entities(results)
+
+
+def extract_entities_batch(texts: List[str], plans: Optional[List[List[str]]] = None,
+                           details: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Optional[Any]]]:
+    """
+    Batched extract_entities_basic: one NER call and one status-classifier call for the whole batch.
+    plans optionally gives each item's extractor stages; NER and status only see items that need them.
+    details, if given, gets each item's stage_details appended.
+    """
+    if not texts:
+        return []
+    if plans is None:
+        plans = [list(EXTRACTORS)] * len(texts)
+
+    non_empty = [i for i, t in enumerate(texts) if t and t.strip()]
+
+    # NER over every transcript that needs name/city, at once
+    ner_out = [[] for _ in texts]
+    todo = [i for i in non_empty if "name_city" in plans[i]]
+    ner = registry.get("ner") if todo else None
+    if ner is not None and todo:
+        try:
+            with stage("ner"):
+                batch_ents = ner([texts[i] for i in todo])
+            for i, ents in zip(todo, batch_ents):
+                ner_out[i] = ents
+        except Exception as ex:
+            logger.info(f"[warn] Batched NER failed, retrying per item: {ex}")
+            MODEL_ERRORS.inc("ner", "inference")
+            for i in todo:
+                try:
+                    with stage("ner"):
+                        ner_out[i] = ner(texts[i])
+                except Exception as item_ex:
+                    logger.info(f"[warn] NER extraction failed: {item_ex}")
+                    MODEL_ERRORS.inc("ner", "inference")
+
+    # Status over every transcript that needs it, at once
+    statuses = [None] * len(texts)
+    todo = [i for i in non_empty if "status" in plans[i]]
+    if todo:
+        try:
+            with stage("status"):
+                batch_status = classify_status_batch([texts[i] for i in todo])
+            for i, res in zip(todo, batch_status):
+                statuses[i] = _status_detail(res)
+        except Exception as e:
+            logger.info(f"[error] Batched extract_status failed, retrying per item: {e}")
+            MODEL_ERRORS.inc("status", "inference")
+            for i in todo:
+                statuses[i] = classify_transcript_status(texts[i])
+
+    out = []
+    for text, plan, ents, status in zip(texts, plans, ner_out, statuses):
+        stage_results = {}
+        with stage("analysis"):
+            analysis = analyze(text)
+        for name in plan:
+            if name == "name_city":
+                stage_results[name] = _name_city_from_ner(analysis.text, ents)
+            elif name == "status":
+                stage_results[name] = status
+            else:
+                with stage(name):
+                    stage_results[name] = EXTRACTORS[name](analysis)
+        out.append(assemble_entities(stage_results))
+        if details is not None:
+            details.append(stage_details(stage_results))
+    return out
+
+
 # CLI (FOR TESTING)
 if __name__ == "__main__":
     import argparse, json
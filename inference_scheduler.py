@@ -0,0 +1,206 @@
+# inference_scheduler.py
+"""
+Dynamic micro-batching in front of the model pipeline.
+
+Requests that arrive within a short window (or until the batch is full) are
+collected and handed to a dedicated model worker thread as one batch, so the
+encoder, NER and zero-shot models run once per batch instead of once per
+request from FastAPI's threadpool.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+from logger_config import logger
+import telemetry
+
+# Scheduler config
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "8"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "512"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "1"))
+
+_DELAY_SAMPLES = 2048  # recent queueing delays kept for percentiles
+_POLL_S = 0.05  # how often an idle worker checks whether stop() was called
+
+
+class SchedulerOverloaded(Exception):
+    """Raised by submit() when the request queue is full."""
+
+
+class _Pending:
+    __slots__ = ("payload", "future", "enqueued_at")
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """Collects submitted payloads into micro-batches and runs batch_fn on worker threads."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        window_ms: float = BATCH_WINDOW_MS,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_queue: int = BATCH_MAX_QUEUE,
+        workers: int = BATCH_WORKERS,
+    ):
+        self.batch_fn = batch_fn
+        self.window_s = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[_Pending]" = queue.Queue(maxsize=max(1, max_queue))
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        # metrics
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._delays = deque(maxlen=_DELAY_SAMPLES)
+        self._submitted = 0
+        self._rejected = 0
+        self._failed_batches = 0
+
+    # lifecycle
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"inference-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(
+            f"[scheduler] Started {self.workers} worker(s): window={self.window_s * 1000:.1f}ms "
+            f"max_batch={self.max_batch_size} max_queue={self._queue.maxsize}"
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self._running:
+            return
+        # workers poll the queue with a timeout and exit once they see _running is off
+        # (no sentinels: those could be dropped by a full queue or taken by another worker)
+        self._running = False
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+        # fail whatever is still queued rather than leaving callers waiting
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not pending.future.done():
+                pending.future.set_exception(SchedulerOverloaded("Inference scheduler stopped."))
+        logger.info("[scheduler] Stopped")
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    # submission
+    def submit(self, payload: Any) -> Future:
+        """Queue one payload; the returned Future resolves to its entry of batch_fn's output."""
+        pending = _Pending(payload)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise SchedulerOverloaded(f"Inference queue is full ({self._queue.maxsize} pending requests).")
+        with self._lock:
+            self._submitted += 1
+        return pending.future
+
+    # worker loop
+    def _collect(self) -> List[_Pending]:
+        try:
+            first = self._queue.get(timeout=_POLL_S)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self) -> None:
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._delays.extend(started - p.enqueued_at for p in batch)
+
+            try:
+                with telemetry.traced() as timings:
+                    results = self.batch_fn([p.payload for p in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} inputs")
+            except Exception as e:
+                logger.info(f"[scheduler] Batch of {len(batch)} failed: {e}")
+                with self._lock:
+                    self._failed_batches += 1
+                for p in batch:
+                    p.future.set_exception(e)
+                continue
+
+            for p, res in zip(batch, results):
+                # Per-request breakdown: this request's queueing delay plus its batch's stages (ms)
+                queued_s = started - p.enqueued_at
+                telemetry.record("queue", queued_s)
+                p.future.stage_timings = {"queue": queued_s * 1000.0, **timings}
+                p.future.set_result(res)
+
+    # metrics
+    def stats(self) -> dict:
+        with self._lock:
+            delays_ms = sorted(d * 1000.0 for d in self._delays)
+            sizes = dict(sorted(self._batch_sizes.items()))
+            batches = sum(sizes.values())
+            items = sum(size * count for size, count in sizes.items())
+            submitted, rejected, failed = self._submitted, self._rejected, self._failed_batches
+
+        def pct(p: float) -> float:
+            if not delays_ms:
+                return 0.0
+            return delays_ms[min(len(delays_ms) - 1, int(p * len(delays_ms)))]
+
+        return {
+            "config": {
+                "window_ms": self.window_s * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "max_queue": self._queue.maxsize,
+                "workers": self.workers,
+            },
+            "queue_depth": self._queue.qsize(),
+            "submitted": submitted,
+            "rejected": rejected,
+            "failed_batches": failed,
+            "batches": batches,
+            "mean_batch_size": (items / batches) if batches else 0.0,
+            "batch_size_distribution": sizes,
+            "queue_delay_ms": {
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+                "max": delays_ms[-1] if delays_ms else 0.0,
+            },
+        }
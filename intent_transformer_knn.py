@@ -1,19 +1,27 @@
 # intent_verbs_knn.py
 
-from sentence_transformers import SentenceTransformer
-from sklearn.neighbors import NearestNeighbors
 import numpy as np
 import json
 import argparse
+from typing import List, Tuple
+
+from knn_index import FusedIntentIndex
+from keyword_automaton import KeywordAutomaton, KeywordHit
+from embedding_store import load_or_build, artifact_set_dir
+from model_registry import registry
+from encoder_backends import create_encoder, EMBED_BACKEND
+from telemetry import stage
 
 from syntheticData.verb_intent_data import INTENT_VERBS
 from syntheticData.keyword_intent_data import INTENT_KEYWORDS
-from syntheticData.regex_parser import regex_score
+from syntheticData.regex_parser import regex_score, regex_score_many
 
 from logger_config import logger
 
 import logging
 import os
+import threading
+from collections import OrderedDict
 
 logging.getLogger("transformers").setLevel(logging.ERROR)
 logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
@@ -26,9 +34,7 @@ tqdm.tqdm = lambda *args, **kwargs: iter(args[0])
 # Model config
 EMBED_MODEL_NAME = "all-mpnet-base-v2"
 K = 4  # neighbors for each index
-
-logger.info("[info] Loading embedding model {EMBED_MODEL_NAME}")
-model = SentenceTransformer(EMBED_MODEL_NAME)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))  # 0 disables the cache
 
 # Building verb indices
 verbs = []
@@ -38,10 +44,6 @@ for intent, vlist in INTENT_VERBS.items():
         verbs.append(v)
         verb_labels.append(intent)
 
-verb_embs = model.encode(verbs, normalize_embeddings=True)
-nn_verbs = NearestNeighbors(n_neighbors=min(K, len(verbs)), metric="cosine")
-nn_verbs.fit(verb_embs)
-
 # Building keyword indices
 keywords = []
 kw_labels = []
@@ -50,58 +52,168 @@ for intent, klist in INTENT_KEYWORDS.items():
         keywords.append(k)
         kw_labels.append(intent)
 
-kw_embs = model.encode(keywords, normalize_embeddings=True)
-nn_keywords = NearestNeighbors(n_neighbors=min(K, len(keywords)), metric="cosine")
-nn_keywords.fit(kw_embs)
+REFERENCE_VOCABULARIES = {"verbs": verbs, "keywords": keywords}
+INTENTS = list(INTENT_VERBS.keys())
+
+# Whole-word literal hits of any verb or keyword, in one pass over the transcript
+VOCABULARY_AUTOMATON = KeywordAutomaton(list(zip(verbs, verb_labels)) + list(zip(keywords, kw_labels))).build()
 
 
-INTENTS = list(INTENT_VERBS.keys())
+# Reference embeddings depend on the encoder backend as well as the model
+EMBED_MODEL_ID = EMBED_MODEL_NAME if EMBED_BACKEND == "sentence-transformers" else f"{EMBED_MODEL_NAME}@{EMBED_BACKEND}"
+
+
+# Model loading (lazy, through the model registry)
+def _load_encoder():
+    return create_encoder(EMBED_MODEL_NAME, EMBED_BACKEND)
+
+
+def _build_intent_index():
+    # Reference embeddings: memory-mapped from the prebuilt artifact when the
+    # vocabulary/model hash matches, otherwise encoded once and saved
+    reference_embs = load_or_build(
+        EMBED_MODEL_ID,
+        REFERENCE_VOCABULARIES,
+        lambda tokens: get_encoder().encode(tokens, normalize_embeddings=True),
+        artifact_dir=artifact_set_dir("intent"),
+    )
+    # One fused index over both vocabularies
+    return (
+        FusedIntentIndex(INTENTS, K)
+        .add("verbs", verbs, verb_labels, reference_embs["verbs"])
+        .add("keywords", keywords, kw_labels, reference_embs["keywords"])
+        .build()
+    )
+
+
+registry.register("encoder", _load_encoder)
+registry.register("intent_index", _build_intent_index)
+
+
+def get_encoder():
+    encoder = registry.get("encoder")
+    if encoder is None:
+        raise RuntimeError(f"Embedding model {EMBED_MODEL_NAME} ({EMBED_BACKEND}) is not available")
+    return encoder
+
+
+def get_intent_index() -> FusedIntentIndex:
+    index = registry.get("intent_index")
+    if index is None:
+        raise RuntimeError("Intent kNN index is not available")
+    return index
+
+
+# Embedding cache
+class EmbeddingCache:
+    """Bounded, thread-safe LRU of transcript embeddings with hit/miss counters."""
+
+    def __init__(self, maxsize: int = EMBED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            emb = self._data.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, key: str, emb: np.ndarray) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = emb
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+embedding_cache = EmbeddingCache()
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a transcript: stripped, with internal whitespace collapsed."""
+    return " ".join((text or "").split())
+
+
+def embed_text(text: str) -> np.ndarray:
+    """Return the (1, dim) normalized embedding for text, encoding at most once per cache entry."""
+    key = normalize_text(text)
+    emb = embedding_cache.get(key)
+    if emb is None:
+        with stage("encode"):
+            emb = np.array(get_encoder().encode([key], normalize_embeddings=True))
+        emb.setflags(write=False)
+        embedding_cache.put(key, emb)
+    return emb
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Return an (n, dim) matrix of normalized embeddings; cache misses are encoded in one batch."""
+    keys = [normalize_text(t) for t in texts]
+    rows = [embedding_cache.get(key) for key in keys]
+
+    missing = list(dict.fromkeys(key for key, row in zip(keys, rows) if row is None))
+    if missing:
+        with stage("encode"):
+            fresh = np.array(get_encoder().encode(missing, normalize_embeddings=True))
+        encoded = {}
+        for key, vec in zip(missing, fresh):
+            emb = vec.reshape(1, -1)
+            emb.setflags(write=False)
+            embedding_cache.put(key, emb)
+            encoded[key] = emb
+        rows = [row if row is not None else encoded[key] for key, row in zip(keys, rows)]
+
+    if not rows:
+        return np.zeros((0, get_encoder().get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.vstack(rows)
+
 
 # KNN SCORING
-def _knn_score_from_index(text: str, nn: NearestNeighbors, ref_list, ref_labels, k: int = K, debug=False, debug_prefix=""):
-    emb = model.encode([text], normalize_embeddings=True)
-    emb = np.array(emb)
-    k_use = min(k, len(ref_list))
-    dists, idxs = nn.kneighbors(emb, n_neighbors=k_use, return_distance=True)
-    dists = dists[0]
-    idxs = idxs[0]
-    sims = 1.0 - dists
-    sims = np.clip(sims, 0.0, None) 
-
-    if debug:
-        logger.info(f"\n[debug {debug_prefix}] nearest neighbors (rank, token, intent, sim):")
-        for rank, (idx, sim) in enumerate(zip(idxs, sims), start=1):
-            token = ref_list[idx]
-            label = ref_labels[idx]
-            logger.info(f"  {rank:>2}. {token!r:<25} ({label})   sim={sim:.4f}")
-        logger.info()
-
-    agg = {intent: 0.0 for intent in INTENTS}
-    for sim, idx in zip(sims, idxs):
-        label = ref_labels[idx]
-        agg[label] += float(sim)
-
-    total = sum(agg.values())
-    if total <= 0:
-        uniform = 1.0 / len(agg)
-        return {intent: uniform for intent in agg}
+def _log_neighbors(emb: np.ndarray, k: int) -> None:
+    for name, (sims, idxs) in get_intent_index().neighbors(emb, k).items():
+        ref_list = verbs if name == "verbs" else keywords
+        ref_labels = verb_labels if name == "verbs" else kw_labels
+        logger.info(f"\n[debug {name.upper()}] nearest neighbors (rank, token, intent, sim):")
+        for rank, (idx, sim) in enumerate(zip(idxs[0], sims[0]), start=1):
+            logger.info(f"  {rank:>2}. {ref_list[idx]!r:<25} ({ref_labels[idx]})   sim={sim:.4f}")
 
-    # normalize
-    return {intent: float(score / total) for intent, score in agg.items()}
 
-# Combined scoring algorithm: average of verb, keyword and regex scores
-def score_intents_avg(text: str, k: int = K, verbose: bool = False):
-    verb_scores = _knn_score_from_index(text, nn_verbs, verbs, verb_labels, k=k, debug=verbose, debug_prefix="VERB")
-    kw_scores = _knn_score_from_index(text, nn_keywords, keywords, kw_labels, k=k, debug=verbose, debug_prefix="KW")
-    regex_scores, regex_matches = regex_score(text, per_match_score=0.5, max_per_intent=2.0)
-    if verbose:
-        logger.info("[debug] regex_scores: %s", {k: round(v, 3) for k, v in regex_scores.items()})
-        if regex_matches:
-            logger.info("[debug] regex_matches: %s", regex_matches)
-        else:
-            logger.info("[debug] regex_matches: None")
+def _knn_scores(embs: np.ndarray, k: int = K) -> Tuple[List[dict], List[dict]]:
+    """Verb and keyword kNN scores for every row of embs, from one fused-index query."""
+    if len(embs) == 0:
+        return [], []
+    with stage("knn"):
+        scores = get_intent_index().score(embs, k)
+    return scores["verbs"], scores["keywords"]
 
 
+def _combine_scores(verb_scores: dict, kw_scores: dict, regex_scores: dict) -> dict:
     combined_raw = {intent: 0.0 for intent in INTENTS}
     for intent in INTENTS:
         v = verb_scores.get(intent, 0.0)
@@ -113,13 +225,61 @@ def score_intents_avg(text: str, k: int = K, verbose: bool = False):
     total = sum(combined_raw.values())
     if total <= 0:
         uniform = 1.0 / len(INTENTS)
-        combined = {intent: uniform for intent in INTENTS}
-    else:
-        combined = {intent: float(combined_raw[intent] / total) for intent in INTENTS}
+        return {intent: uniform for intent in INTENTS}
+    return {intent: float(combined_raw[intent] / total) for intent in INTENTS}
+
+
+# Lexical signal: literal vocabulary hits, no encoder involved
+def vocabulary_hits(text: str) -> List[KeywordHit]:
+    return VOCABULARY_AUTOMATON.find_all(text)
+
+
+def lexical_scores(text: str) -> dict:
+    """Per-intent share of the whole-word verb/keyword hits in text (all zeros if none)."""
+    counts = {intent: 0.0 for intent in INTENTS}
+    for hit in vocabulary_hits(text):
+        counts[hit.label] += 1.0
+    total = sum(counts.values())
+    if total <= 0:
+        return counts
+    return {intent: counts[intent] / total for intent in INTENTS}
+
+
+# Combined scoring algorithm: average of verb, keyword and regex scores
+def score_intents_avg(text: str, k: int = K, verbose: bool = False):
+    # One encoder pass shared by both indexes
+    emb = embed_text(text)
+    if verbose:
+        _log_neighbors(emb, k)
+    (verb_scores,), (kw_scores,) = _knn_scores(emb, k=k)
+    with stage("regex"):
+        regex_scores, regex_matches = regex_score(text, per_match_score=0.5, max_per_intent=2.0)
+    if verbose:
+        logger.info("[debug] regex_scores: %s", {k: round(v, 3) for k, v in regex_scores.items()})
+        if regex_matches:
+            logger.info("[debug] regex_matches: %s", regex_matches)
+        else:
+            logger.info("[debug] regex_matches: None")
+        logger.info("[debug] vocabulary_hits: %s", [(h.keyword, h.label) for h in vocabulary_hits(text)])
 
+    combined = _combine_scores(verb_scores, kw_scores, regex_scores)
     return verb_scores, kw_scores, regex_scores, combined
 
 
+def score_intents_batch(texts: List[str], k: int = K) -> List[tuple]:
+    """Batched score_intents_avg: one encode call and one fused kNN matrix query for all texts."""
+    embs = embed_texts(texts)
+    verb_batch, kw_batch = _knn_scores(embs, k=k)
+
+    with stage("regex"):
+        regex_batch = regex_score_many(texts, per_match_score=0.5, max_per_intent=2.0)
+
+    results = []
+    for verb_scores, kw_scores, (regex_scores, _) in zip(verb_batch, kw_batch, regex_batch):
+        results.append((verb_scores, kw_scores, regex_scores, _combine_scores(verb_scores, kw_scores, regex_scores)))
+    return results
+
+
 
 # CLI (FOR TESTING)
 if __name__ == "__main__":
@@ -135,6 +295,7 @@ if __name__ == "__main__":
         "verb_scores": {k: round(v, 3) for k, v in v_s.items()},
         "keyword_scores": {k: round(v, 3) for k, v in k_s.items()},
         "regex_scores": {k: round(v, 3) for k, v in r_s.items()},
+        "lexical_scores": {k: round(v, 3) for k, v in lexical_scores(args.text).items()},
         "combined_final": {k: round(v, 3) for k, v in combined.items()}
     }
 
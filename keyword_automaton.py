@@ -0,0 +1,111 @@
+# keyword_automaton.py
+"""
+Word-boundary-aware multi-keyword matcher (Aho-Corasick).
+
+Built once from (keyword, label) pairs; find_all scans a transcript in one
+linear pass and returns every whole-word hit, whatever the number of keywords.
+Matching is case-insensitive. A hit only counts if the characters around it
+are not word characters, so "fb" does not fire inside "fbi" or "offbeat".
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class KeywordHit(NamedTuple):
+    start: int
+    end: int
+    keyword: str
+    label: Any
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _fold(text: str) -> str:
+    """Lowercase without changing length, so hit offsets index the original text."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over lowercased keywords; each keyword may carry several labels."""
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, Any]]] = [[]]
+        self._built = False
+        for keyword, label in entries:
+            self.add(keyword, label)
+
+    def add(self, keyword: str, label: Any) -> "KeywordAutomaton":
+        if self._built:
+            raise RuntimeError("KeywordAutomaton is already built")
+        keyword = _fold(keyword.strip())
+        if not keyword:
+            return self
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        if (keyword, label) not in self._out[state]:
+            self._out[state].append((keyword, label))
+        return self
+
+    def build(self) -> "KeywordAutomaton":
+        """Compute failure links (breadth first) and merge the outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def find_all(self, text: Optional[str]) -> List[KeywordHit]:
+        """Every whole-word keyword hit in text, ordered by end offset (longer keywords first)."""
+        if not self._built:
+            self.build()
+        if not text:
+            return []
+
+        goto, fail, out = self._goto, self._fail, self._out
+        folded = _fold(text)
+        n = len(folded)
+        hits = []
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < n and _is_word_char(folded[end]):
+                continue
+            # outputs were merged along the failure chain, so the longest keyword comes first
+            for keyword, label in out[state]:
+                start = end - len(keyword)
+                if start > 0 and _is_word_char(folded[start - 1]):
+                    continue
+                hits.append(KeywordHit(start, end, text[start:end], label))
+        return hits
+
+    def labels(self, text: Optional[str]) -> List[Any]:
+        """Labels of every hit, in hit order."""
+        return [hit.label for hit in self.find_all(text)]
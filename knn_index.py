@@ -0,0 +1,131 @@
+# knn_index.py
+"""
+Fused, vectorized cosine kNN index over the intent vocabularies.
+
+Holds every reference matrix (verbs, keywords, ...) in one float32 contiguous
+matrix with integer label codes. Scoring a batch of query vectors is one
+matmul, an argpartition per vocabulary and an np.bincount aggregation.
+
+The arithmetic mirrors sklearn's NearestNeighbors(metric="cosine") brute-force
+path (normalize, 1 - dot, clip, argpartition + argsort) and the per-intent
+aggregation previously done in Python, so single-query scores are identical
+to the sklearn-based implementation.
+"""
+
+import mmap
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def shared_copy(arr: np.ndarray) -> np.ndarray:
+    """Read-only copy of arr in an anonymous MAP_SHARED mapping: forked workers map the same pages."""
+    arr = np.ascontiguousarray(arr)
+    buf = mmap.mmap(-1, max(arr.nbytes, 1), flags=mmap.MAP_SHARED)
+    out = np.frombuffer(buf, dtype=arr.dtype, count=arr.size).reshape(arr.shape)
+    out[...] = arr
+    out.setflags(write=False)
+    return out
+
+
+def _l2_normalize(X: np.ndarray) -> np.ndarray:
+    # Same steps as sklearn.preprocessing.normalize(X, norm="l2") for dense input
+    norms = np.sqrt(np.einsum("ij,ij->i", X, X))
+    norms[norms < 10 * np.finfo(norms.dtype).eps] = 1.0
+    return X / norms[:, None]
+
+
+class FusedIntentIndex:
+    """Cosine kNN over several labelled vocabularies, scored per intent in one pass."""
+
+    def __init__(self, intents: Sequence[str], k: int):
+        self.intents = list(intents)
+        self.k = k
+        self._codes = {intent: i for i, intent in enumerate(self.intents)}
+        self.names: List[str] = []
+        self.spans: Dict[str, Tuple[int, int]] = {}
+        self.tokens: List[str] = []
+        self._blocks: List[np.ndarray] = []
+        self._label_blocks: List[np.ndarray] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.label_codes = np.zeros(0, dtype=np.intp)
+
+    def add(self, name: str, tokens: Sequence[str], labels: Sequence[str], embeddings: np.ndarray) -> "FusedIntentIndex":
+        """Add a vocabulary block; call build() once every block is added."""
+        if len(tokens) != len(labels) or len(tokens) != len(embeddings):
+            raise ValueError(f"Vocabulary '{name}' has mismatched tokens/labels/embeddings lengths")
+        start = len(self.tokens)
+        self.names.append(name)
+        self.spans[name] = (start, start + len(tokens))
+        self.tokens.extend(tokens)
+        self._blocks.append(np.asarray(embeddings, dtype=np.float32))
+        self._label_blocks.append(np.array([self._codes[label] for label in labels], dtype=np.intp))
+        return self
+
+    def build(self) -> "FusedIntentIndex":
+        self.matrix = np.ascontiguousarray(_l2_normalize(np.vstack(self._blocks)), dtype=np.float32)
+        self.label_codes = np.concatenate(self._label_blocks)
+        self._blocks, self._label_blocks = [], []
+        return self
+
+    def share(self) -> "FusedIntentIndex":
+        """Move the built matrices into shared memory (before forking workers)."""
+        self.matrix = shared_copy(self.matrix)
+        self.label_codes = shared_copy(self.label_codes)
+        return self
+
+    def labels(self, name: str) -> List[str]:
+        start, end = self.spans[name]
+        return [self.intents[c] for c in self.label_codes[start:end]]
+
+    def neighbors(self, queries: np.ndarray, k: int = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Per vocabulary: (sims, idxs) of shape (n_queries, k), nearest first; idxs are block-relative."""
+        k = self.k if k is None else k
+        Q = _l2_normalize(np.asarray(queries, dtype=np.float32))
+
+        # cosine distance, as sklearn computes it
+        D = Q @ self.matrix.T
+        D *= -1
+        D += 1
+        D = np.clip(D, 0.0, 2.0)
+
+        out = {}
+        rows = np.arange(D.shape[0])[:, None]
+        for name in self.names:
+            start, end = self.spans[name]
+            block = D[:, start:end]
+            k_use = min(k, end - start)
+            idxs = np.argpartition(block, k_use - 1, axis=1)[:, :k_use]
+            idxs = idxs[rows, np.argsort(block[rows, idxs])]
+            sims = np.clip(1.0 - block[rows, idxs], 0.0, None)
+            out[name] = (sims, idxs)
+        return out
+
+    def score(self, queries: np.ndarray, k: int = None) -> Dict[str, List[Dict[str, float]]]:
+        """Normalized per-intent neighbor-similarity scores for every query, per vocabulary."""
+        n_intents = len(self.intents)
+        out = {}
+        for name, (sims, idxs) in self.neighbors(queries, k).items():
+            start, _ = self.spans[name]
+            codes = self.label_codes[start + idxs]
+
+            # Per-row bincount in one call: offset each row's codes into its own bin range
+            n = sims.shape[0]
+            flat_codes = (codes + np.arange(n)[:, None] * n_intents).ravel()
+            agg = np.bincount(flat_codes, weights=sims.ravel().astype(np.float64), minlength=n * n_intents)
+            agg = agg.reshape(n, n_intents)
+
+            # Sum intents left to right, like sum(dict.values())
+            total = np.zeros(n)
+            for c in range(n_intents):
+                total = total + agg[:, c]
+
+            rows = []
+            for r in range(n):
+                if total[r] <= 0:
+                    uniform = 1.0 / n_intents
+                    rows.append({intent: uniform for intent in self.intents})
+                else:
+                    rows.append({intent: float(agg[r, c] / total[r]) for c, intent in enumerate(self.intents)})
+            out[name] = rows
+        return out
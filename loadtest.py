@@ -0,0 +1,361 @@
+# loadtest.py
+"""
+Sustained-load harness for the bot API: how many requests per second one
+process sustains, and how latency degrades with load.
+
+    # closed loop: N concurrent clients, each sending back to back
+    python loadtest.py --url http://127.0.0.1:8000 --concurrency 1,4,16,64 --duration 20
+
+    # open loop: fixed arrival rate (requests/s), Poisson arrivals
+    python loadtest.py --rate 25,50,100,200 --poisson --duration 20 --out loadtest.json
+
+    # no server, no model weights: the app in-process on the stub models
+    BOT_STUB_MODELS=1 python loadtest.py --in-process --concurrency 1,8,32
+
+A small corpus is mostly answered by the response cache; run the app with
+RESPONSE_CACHE_SIZE=0 to load the pipeline itself.
+
+Each step reports throughput, error rate and the latency distribution. The
+saturation point is the first step where the server stops keeping up: the
+open-loop rate is not achieved, the closed-loop throughput stops growing,
+errors exceed --max-error-rate or p95 exceeds --slo-ms.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+ROUTES = {"handle": "/bot/handle", "async": "/bot/handle/async", "batch": "/bot/handle/batch"}
+DEFAULT_DURATION_S = 10.0
+DEFAULT_WARMUP_S = 2.0
+THROUGHPUT_GAIN = 0.10  # closed loop: a step adding less than this much throughput is past the knee
+RATE_ACHIEVED = 0.90  # open loop: below this share of the target rate the server is not keeping up
+
+
+def load_mix(path: Optional[str] = None) -> Tuple[List[str], List[float]]:
+    """
+    Transcripts and their relative weights. A JSON list of strings or of
+    {"transcript": ..., "weight": ...}, or one transcript per line; the sample corpus by default.
+    """
+    if not path:
+        from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+        return list(SAMPLE_TRANSCRIPTS), [1.0] * len(SAMPLE_TRANSCRIPTS)
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        texts, weights = [], []
+        for item in json.loads(content):
+            if isinstance(item, dict):
+                texts.append(item["transcript"])
+                weights.append(float(item.get("weight", 1.0)))
+            else:
+                texts.append(str(item))
+                weights.append(1.0)
+        return texts, weights
+    texts = [line.strip() for line in content.splitlines() if line.strip()]
+    return texts, [1.0] * len(texts)
+
+
+class RequestFactory:
+    """Request bodies for a route, drawn from the weighted transcript mix."""
+
+    def __init__(self, route: str, texts: List[str], weights: List[float], batch_size: int = 8, seed: int = 0):
+        self.path = ROUTES[route]
+        self.batch = route == "batch"
+        self.batch_size = batch_size
+        self.texts = texts
+        self.weights = weights
+        self.rng = random.Random(seed)
+
+    @property
+    def items_per_request(self) -> int:
+        return self.batch_size if self.batch else 1
+
+    def body(self) -> dict:
+        if self.batch:
+            picks = self.rng.choices(self.texts, weights=self.weights, k=self.batch_size)
+            return {"items": [{"transcript": t, "metadata": {"user_id": "loadtest"}} for t in picks]}
+        text = self.rng.choices(self.texts, weights=self.weights, k=1)[0]
+        return {"transcript": text, "metadata": {"user_id": "loadtest"}}
+
+
+class StepRecorder:
+    """Latency and outcome of every request completed inside the measured window."""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.outcomes: dict = {}
+        self.dropped = 0
+
+    def add(self, latency_s: float, outcome: str) -> None:
+        self.latencies_ms.append(latency_s * 1000.0)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+
+async def _send(client: httpx.AsyncClient, factory: RequestFactory) -> Tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        resp = await client.post(factory.path, json=factory.body())
+        outcome = str(resp.status_code)
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    return time.perf_counter() - start, outcome
+
+
+async def run_closed_loop(client, factory: RequestFactory, concurrency: int, duration_s: float, warmup_s: float) -> StepRecorder:
+    recorder = StepRecorder()
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup_s
+    deadline = measure_from + duration_s
+
+    async def worker():
+        while loop.time() < deadline:
+            latency, outcome = await _send(client, factory)
+            if loop.time() >= measure_from:
+                recorder.add(latency, outcome)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder
+
+
+async def run_open_loop(
+    client, factory: RequestFactory, rate: float, duration_s: float, warmup_s: float, max_inflight: int, poisson: bool, seed: int = 0
+) -> StepRecorder:
+    """Send at a fixed arrival rate regardless of responses; arrivals beyond max_inflight are dropped."""
+    recorder = StepRecorder()
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + warmup_s
+    deadline = measure_from + duration_s
+    inflight = set()
+
+    async def one(measured: bool):
+        latency, outcome = await _send(client, factory)
+        if measured:
+            recorder.add(latency, outcome)
+
+    next_at = start
+    while next_at < deadline:
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        measured = next_at >= measure_from
+        if len(inflight) >= max_inflight:
+            if measured:
+                recorder.dropped += 1
+        else:
+            task = asyncio.ensure_future(one(measured))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        next_at += rng.expovariate(rate) if poisson else 1.0 / rate
+    if inflight:
+        await asyncio.gather(*inflight)
+    return recorder
+
+
+def summarize_step(recorder: StepRecorder, duration_s: float, items_per_request: int) -> dict:
+    total = len(recorder.latencies_ms)
+    ok = recorder.outcomes.get("200", 0)
+    errors = total - ok + recorder.dropped
+    attempted = total + recorder.dropped
+    summary = {
+        "requests": total,
+        "ok": ok,
+        "dropped": recorder.dropped,
+        "outcomes": dict(sorted(recorder.outcomes.items())),
+        "error_rate": (errors / attempted) if attempted else 0.0,
+        "rps": ok / duration_s,
+        "items_per_s": ok * items_per_request / duration_s,
+    }
+    if total:
+        arr = np.asarray(recorder.latencies_ms)
+        summary["latency_ms"] = {
+            "mean": float(arr.mean()),
+            "p50": float(np.percentile(arr, 50)),
+            "p90": float(np.percentile(arr, 90)),
+            "p95": float(np.percentile(arr, 95)),
+            "p99": float(np.percentile(arr, 99)),
+            "max": float(arr.max()),
+        }
+    return summary
+
+
+def find_saturation(steps: List[dict], mode: str, max_error_rate: float, slo_ms: Optional[float]) -> dict:
+    """First step where the server stopped keeping up, and the best throughput sustained before it."""
+    best = 0.0
+    previous_rps = None
+    for step in steps:
+        reason = None
+        p95 = step.get("latency_ms", {}).get("p95")
+        if step["error_rate"] > max_error_rate:
+            reason = f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif slo_ms is not None and p95 is not None and p95 > slo_ms:
+            reason = f"p95 {p95:.1f}ms > SLO {slo_ms:.1f}ms"
+        elif mode == "rate" and step["rps"] < RATE_ACHIEVED * step["target"]:
+            reason = f"achieved {step['rps']:.1f} of {step['target']:g} req/s"
+        elif mode == "concurrency" and previous_rps is not None and step["rps"] < previous_rps * (1.0 + THROUGHPUT_GAIN):
+            reason = f"throughput {previous_rps:.1f} -> {step['rps']:.1f} req/s (< {THROUGHPUT_GAIN:.0%} gain)"
+        if reason:
+            return {"saturated": True, "at": step["target"], "reason": reason, "max_sustained_rps": best}
+        best = max(best, step["rps"])
+        previous_rps = step["rps"]
+    return {"saturated": False, "at": None, "reason": None, "max_sustained_rps": best}
+
+
+async def _server_stats(client) -> Optional[dict]:
+    """Scheduler batch sizes and queueing delay after a step (None if unavailable)."""
+    try:
+        resp = await client.get("/bot/scheduler/stats")
+        stats = resp.json() if resp.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+    if not stats or not stats.get("enabled"):
+        return None
+    return {
+        "mean_batch_size": stats.get("mean_batch_size"),
+        "queue_depth": stats.get("queue_depth"),
+        "queue_delay_p95_ms": stats.get("queue_delay_ms", {}).get("p95"),
+        "rejected": stats.get("rejected"),
+    }
+
+
+def _in_process_app():
+    """The API app with its models loaded and scheduler started, as app startup would."""
+    os.environ.setdefault("MODEL_PRELOAD", "0")
+    import app as bot_app
+    bot_app.preload_models()
+    if bot_app.scheduler is not None:
+        bot_app.scheduler.start()
+    return bot_app
+
+
+async def run_load_test(
+    url: Optional[str],
+    route: str,
+    mode: str,
+    targets: List[float],
+    duration_s: float = DEFAULT_DURATION_S,
+    warmup_s: float = DEFAULT_WARMUP_S,
+    corpus: Optional[str] = None,
+    batch_size: int = 8,
+    max_inflight: int = 1024,
+    poisson: bool = False,
+    timeout_s: float = 30.0,
+    max_error_rate: float = 0.01,
+    slo_ms: Optional[float] = None,
+    seed: int = 0,
+) -> dict:
+    texts, weights = load_mix(corpus)
+    factory = RequestFactory(route, texts, weights, batch_size=batch_size, seed=seed)
+
+    bot_app = None
+    if url:
+        transport, base_url = None, url.rstrip("/")
+    else:
+        bot_app = _in_process_app()
+        transport, base_url = httpx.ASGITransport(app=bot_app.app), "http://loadtest"
+
+    connections = int(max(targets)) if mode == "concurrency" else max_inflight
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    steps = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=timeout_s) as client:
+            for target in targets:
+                if mode == "concurrency":
+                    recorder = await run_closed_loop(client, factory, int(target), duration_s, warmup_s)
+                else:
+                    recorder = await run_open_loop(client, factory, target, duration_s, warmup_s, max_inflight, poisson, seed)
+                step = {"target": target, **summarize_step(recorder, duration_s, factory.items_per_request)}
+                server = await _server_stats(client)
+                if server is not None:
+                    step["server"] = server
+                steps.append(step)
+                print_step(mode, step)
+    finally:
+        if bot_app is not None and bot_app.scheduler is not None:
+            bot_app.scheduler.stop()
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "target": url or "in-process",
+            "route": ROUTES[route],
+            "mode": mode,
+            "arrivals": ("poisson" if poisson else "uniform") if mode == "rate" else None,
+            "duration_s": duration_s,
+            "warmup_s": warmup_s,
+            "corpus_size": len(texts),
+            "batch_size": factory.items_per_request,
+            "stub_models": os.getenv("BOT_STUB_MODELS", "0") == "1" if not url else None,
+            "response_cache_size": os.getenv("RESPONSE_CACHE_SIZE") if not url else None,
+        },
+        "steps": steps,
+        "saturation": find_saturation(steps, mode, max_error_rate, slo_ms),
+    }
+
+
+def print_step(mode: str, step: dict) -> None:
+    lat = step.get("latency_ms", {})
+    label = f"c={int(step['target'])}" if mode == "concurrency" else f"rate={step['target']:g}/s"
+    print(
+        f"{label:<12} rps={step['rps']:>8.1f} err={step['error_rate']:>6.1%} "
+        f"p50={lat.get('p50', 0):>8.1f}ms p95={lat.get('p95', 0):>8.1f}ms p99={lat.get('p99', 0):>8.1f}ms "
+        f"max={lat.get('max', 0):>8.1f}ms",
+        flush=True,
+    )
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+
+    def number_list(value: str) -> List[float]:
+        return [float(v) for v in value.split(",") if v.strip()]
+
+    p = argparse.ArgumentParser(description="Load-test the bot API at increasing concurrency or arrival rate")
+    target = p.add_mutually_exclusive_group()
+    target.add_argument("--url", default=None, help="Base URL of a running app (default http://127.0.0.1:8000)")
+    target.add_argument("--in-process", action="store_true", help="Drive app.py in this process (combine with BOT_STUB_MODELS=1)")
+    load = p.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=number_list, default=None, help="Closed-loop client counts, e.g. 1,4,16,64")
+    load.add_argument("--rate", type=number_list, default=None, help="Open-loop arrival rates in req/s, e.g. 25,50,100")
+    p.add_argument("--route", choices=sorted(ROUTES), default="handle")
+    p.add_argument("--batch-size", type=int, default=8, help="Items per request for --route batch")
+    p.add_argument("--corpus", default=None, help="JSON list (optionally with weights) or one-transcript-per-line file")
+    p.add_argument("--duration", type=float, default=DEFAULT_DURATION_S, help="Measured seconds per step")
+    p.add_argument("--warmup", type=float, default=DEFAULT_WARMUP_S, help="Unmeasured seconds at the start of each step")
+    p.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times for --rate")
+    p.add_argument("--max-inflight", type=int, default=1024, help="Open loop: arrivals beyond this many pending requests are dropped")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--max-error-rate", type=float, default=0.01)
+    p.add_argument("--slo-ms", type=float, default=None, help="p95 latency objective; a step above it counts as saturated")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=None, help="Write the JSON report here")
+    args = p.parse_args()
+
+    mode, targets = ("rate", args.rate) if args.rate else ("concurrency", args.concurrency or [1, 4, 16, 64])
+    report = asyncio.run(run_load_test(
+        None if args.in_process else (args.url or "http://127.0.0.1:8000"),
+        args.route, mode, targets,
+        duration_s=args.duration, warmup_s=args.warmup, corpus=args.corpus, batch_size=args.batch_size,
+        max_inflight=args.max_inflight, poisson=args.poisson, timeout_s=args.timeout,
+        max_error_rate=args.max_error_rate, slo_ms=args.slo_ms, seed=args.seed,
+    ))
+    sat = report["saturation"]
+    if sat["saturated"]:
+        print(f"\nSaturated at {sat['at']:g}: {sat['reason']}. Max sustained: {sat['max_sustained_rps']:.1f} req/s")
+    else:
+        print(f"\nNo saturation up to {targets[-1]:g}. Max sustained: {sat['max_sustained_rps']:.1f} req/s")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
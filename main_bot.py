@@ -1,10 +1,45 @@
 import json
 import argparse
-from intent_transformer_knn import score_intents_avg 
-from extract_entities_tools import extract_entities_basic  
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from intent_transformer_knn import score_intents_avg, score_intents_batch
+from extract_entities_tools import (
+    extract_entities_basic, extract_entities_batch, plan_extractors, assemble_entities, stage_details, EXTRACTORS, MODEL_STAGES
+)
+from transcript_analysis import analyze
+from response_cache import ResponseCache
+from crm_client import crm_client, CRM_POOL_SIZE
+import telemetry
 from validators.validate_output import validate_intent_output
 from logger_config import logger
 
+# Async pipeline config: bounded stage executor and per-stage timeouts (seconds)
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "8"))
+DEFAULT_STAGE_TIMEOUT_S = float(os.getenv("PIPELINE_STAGE_TIMEOUT_S", "5"))
+STAGE_TIMEOUTS_S = {
+    "intent": 15.0,
+    "name_city": 15.0,
+    "status": 15.0,
+    "visit_time": 2.0,
+}
+
+_stage_executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix="bot-stage")
+
+# Response cache for repeated transcripts (RESPONSE_CACHE_SIZE=0 disables it)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+RESPONSE_CACHE_TIME_BUCKET_S = float(os.getenv("RESPONSE_CACHE_TIME_BUCKET_S", "60"))
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_TIME_BUCKET_S)
+
+# CRM calls of a batch run concurrently (blocking I/O, one pooled connection each)
+_crm_executor = ThreadPoolExecutor(max_workers=CRM_POOL_SIZE, thread_name_prefix="bot-crm")
+
+
 # Intent normalization 
 def normalize_intent(intent_scores: dict) -> str:
     """Return mapped intent if top score > 0.5, else UNKNOWN."""
@@ -26,37 +61,225 @@ def normalize_intent(intent_scores: dict) -> str:
     return mapping.get(top_intent, "UNKNOWN")
 
 
-# CRM endpoint resolver 
+# CRM endpoint resolver (status_code stays None until dispatch_crm makes the call)
 def crm_endpoint_for_intent(intent: str) -> dict:
     if intent == "LEAD_CREATE":
-        return {"endpoint": "/crm/lead/create", "method": "POST", "status_code": 200}
+        return {"endpoint": "/crm/leads", "method": "POST", "status_code": None}
     elif intent == "VISIT_SCHEDULE":
-        return {"endpoint": "/crm/visit/schedule", "method": "POST", "status_code": 200}
+        return {"endpoint": "/crm/visits", "method": "POST", "status_code": None}
     elif intent == "LEAD_UPDATE":
-        return {"endpoint": "/crm/lead/update", "method": "POST", "status_code": 200}
+        return {"endpoint": "/crm/leads/{lead_id}/status", "method": "POST", "status_code": None}
     else:
         return {"endpoint": "/crm/unknown", "method": "POST", "status_code": 400}
 
 
+#CRM dispatch
+def _dispatchable(result: dict) -> bool:
+    return crm_client.enabled and isinstance(result, dict) and "error" not in result and result.get("intent", "UNKNOWN") != "UNKNOWN"
+
+
+def _apply_crm_call(result: dict, crm_call: Optional[dict]) -> dict:
+    if crm_call is None:
+        # e.g. no lead id to address: keep the resolved route, nothing was sent
+        return result
+    result["crm_call"] = crm_call
+    status = crm_call.get("status_code")
+    logger.info(f"CRM call → {crm_call['endpoint']} ({crm_call['method']}) [{status or crm_call.get('error')}] in {crm_call['latency_ms']} ms")
+    if "lead_resolution" in crm_call:
+        # the spoken short id was resolved to the full CRM lead id
+        result["entities"]["lead_id"] = crm_call["lead_resolution"]["lead_id"]
+    response = crm_call.get("response")
+    if isinstance(response, dict) and response.get("existing"):
+        # the CRM matched this caller to a lead it already has instead of creating a duplicate
+        result["result"]["existing_lead"] = {k: response.get(k) for k in ("lead_id", "status", "matched_by", "score")}
+        result["result"]["message"] = f"Lead already exists ({response['lead_id']}, matched by {response.get('matched_by')}). No new lead was created."
+    elif isinstance(response, dict) and response.get("possible_duplicate"):
+        result["result"]["possible_duplicate"] = response["possible_duplicate"]
+    if status is None or not 200 <= status < 300:
+        reason = crm_call.get("error") or status
+        result["result"]["message"] = f"CRM call for intent '{result['intent']}' failed ({reason}). No CRM change was made."
+    return result
+
+
+def dispatch_crm(result: dict) -> dict:
+    """Send a validated result to the CRM (if CRM_BASE_URL is set) and record the real call in crm_call."""
+    if not _dispatchable(result):
+        return result
+    return _apply_crm_call(result, crm_client.dispatch(result["intent"], result["entities"]))
+
+
+async def dispatch_crm_async(result: dict) -> dict:
+    """dispatch_crm on the pooled async client."""
+    if not _dispatchable(result):
+        return result
+    return _apply_crm_call(result, await crm_client.adispatch(result["intent"], result["entities"]))
+
+
+#Response cache
+def cached_result(data: dict, count_miss: bool = True) -> Optional[dict]:
+    """The response for a previously seen transcript, rendered for this request's metadata; None on a miss."""
+    with telemetry.stage("cache"):
+        hit = response_cache.get(data.get("transcript", ""), count_miss=count_miss)
+    if hit is None:
+        return None
+    intent_scores, entities, plan, details = hit
+    # _build_result mutates entities, and the message depends on metadata: render a fresh copy
+    return _build_result(dict(intent_scores), dict(entities), data.get("metadata") or {}, list(plan), details)
+
+
+def _cache_pipeline_output(transcript: str, intent_scores: dict, entities: dict, plan: List[str], details: Optional[dict] = None) -> None:
+    # A resolved visit_time may be relative to "now" (tomorrow, 3 pm, Monday): reuse only within a time bucket
+    response_cache.put(
+        transcript,
+        (dict(intent_scores), dict(entities), list(plan), dict(details or {})),
+        time_dependent=entities.get("visit_time") is not None,
+    )
+
+
 #Main handler
-def process_request(data: dict) -> dict:
+def process_request(data: dict, dispatch: bool = True) -> dict:
     logger.info(f"[BOT] Processing request for transcript='{data.get('transcript', '')[:100]}...'")
     transcript = data.get("transcript", "")
     metadata = data.get("metadata", {})
 
-    #Detect intent
-    _, _, _, intent_scores = score_intents_avg(transcript)
+    start = time.perf_counter()
+    with telemetry.traced():
+        # Only the pipeline output is cached: every request still makes its own CRM call
+        result = cached_result(data)
+        if result is None:
+            #Detect intent
+            with telemetry.stage("intent"):
+                _, _, _, intent_scores = score_intents_avg(transcript)
+
+            #Extract only the entities this intent needs
+            plan = plan_extractors(normalize_intent(intent_scores))
+            details = {}
+            entities = extract_entities_basic(transcript, plan=plan, details=details)
+            _cache_pipeline_output(transcript, intent_scores, entities, plan, details)
+
+            result = _build_result(intent_scores, entities, metadata, plan, details)
+        if dispatch:
+            result = dispatch_crm(result)
+    telemetry.observe_request(time.perf_counter() - start, "sync")
+    return result
+
+
+async def _run_stage(stage: str, fn, *args, failed: Optional[List[str]] = None):
+    """Run one blocking stage on the shared executor; a timeout or failure yields None (and is noted in failed)."""
+    loop = asyncio.get_running_loop()
+    timeout = STAGE_TIMEOUTS_S.get(stage, DEFAULT_STAGE_TIMEOUT_S)
+    # The stage runs in the request's context, so its inner spans land in the request's trace
+    ctx = contextvars.copy_context()
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(loop.run_in_executor(_stage_executor, ctx.run, fn, *args), timeout=timeout)
+        telemetry.record(stage, time.perf_counter() - start)
+        return result
+    except asyncio.TimeoutError:
+        # The worker thread finishes in the background; the response does not wait for it
+        logger.info(f"[BOT] Stage '{stage}' timed out after {timeout:.1f}s, continuing without it")
+        telemetry.STAGE_FAILURES.inc(stage, "timeout")
+    except Exception as e:
+        logger.info(f"[error] Stage '{stage}' failed: {e}")
+        telemetry.STAGE_FAILURES.inc(stage, "error")
+    if failed is not None:
+        failed.append(stage)
+    return None
+
+
+#Async handler
+async def process_request_async(data: dict) -> dict:
+    """
+    Same output as process_request, but stages run concurrently, so latency
+    tracks the slowest stage rather than the sum of all stages. The transcript
+    analysis and then the cheap rule-based extractors run while the intent is
+    scored; the model-backed extractors (NER, status) start once the intent's
+    extraction plan is known and only if it needs them. Rule-based outputs
+    outside the plan are discarded.
+    """
+    logger.info(f"[BOT] Processing async request for transcript='{data.get('transcript', '')[:100]}...'")
+    transcript = data.get("transcript", "")
+    metadata = data.get("metadata", {})
+
+    start = time.perf_counter()
+    with telemetry.traced():
+        result = await _process_request_async(transcript, metadata, data)
+    telemetry.observe_request(time.perf_counter() - start, "async")
+    return result
+
+
+async def _process_request_async(transcript: str, metadata: dict, data: dict) -> dict:
+    cached = cached_result(data)
+    if cached is not None:
+        return await dispatch_crm_async(cached)
+
+    failed: List[str] = []
+    intent_task = asyncio.ensure_future(_run_stage("intent", score_intents_avg, transcript, failed=failed))
+
+    # One shared analysis (phones, emails, tokens, masking) for every extractor, built while the intent is scored
+    analysis = await _run_stage("analysis", analyze, transcript, failed=failed)
+
+    # Cheap rule-based stages overlap intent scoring; the plan later decides which outputs are kept
+    rule_tasks = {
+        stage: asyncio.ensure_future(_run_stage(stage, EXTRACTORS[stage], analysis, failed=failed))
+        for stage in EXTRACTORS if stage not in MODEL_STAGES
+    }
+
+    scored = await intent_task
+    intent_scores = scored[3] if scored else {}
+    plan = plan_extractors(normalize_intent(intent_scores))
+
+    # Model-backed stages (NER, status) only run when the plan needs them
+    model_stages = [stage for stage in plan if stage in MODEL_STAGES]
+    model_outputs = await asyncio.gather(
+        *(_run_stage(stage, EXTRACTORS[stage], analysis, failed=failed) for stage in model_stages)
+    )
+    results = dict(zip(model_stages, model_outputs))
+    for stage, task in rule_tasks.items():
+        if stage in plan:
+            results[stage] = await task
+        else:
+            task.cancel()  # not needed for this intent: the response does not wait for it
+    # a stage outside the plan cannot degrade the response
+    failed = [stage for stage in failed if stage in plan or stage not in EXTRACTORS]
+
+    entities, details = assemble_entities(results), stage_details(results)
+    if not failed:
+        # Never cache a response degraded by a timed-out or failed stage
+        _cache_pipeline_output(transcript, intent_scores, entities, plan, details)
+    return await dispatch_crm_async(_build_result(intent_scores, entities, metadata, plan, details))
+
+
+def _build_result(intent_scores: dict, entities: dict, metadata: dict, plan: Optional[List[str]] = None,
+                  details: Optional[dict] = None) -> dict:
+    """Shared tail of the pipeline: intent mapping, CRM route, response body and validation (no CRM call)."""
+    result = _build_response(intent_scores, entities, metadata)
+
+    # Debug output, requested with metadata {"debug": true}
+    if (metadata or {}).get("debug"):
+        result["debug"] = {
+            "intent_scores": intent_scores,
+            "extraction_plan": plan if plan is not None else list(EXTRACTORS),
+            # e.g. status: {label, confidence, margin, method} (prototype guess or BART fallback)
+            **(details or {}),
+        }
+        timings = telemetry.current_trace()
+        if timings is not None:
+            # stages recorded so far for this request (or its micro-batch), in ms
+            result["debug"]["stages_ms"] = {name: round(ms, 3) for name, ms in timings.items()}
+    return result
+
+
+def _build_response(intent_scores: dict, entities: dict, metadata: dict) -> dict:
     intent = normalize_intent(intent_scores)
+    telemetry.INTENTS.inc(intent)
     logger.info(
     "[model] Intent scores: LEAD_CREATE=%.2f, VISIT_SCHEDULE=%.2f, LEAD_UPDATE=%.2f",
     intent_scores.get("ADDING", 0),
     intent_scores.get("SCHEDULING", 0),
     intent_scores.get("UPDATING", 0),
 )
-    
 
-    #Extract entities
-    entities = extract_entities_basic(transcript)
     if intent == "LEAD_CREATE":
         entities["status"] = "NEW"
     logger.info(f"[BOT] Extracted entities: {entities}")
@@ -64,10 +287,9 @@ def process_request(data: dict) -> dict:
     #CRM endpoint
     crm_info = crm_endpoint_for_intent(intent)
     logger.info(
-    "CRM call → %s (%s) [%s OK]",
+    "CRM route → %s (%s)",
     crm_info["endpoint"],
     crm_info["method"],
-    crm_info.get("status_code", 200),
     )
 
     #Handling UNKNOWN
@@ -87,20 +309,115 @@ def process_request(data: dict) -> dict:
         "entities": entities,
         "crm_call": crm_info,
         "result": {
-            "message": f"Successfully processed intent '{intent}' for user {metadata.get('user_id', 'anonymous')}."
+            "message": f"Successfully processed intent '{intent}' for user {(metadata or {}).get('user_id', 'anonymous')}."
         }
     }
     
 
     # Validate output before returning
-    validation_error = validate_intent_output(result)
+    with telemetry.stage("validation"):
+        validation_error = validate_intent_output(result)
     if validation_error:
+        telemetry.VALIDATION_ERRORS.inc(validation_error["error"]["details"]["reason"])
         return validation_error
 
     logger.info("Response returned to client.")
     return result
 
 
+def _item_error(error_type: str, details: str) -> dict:
+    telemetry.ERRORS.inc(error_type)
+    return {
+        "intent": "UNKNOWN",
+        "error": {
+            "type": error_type,
+            "details": details
+        }
+    }
+
+
+#Batch handler
+def process_batch(items: List[dict], dispatch: bool = True) -> List[dict]:
+    """
+    Run the pipeline over many requests at once. The encoder, NER and status
+    models each see the whole batch in a single call. Results (or per-item
+    errors) are returned in input order. With dispatch=False no CRM call is
+    made (the micro-batching scheduler leaves that to the request threads).
+    """
+    logger.info(f"[BOT] Processing batch of {len(items)} requests")
+    start = time.perf_counter()
+    with telemetry.traced():
+        results = _process_batch(items)
+        if dispatch and crm_client.enabled:
+            # each task gets its own copy of the context, so the CRM spans land in this trace
+            futures = [_crm_executor.submit(contextvars.copy_context().run, dispatch_crm, r) for r in results]
+            results = [f.result() for f in futures]
+    telemetry.observe_request(time.perf_counter() - start, "batch")
+    return results
+
+
+def _process_batch(items: List[dict]) -> List[dict]:
+    results: List[Optional[dict]] = [None] * len(items)
+
+    valid = []
+    for i, data in enumerate(items):
+        transcript = data.get("transcript") if isinstance(data, dict) else None
+        if not transcript or not isinstance(transcript, str):
+            results[i] = _item_error("VALIDATION_ERROR", "Invalid input format. Expected {'transcript': <string>, 'metadata': {...}}.")
+        else:
+            valid.append(i)
+
+    # Repeated transcripts are answered from the response cache
+    misses = []
+    for i in valid:
+        cached = cached_result(items[i])
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+
+    if misses:
+        texts = [items[i]["transcript"] for i in misses]
+        try:
+            with telemetry.stage("intent"):
+                scored = score_intents_batch(texts)
+            plans = [plan_extractors(normalize_intent(intent_scores)) for _, _, _, intent_scores in scored]
+            details = []
+            extracted = extract_entities_batch(texts, plans, details=details)
+        except Exception as e:
+            logger.info(f"[error] Batch inference failed: {e}")
+            for i in misses:
+                results[i] = _item_error("PARSING_ERROR", f"Error running model pipeline: {str(e)}")
+            return results
+
+        for i, text, (_, _, _, intent_scores), entities, plan, item_details in zip(misses, texts, scored, extracted, plans, details):
+            try:
+                _cache_pipeline_output(text, intent_scores, entities, plan, item_details)
+                results[i] = _build_result(intent_scores, entities, items[i].get("metadata") or {}, plan, item_details)
+            except Exception as e:
+                results[i] = _item_error("PARSING_ERROR", f"Error running model pipeline: {str(e)}")
+
+    return results
+
+
+# Warmup: representative transcripts covering every intent and every model
+WARMUP_TRANSCRIPTS = [
+    "Add a new lead: Rohan Sharma from Gurgaon, phone 9876543210, source Instagram.",
+    "Schedule a visit for lead 7b1b8f54 at 3 pm tomorrow.",
+    "Mark lead 7b1b8f54 as won. Notes: booked unit A2.",
+]
+
+
+def warmup() -> None:
+    """Run the warmup transcripts through the single and batch paths with every extractor enabled."""
+    for transcript in WARMUP_TRANSCRIPTS:
+        score_intents_avg(transcript)
+        extract_entities_basic(transcript)
+    score_intents_batch(WARMUP_TRANSCRIPTS)
+    extract_entities_batch(WARMUP_TRANSCRIPTS)
+    process_request({"transcript": WARMUP_TRANSCRIPTS[0], "metadata": {"user_id": "warmup"}}, dispatch=False)
+
+
 # CLI (FOR TESTING)
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Intent + Entity processor")
@@ -1,10 +1,11 @@
 # mock_crm.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, Field
-from uuid import uuid4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
+from crm_store import create_store, InvalidCursor, LeadStore, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, MIN_PREFIX_LEN
+
 app = FastAPI(title="Mock CRM")
 
 class LeadCreate(BaseModel):
@@ -13,6 +14,9 @@ class LeadCreate(BaseModel):
     city: str
     source: Optional[str] = None
 
+class LeadBulkCreate(BaseModel):
+    leads: List[LeadCreate] = Field(..., min_length=1, max_length=10000)
+
 class VisitCreate(BaseModel):
     lead_id: str
     visit_time: datetime
@@ -22,27 +26,108 @@ class LeadStatusUpdate(BaseModel):
     status: str = Field(..., pattern=r'^(NEW|IN_PROGRESS|FOLLOW_UP|WON|LOST)$')
     notes: Optional[str] = None
 
-# In-memory stores
-LEADS = {}
-VISITS = {}
+# Storage backend (CRM_STORE=sqlite|memory), opened on first use
+_store: Optional[LeadStore] = None
+
+
+def get_store() -> LeadStore:
+    global _store
+    if _store is None:
+        _store = create_store()
+    return _store
+
+
+def use_store(store: LeadStore) -> None:
+    """Swap the backend (tests use a fresh MemoryStore)."""
+    global _store
+    _store = store
+
+
+def _page(items, next_cursor):
+    return {"items": items, "next_cursor": next_cursor}
+
 
 @app.post("/crm/leads")
-def create_lead(payload: LeadCreate):
-    lead_id = str(uuid4())
-    LEADS[lead_id] = {**payload.dict(), "lead_id": lead_id, "status": "NEW"}
-    return {"lead_id": lead_id, "status": "NEW"}
+def create_lead(payload: LeadCreate, allow_duplicate: bool = False):
+    """Create a lead, or return the existing one with the same phone or a similar name in the same city."""
+    if allow_duplicate:
+        lead, match = get_store().create_lead(payload.model_dump()), None
+    else:
+        lead, match = get_store().create_or_match(payload.model_dump())
+    if match is not None and match["existing"]:
+        return {"lead_id": lead["lead_id"], "status": lead["status"], "existing": True,
+                "matched_by": match["by"], "score": round(match["score"], 3)}
+    response = {"lead_id": lead["lead_id"], "status": lead["status"], "existing": False}
+    if match is not None:
+        # similar name in the same city but another phone: created, flagged for review
+        response["possible_duplicate"] = {"lead_id": match["lead"]["lead_id"], "matched_by": match["by"], "score": round(match["score"], 3)}
+    return response
+
+@app.post("/crm/leads/bulk")
+def create_leads(payload: LeadBulkCreate):
+    leads = get_store().create_leads([lead.model_dump() for lead in payload.leads])
+    return {"created": len(leads), "lead_ids": [lead["lead_id"] for lead in leads]}
+
+@app.get("/crm/leads")
+def list_leads(
+    phone: Optional[str] = None,
+    city: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    try:
+        return _page(*get_store().list_leads(phone=phone, city=city, status=status, limit=limit, cursor=cursor))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/crm/leads/resolve")
+def resolve_lead(prefix: str = Query(..., min_length=MIN_PREFIX_LEN, max_length=36, pattern=r'^[0-9a-fA-F-]+$')):
+    """Full lead id for a spoken short id ("7b1b8f54", "8f2a"); 409 with the candidates if several leads share it."""
+    prefix = prefix.lower()
+    matches = get_store().resolve_prefix(prefix)
+    if not matches:
+        raise HTTPException(status_code=404, detail={"reason": "not_found", "prefix": prefix})
+    if len(matches) > 1:
+        raise HTTPException(status_code=409, detail={"reason": "ambiguous", "prefix": prefix, "candidates": matches})
+    return {"prefix": prefix, "lead_id": matches[0]}
+
+@app.get("/crm/leads/{lead_id}")
+def get_lead(lead_id: str):
+    lead = get_store().get_lead(lead_id)
+    if lead is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return lead
 
 @app.post("/crm/visits")
 def create_visit(payload: VisitCreate):
-    if payload.lead_id not in LEADS:
+    visit = get_store().create_visit(payload.model_dump())
+    if visit is None:
         raise HTTPException(status_code=404, detail="Lead not found")
-    visit_id = str(uuid4())
-    VISITS[visit_id] = {**payload.dict(), "visit_id": visit_id, "status": "SCHEDULED"}
-    return {"visit_id": visit_id, "status": "SCHEDULED"}
+    return {"visit_id": visit["visit_id"], "status": visit["status"]}
+
+@app.get("/crm/visits")
+def list_visits(
+    lead_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    try:
+        return _page(*get_store().list_visits(
+            lead_id=lead_id,
+            start=start.isoformat() if start else None,
+            end=end.isoformat() if end else None,
+            limit=limit,
+            cursor=cursor,
+        ))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.post("/crm/leads/{lead_id}/status")
 def update_lead_status(lead_id: str, payload: LeadStatusUpdate):
-    if lead_id not in LEADS:
+    lead = get_store().update_status(lead_id, payload.status, payload.notes)
+    if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
-    LEADS[lead_id]["status"] = payload.status
-    return {"lead_id": lead_id, "status": payload.status}
\ No newline at end of file
+    return {"lead_id": lead_id, "status": lead["status"]}
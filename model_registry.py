@@ -0,0 +1,181 @@
+# model_registry.py
+"""
+Central registry for the heavy models (sentence encoder, NER, zero-shot).
+
+Models are registered with a loader and loaded lazily on first use, or all at
+once by a background startup task. The registry tracks per-model state and
+load time plus an explicit warmup pass, which back the /readyz endpoint.
+A failed load is retried on the next use once MODEL_RETRY_BACKOFF_S has
+passed (doubling per failure, up to MODEL_RETRY_BACKOFF_MAX_S); the startup
+preload retries loading and warmup on the same schedule until both succeed.
+
+In lazy mode (no startup preload) readiness does not wait for the models or
+the warmup, which only run on first use: the process is ready unless a
+required model failed and its retry is not yet due.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from logger_config import logger
+from telemetry import MODEL_ERRORS
+
+MODEL_RETRY_BACKOFF_S = float(os.getenv("MODEL_RETRY_BACKOFF_S", "30"))
+MODEL_RETRY_BACKOFF_MAX_S = float(os.getenv("MODEL_RETRY_BACKOFF_MAX_S", "600"))
+
+
+class _Entry:
+    __slots__ = ("name", "loader", "required", "model", "state", "error", "load_time_s", "failures", "failed_at", "lock")
+
+    def __init__(self, name: str, loader: Callable[[], Any], required: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.model = None
+        self.state = "pending"  # pending -> loading -> loaded | failed
+        self.error: Optional[str] = None
+        self.load_time_s: Optional[float] = None
+        self.failures = 0  # consecutive failed loads
+        self.failed_at = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Lazily loads registered models once and reports their state."""
+
+    def __init__(self, lazy: bool = False):
+        self._entries: Dict[str, _Entry] = {}
+        self.lazy = lazy
+        self._warm_lock = threading.Lock()
+        self.warmed = False
+        self.warmup_time_s: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True) -> None:
+        """Register (or replace) a model loader. Required models gate readiness."""
+        self._entries[name] = _Entry(name, loader, required)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading it on first use. None if loading failed (retried after a backoff)."""
+        entry = self._entries[name]
+        if entry.state == "loaded":
+            return entry.model
+        return self._load(entry, retry=self._retry_due(entry))
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == "loaded"
+
+    def _retry_due(self, entry: _Entry) -> bool:
+        if entry.state != "failed":
+            return False
+        backoff = min(MODEL_RETRY_BACKOFF_MAX_S, MODEL_RETRY_BACKOFF_S * 2 ** (entry.failures - 1))
+        return time.monotonic() - entry.failed_at >= backoff
+
+    def _load(self, entry: _Entry, retry: bool = False) -> Any:
+        with entry.lock:
+            if entry.state == "loaded":
+                return entry.model
+            if entry.state == "failed" and not retry:
+                return None
+
+            entry.state = "loading"
+            logger.info(f"[info] Loading model '{entry.name}'")
+            start = time.perf_counter()
+            try:
+                entry.model = entry.loader()
+            except Exception as e:
+                entry.state = "failed"
+                entry.failures += 1
+                entry.failed_at = time.monotonic()
+                entry.error = str(e)
+                entry.load_time_s = time.perf_counter() - start
+                logger.info(f"[warn] Could not load model '{entry.name}': {e}")
+                MODEL_ERRORS.inc(entry.name, "load")
+                return None
+            entry.load_time_s = time.perf_counter() - start
+            entry.error = None
+            entry.failures = 0
+            entry.state = "loaded"
+            logger.info(f"[info] Loaded model '{entry.name}' in {entry.load_time_s:.2f}s")
+            return entry.model
+
+    def load_all(self, names: Optional[List[str]] = None, retry_failed: bool = True) -> bool:
+        """Load the given (default: required) models now. Returns True if all of them loaded."""
+        if names is None:
+            names = [n for n, e in self._entries.items() if e.required]
+        ok = True
+        for name in names:
+            entry = self._entries[name]
+            self._load(entry, retry=retry_failed)
+            if entry.state != "loaded":
+                ok = False
+        return ok
+
+    def warmup(self, fn: Callable[[], Any]) -> bool:
+        """Run a representative workload once so the first real request is not the slow one."""
+        with self._warm_lock:
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                self.warmup_error = str(e)
+                self.warmed = False
+                logger.info(f"[warn] Model warmup failed: {e}")
+            else:
+                self.warmup_error = None
+                self.warmed = True
+            self.warmup_time_s = time.perf_counter() - start
+            logger.info(f"[info] Model warmup finished in {self.warmup_time_s:.2f}s (ok={self.warmed})")
+            return self.warmed
+
+    def preload(self, warmup_fn: Optional[Callable[[], Any]] = None, max_attempts: Optional[int] = None, sleep=time.sleep) -> bool:
+        """
+        Load the required models and warm up, retrying with the load backoff until
+        both succeed (or max_attempts is reached): a failure at startup must not
+        leave the process unready for good.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.load_all() and (warmup_fn is None or self.warmup(warmup_fn)):
+                return True
+            if max_attempts is not None and attempt >= max_attempts:
+                return False
+            backoff = min(MODEL_RETRY_BACKOFF_MAX_S, MODEL_RETRY_BACKOFF_S * 2 ** (attempt - 1))
+            logger.info(f"[warn] Model preload incomplete (attempt {attempt}), retrying in {backoff:.0f}s")
+            sleep(backoff)
+
+    def is_ready(self) -> bool:
+        required = [e for e in self._entries.values() if e.required]
+        if self.lazy:
+            return all(e.state != "failed" or self._retry_due(e) for e in required)
+        return all(e.state == "loaded" for e in required) and self.warmed
+
+    def report(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "lazy": self.lazy,
+            "warmed": self.warmed,
+            "warmup_time_s": self.warmup_time_s,
+            "warmup_error": self.warmup_error,
+            "models": {
+                name: {
+                    "state": e.state,
+                    "required": e.required,
+                    "load_time_s": e.load_time_s,
+                    "error": e.error,
+                    "failures": e.failures,
+                }
+                for name, e in self._entries.items()
+            },
+        }
+
+
+# Process-wide registry shared by intent_transformer_knn and extract_entities_tools
+registry = ModelRegistry()
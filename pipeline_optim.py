@@ -0,0 +1,149 @@
+# pipeline_optim.py
+"""
+Inference-optimization layer for the transformers pipelines (NER and zero-shot status).
+
+    NLP_QUANTIZE=int8         dynamic int8 quantization of every nn.Linear (default: none)
+    NLP_INFERENCE_MODE=1      run pipeline calls under torch.inference_mode() (default: on)
+    TORCH_INTRA_OP_THREADS=N  intra-op threads per process (default: torch's choice)
+    TORCH_INTER_OP_THREADS=N  inter-op threads per process (default: torch's choice)
+
+    python pipeline_optim.py report    # entity/status accuracy delta and latency, int8 vs fp32
+"""
+
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from logger_config import logger
+
+NLP_QUANTIZE = os.getenv("NLP_QUANTIZE", "none").lower()
+NLP_INFERENCE_MODE = os.getenv("NLP_INFERENCE_MODE", "1") == "1"
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", "0"))
+
+_threads_lock = threading.Lock()
+_threads_configured = False
+
+
+def configure_torch_threads(intra: Optional[int] = None, inter: Optional[int] = None, force: bool = False) -> dict:
+    """
+    Apply the thread settings once per process; later calls only report the current values.
+    force=True re-applies them, e.g. in a worker forked from a parent that already configured torch.
+    """
+    global _threads_configured
+    import torch
+
+    intra = TORCH_INTRA_OP_THREADS if intra is None else intra
+    inter = TORCH_INTER_OP_THREADS if inter is None else inter
+    with _threads_lock:
+        if force or not _threads_configured:
+            if intra > 0:
+                torch.set_num_threads(intra)
+            if inter > 0:
+                try:
+                    torch.set_num_interop_threads(inter)
+                except RuntimeError as e:
+                    # only allowed before any inter-op parallel work has started
+                    logger.info(f"[warn] Could not set torch inter-op threads: {e}")
+            _threads_configured = True
+            logger.info(
+                f"[info] Torch threads: intra-op={torch.get_num_threads()} inter-op={torch.get_num_interop_threads()}"
+            )
+    return {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def quantize_linear_int8(model):
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations quantized on the fly)."""
+    import torch
+    quantize_dynamic = getattr(torch.ao.quantization, "quantize_dynamic", None) or torch.quantization.quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OptimizedPipeline:
+    """Wraps a transformers pipeline; calls run under torch.inference_mode() when enabled."""
+
+    def __init__(self, pipe, quantization: str = "none", inference_mode: bool = True):
+        self.pipe = pipe
+        self.quantization = quantization
+        self.inference_mode = inference_mode
+
+    def __call__(self, *args, **kwargs):
+        if not self.inference_mode:
+            return self.pipe(*args, **kwargs)
+        import torch
+        with torch.inference_mode():
+            return self.pipe(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pipe, name)
+
+
+def optimize_pipeline(pipe, quantize: str = NLP_QUANTIZE, inference_mode: bool = NLP_INFERENCE_MODE) -> OptimizedPipeline:
+    """Apply thread settings and (optionally) int8 quantization to a loaded pipeline."""
+    configure_torch_threads()
+    if quantize == "int8":
+        pipe.model = quantize_linear_int8(pipe.model)
+        logger.info(f"[info] Quantized {type(pipe.model).__name__} Linear layers to int8")
+    elif quantize not in ("none", ""):
+        raise ValueError(f"Unknown NLP_QUANTIZE '{quantize}' (expected none or int8)")
+    return OptimizedPipeline(pipe, quantization=quantize or "none", inference_mode=inference_mode)
+
+
+# Accuracy delta report
+def accuracy_report(texts, quantize: str = "int8") -> dict:
+    """Run fp32 and optimized NER / zero-shot pipelines over texts and compare their outputs."""
+    import extract_entities_tools as ext
+
+    def timed(fn, items):
+        start = time.perf_counter()
+        out = [fn(t) for t in items]
+        return out, (time.perf_counter() - start) * 1000.0 / max(len(items), 1)
+
+    report = {"quantization": quantize, "n_texts": len(texts)}
+
+    base_ner = optimize_pipeline(ext._load_ner_fp32(), quantize="none")
+    opt_ner = optimize_pipeline(ext._load_ner_fp32(), quantize=quantize)
+    base_ents, base_ms = timed(lambda t: ext._name_city_from_ner(t, base_ner(t)), texts)
+    opt_ents, opt_ms = timed(lambda t: ext._name_city_from_ner(t, opt_ner(t)), texts)
+    report["ner"] = {
+        "name_agreement": sum(a[0] == b[0] for a, b in zip(base_ents, opt_ents)) / max(len(texts), 1),
+        "city_agreement": sum(a[1] == b[1] for a, b in zip(base_ents, opt_ents)) / max(len(texts), 1),
+        "mean_ms_fp32": base_ms,
+        "mean_ms_optimized": opt_ms,
+        "diffs": [
+            {"text": t, "fp32": list(a), quantize: list(b)}
+            for t, a, b in zip(texts, base_ents, opt_ents) if a != b
+        ],
+    }
+    del base_ner, opt_ner
+
+    base_clf = optimize_pipeline(ext._load_status_classifier_fp32(), quantize="none")
+    opt_clf = optimize_pipeline(ext._load_status_classifier_fp32(), quantize=quantize)
+    classify = lambda clf: (lambda t: clf(t, candidate_labels=ext.STATUS_LABELS)["labels"][0])
+    base_status, base_ms = timed(classify(base_clf), texts)
+    opt_status, opt_ms = timed(classify(opt_clf), texts)
+    report["status"] = {
+        "label_agreement": sum(a == b for a, b in zip(base_status, opt_status)) / max(len(texts), 1),
+        "mean_ms_fp32": base_ms,
+        "mean_ms_optimized": opt_ms,
+        "diffs": [
+            {"text": t, "fp32": a, quantize: b}
+            for t, a, b in zip(texts, base_status, opt_status) if a != b
+        ],
+    }
+    return report
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+    import json
+    from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+
+    p = argparse.ArgumentParser(description="NER / zero-shot pipeline optimization report")
+    p.add_argument("cmd", choices=["report"])
+    p.add_argument("--quantize", default="int8", choices=["none", "int8"])
+    args = p.parse_args()
+
+    print(json.dumps(accuracy_report(SAMPLE_TRANSCRIPTS, quantize=args.quantize), indent=2))
@@ -0,0 +1,114 @@
+# response_cache.py
+"""
+Cache of pipeline outputs for repeated transcripts (scripted agent commands,
+retried webhook deliveries).
+
+Entries are keyed by the normalized transcript, expire after a TTL and are
+evicted least-recently-used beyond maxsize. Entries whose output depends on
+the current time (relative dates such as "tomorrow at 3 pm") are additionally
+keyed by a wall-clock time bucket, so they are only reused within the bucket.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+# Same normalization as the embedding cache, so both caches agree on what a repeated transcript is
+from intent_transformer_knn import normalize_text
+
+
+class ResponseCache:
+    """Bounded, thread-safe LRU with TTL, time-bucketed entries and hit/eviction counters."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_s: float,
+        time_bucket_s: float,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.time_bucket_s = time_bucket_s
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._data: "OrderedDict[Tuple[str, Optional[int]], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _bucket(self) -> int:
+        return int(self._wall_clock() // self.time_bucket_s)
+
+    def _lookup(self, key, now: float):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if now >= expires_at:
+            del self._data[key]
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, transcript: str, count_miss: bool = True) -> Optional[Any]:
+        """Cached value for transcript, or None. count_miss=False for a look-ahead that will be retried."""
+        if not self.enabled:
+            return None
+        text = normalize_text(transcript)
+        now = self._clock()
+        with self._lock:
+            value = self._lookup((text, None), now)
+            if value is None:
+                value = self._lookup((text, self._bucket()), now)
+            if value is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, transcript: str, value: Any, time_dependent: bool = False) -> None:
+        """Store value; time_dependent values are only served within the current time bucket."""
+        if not self.enabled:
+            return
+        key = (normalize_text(transcript), self._bucket() if time_dependent else None)
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl_s,
+                "time_bucket_s": self.time_bucket_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
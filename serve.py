@@ -0,0 +1,208 @@
+# serve.py
+"""
+Multi-worker serving with models loaded once and shared copy-on-write.
+
+    python serve.py --workers 4 --port 8000
+
+The parent process loads and warms every model, moves the kNN reference
+matrices into shared memory, freezes the GC and then forks the uvicorn
+workers onto one listening socket. Model weights are therefore mapped once
+per node instead of once per worker. Each worker gets an equal share of the
+cores for torch / OpenMP / ONNX Runtime threads, so N workers do not
+oversubscribe the CPU. Dead workers are re-forked from the warm parent.
+
+    BOT_WORKERS=2                 worker processes (default: 2)
+    BOT_THREADS_PER_WORKER=0      0 = usable cores // workers (at least 1)
+    BOT_HOST=0.0.0.0 BOT_PORT=8000
+
+Metrics, caches and the micro-batching scheduler are per worker. POSIX only (fork).
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Dict
+
+from logger_config import logger
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "2"))
+BOT_THREADS_PER_WORKER = int(os.getenv("BOT_THREADS_PER_WORKER", "0"))
+BOT_HOST = os.getenv("BOT_HOST", "0.0.0.0")
+BOT_PORT = int(os.getenv("BOT_PORT", "8000"))
+
+RESPAWN_DELAY_S = 1.0  # between re-forks of a crashing worker
+SHUTDOWN_TIMEOUT_S = 30.0
+
+# Thread-count variables read by torch / OpenMP / MKL / ONNX Runtime at import or session creation
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "TORCH_INTRA_OP_THREADS", "ONNX_THREADS")
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(workers: int, requested: int = BOT_THREADS_PER_WORKER) -> int:
+    if requested > 0:
+        return requested
+    return max(1, usable_cores() // max(1, workers))
+
+
+def configure_thread_env(threads: int) -> None:
+    """Must run before torch / onnxruntime are imported; explicit user settings win."""
+    for var in THREAD_ENV_VARS:
+        os.environ.setdefault(var, str(threads))
+    # HF tokenizers' own thread pool is not fork-safe
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(threads: int):
+    """Import the app and load, warm and share every model in this (parent) process."""
+    # The parent must not start threads before forking: no background preload, no scheduler
+    os.environ["MODEL_PRELOAD"] = "0"
+    import app as bot_app
+    from model_registry import registry
+
+    # Warm up single-threaded: an OpenMP pool started in the parent does not survive fork
+    _set_torch_threads(1)
+    start = time.perf_counter()
+    registry.load_all()
+    if bot_app.main_bot is not None and hasattr(bot_app.main_bot, "warmup"):
+        registry.warmup(bot_app.main_bot.warmup)
+
+    for name in ("intent_index", "status_index"):
+        if registry.is_loaded(name):
+            registry.get(name).share()
+
+    # Keep the loaded objects out of GC passes, which would touch (and copy) their pages in every worker
+    gc.collect()
+    gc.freeze()
+    logger.info(f"[serve] Models loaded and warmed in {time.perf_counter() - start:.1f}s (ready={registry.is_ready()})")
+    return bot_app
+
+
+def _set_torch_threads(threads: int) -> None:
+    try:
+        from pipeline_optim import configure_torch_threads
+        configure_torch_threads(intra=threads, force=True)
+    except ImportError:
+        # torch not installed (e.g. stub models / ONNX only): nothing to configure
+        pass
+
+
+def run_worker(bot_app, sock: socket.socket, worker_id: int, threads: int, log_level: str) -> None:
+    """Body of a forked worker: own torch threads, own scheduler, uvicorn on the shared socket."""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ["BOT_WORKER_ID"] = str(worker_id)
+    _set_torch_threads(threads)
+
+    config = uvicorn.Config(bot_app.app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    logger.info(f"[serve] Worker {worker_id} (pid {os.getpid()}) serving with {threads} thread(s)")
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers from the warm parent and re-forks any that exit."""
+
+    def __init__(self, bot_app, sock: socket.socket, workers: int, threads: int, log_level: str = "info"):
+        self.bot_app = bot_app
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker id
+        self.stopping = False
+
+    def spawn(self, worker_id: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.bot_app, self.sock, worker_id, self.threads, self.log_level)
+            except BaseException as e:
+                logger.info(f"[serve] Worker {worker_id} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = worker_id
+
+    def stop(self, signum=None, frame=None) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+        logger.info(f"[serve] {self.workers} worker(s) started: pids={sorted(self.children)}")
+
+        deadline = None
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG if self.stopping else 0)
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if pid == 0:
+                # stopping: poll until every worker has exited, then force the stragglers
+                deadline = deadline or time.monotonic() + SHUTDOWN_TIMEOUT_S
+                if time.monotonic() > deadline:
+                    for child in self.children:
+                        os.kill(child, signal.SIGKILL)
+                time.sleep(0.1)
+                continue
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None or self.stopping:
+                continue
+            logger.info(f"[serve] Worker {worker_id} (pid {pid}) exited with status {status}, re-forking")
+            time.sleep(RESPAWN_DELAY_S)
+            if not self.stopping:
+                self.spawn(worker_id)
+        logger.info("[serve] All workers stopped")
+
+
+def serve(host: str = BOT_HOST, port: int = BOT_PORT, workers: int = BOT_WORKERS, threads: int = 0, log_level: str = "info") -> None:
+    threads = threads_per_worker(workers, threads)
+    configure_thread_env(threads)
+    sock = bind_socket(host, port)
+    bot_app = preload(threads)
+    logger.info(f"[serve] Listening on {host}:{port} with {workers} worker(s) x {threads} thread(s) ({usable_cores()} cores)")
+    Supervisor(bot_app, sock, workers, threads, log_level).run()
+
+
+# CLI
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Pre-forked multi-worker server with shared, preloaded models")
+    p.add_argument("--host", default=BOT_HOST)
+    p.add_argument("--port", type=int, default=BOT_PORT)
+    p.add_argument("--workers", type=int, default=BOT_WORKERS)
+    p.add_argument("--threads-per-worker", type=int, default=BOT_THREADS_PER_WORKER, help="0 = cores // workers")
+    p.add_argument("--log-level", default="info")
+    args = p.parse_args()
+
+    serve(args.host, args.port, args.workers, args.threads_per_worker, args.log_level)
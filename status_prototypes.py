@@ -0,0 +1,145 @@
+# status_prototypes.py
+"""
+Lead-status classifier on the sentence encoder already loaded for intent detection.
+
+Each status (NEW, IN_PROGRESS, FOLLOW_UP, WON, LOST) has a small curated
+prototype vocabulary; a transcript is scored by cosine kNN against those
+prototypes, reusing the (cached) transcript embedding from intent scoring.
+BART zero-shot NLI is only consulted when enabled and the prototype margin is low.
+
+    STATUS_BACKEND=prototype      prototype kNN (default) | zero-shot (BART on every request)
+    STATUS_K=3                    neighbors per query
+    STATUS_MIN_MARGIN=0.10        top-1 minus top-2 score below which the result is "low margin"
+    STATUS_BART_FALLBACK=0        1 = re-classify low-margin transcripts with BART zero-shot
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from knn_index import FusedIntentIndex
+from embedding_store import load_or_build, artifact_set_dir
+from model_registry import registry
+from telemetry import stage, MODEL_ERRORS
+import intent_transformer_knn as knn
+
+from syntheticData.status_prototype_data import STATUS_PROTOTYPES
+
+from logger_config import logger
+
+STATUS_BACKEND = os.getenv("STATUS_BACKEND", "prototype").lower()
+STATUS_K = int(os.getenv("STATUS_K", "3"))
+STATUS_MIN_MARGIN = float(os.getenv("STATUS_MIN_MARGIN", "0.10"))
+STATUS_BART_FALLBACK = os.getenv("STATUS_BART_FALLBACK", "0") == "1"
+
+STATUS_LABELS = list(STATUS_PROTOTYPES.keys())
+
+# Building the prototype vocabulary
+prototypes = []
+prototype_labels = []
+for status, plist in STATUS_PROTOTYPES.items():
+    for p in plist:
+        prototypes.append(p)
+        prototype_labels.append(status)
+
+STATUS_VOCABULARIES = {"status": prototypes}
+
+if STATUS_BACKEND not in ("prototype", "zero-shot"):
+    raise ValueError(f"Unknown STATUS_BACKEND '{STATUS_BACKEND}' (expected prototype or zero-shot)")
+
+
+def uses_zero_shot() -> bool:
+    """True if BART zero-shot can be needed at all (and so should be preloaded)."""
+    return STATUS_BACKEND == "zero-shot" or STATUS_BART_FALLBACK
+
+
+def _build_status_index():
+    embs = load_or_build(
+        knn.EMBED_MODEL_ID,
+        STATUS_VOCABULARIES,
+        lambda tokens: knn.get_encoder().encode(tokens, normalize_embeddings=True),
+        artifact_dir=artifact_set_dir("status"),
+    )
+    return FusedIntentIndex(STATUS_LABELS, STATUS_K).add("status", prototypes, prototype_labels, embs["status"]).build()
+
+
+registry.register("status_index", _build_status_index, required=(STATUS_BACKEND == "prototype"))
+
+
+def get_status_index() -> FusedIntentIndex:
+    index = registry.get("status_index")
+    if index is None:
+        raise RuntimeError("Status prototype index is not available")
+    return index
+
+
+def _result(scores: Dict[str, float], method: str) -> Dict[str, Any]:
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    confidence = ranked[0][1]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return {
+        "label": ranked[0][0],
+        "confidence": float(confidence),
+        "margin": float(confidence - runner_up),
+        "method": method,
+        "scores": {label: float(s) for label, s in scores.items()},
+    }
+
+
+def _zero_shot(texts: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """BART zero-shot over texts in one call; None if the model is unavailable or fails."""
+    classifier = registry.get("status_classifier")
+    if classifier is None:
+        return None
+    try:
+        with stage("zero_shot"):
+            out = classifier(texts, candidate_labels=STATUS_LABELS)
+    except Exception as e:
+        logger.info(f"[error] Zero-shot status classification failed: {e}")
+        MODEL_ERRORS.inc("status_classifier", "inference")
+        return None
+    if isinstance(out, dict):
+        out = [out]
+    return [_result(dict(zip(res["labels"], res["scores"])), "zero-shot") for res in out]
+
+
+def classify_status_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Classify every transcript: {label, confidence, margin, method, scores}.
+    Prototype kNN for the whole batch in one matrix product; low-margin rows
+    go to BART in one call when STATUS_BART_FALLBACK is on.
+    """
+    if not texts:
+        return []
+
+    if STATUS_BACKEND == "zero-shot":
+        results = _zero_shot(texts)
+        if results is None:
+            raise RuntimeError("Zero-shot status classifier is not available")
+        return results
+
+    rows = get_status_index().score(knn.embed_texts(texts))["status"]
+    results = [_result(scores, "prototype") for scores in rows]
+
+    low = [i for i, res in enumerate(results) if res["margin"] < STATUS_MIN_MARGIN]
+    if low and STATUS_BART_FALLBACK:
+        fallback = _zero_shot([texts[i] for i in low])
+        if fallback is not None:
+            for i, res in zip(low, fallback):
+                res["prototype"] = {k: results[i][k] for k in ("label", "confidence", "margin")}
+                results[i] = res
+    return results
+
+
+def classify_status(text: str) -> Dict[str, Any]:
+    return classify_status_batch([text])[0]
+
+
+# CLI (FOR TESTING)
+if __name__ == "__main__":
+    import argparse
+    import json
+    p = argparse.ArgumentParser(description="Prototype lead-status classifier")
+    p.add_argument("--text", type=str, required=True)
+    args = p.parse_args()
+
+    print(json.dumps(classify_status(args.text), indent=2))
@@ -0,0 +1,157 @@
+# streaming.py
+"""
+Incremental intent / entity extraction over partial STT hypotheses (WebSocket /bot/stream).
+
+    client: {"transcript": "add a new lead rohan", "final": false}
+    server: {"event": "interim", "intent": "LEAD_CREATE", "entities": {...}, ...}
+            {"event": "intent_committed", "intent": "LEAD_CREATE", ...}      (once per utterance)
+    client: {"transcript": "add a new lead rohan sharma from gurgaon ...", "final": true}
+    server: {"event": "final", "result": <process_request output>, ...}
+
+Recognizers keep revising the last word of a partial, so only the stable
+prefix (every word but the last) is processed, and only when it changes.
+Rule-based extractors rerun on every update; the NER / status models rerun
+only at a sentence end or every STREAM_MODEL_EVERY_WORDS new words, and
+their last output is reused in between. Once the same intent has led
+STREAM_COMMIT_UPDATES updates in a row it is committed, and the extraction
+plan narrows to that intent's fields.
+
+The final result is process_request on the final transcript, so it is
+identical to the batch path; when the last interim update already covered
+that exact text, its intent scores and entities seed the response cache
+and nothing is recomputed.
+"""
+
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from extract_entities_tools import EXTRACTORS, MODEL_STAGES, assemble_entities, plan_extractors, stage_details
+from intent_transformer_knn import score_intents_avg
+from transcript_analysis import analyze
+import main_bot
+import telemetry
+
+STREAM_COMMIT_UPDATES = int(os.getenv("STREAM_COMMIT_UPDATES", "3"))
+STREAM_MODEL_EVERY_WORDS = int(os.getenv("STREAM_MODEL_EVERY_WORDS", "4"))
+STREAM_MAX_CHARS = int(os.getenv("STREAM_MAX_CHARS", "4000"))
+
+_SENTENCE_END_RE = re.compile(r"[.!?]\s*$")
+
+STREAM_UPDATES = telemetry.metrics.counter("bot_stream_updates_total", "Partial hypotheses by outcome (processed, unchanged, coalesced).", ("outcome",))
+
+
+def stable_prefix(hypothesis: str, final: bool = False) -> str:
+    """The part of a partial hypothesis the recognizer is unlikely to revise: all words but the last."""
+    text = " ".join(hypothesis.split())
+    if final or not text:
+        return text
+    if hypothesis[-1:].isspace() or _SENTENCE_END_RE.search(text):
+        # the last word is complete
+        return text
+    return text.rsplit(" ", 1)[0] if " " in text else ""
+
+
+class StreamSession:
+    """State for one utterance; feed() is blocking (run it off the event loop)."""
+
+    def __init__(self, metadata: Optional[dict] = None):
+        self.metadata = metadata or {}
+        self.reset()
+
+    def reset(self) -> None:
+        self.text = ""
+        self.updates = 0
+        self.intent_scores: Dict[str, float] = {}
+        self.intent = "UNKNOWN"
+        self.committed: Optional[str] = None
+        self._streak = 0
+        self._stage_out: Dict[str, Any] = {}
+        self._stage_text: Dict[str, str] = {}  # text each stage output was computed from
+        self._model_words = 0  # word count when the model stages last ran
+        self._started = time.perf_counter()
+
+    def _plan(self) -> List[str]:
+        return plan_extractors(self.committed or self.intent)
+
+    def _run_stages(self, text: str, names: List[str]) -> None:
+        if not names:
+            return
+        with telemetry.stage("analysis"):
+            analysis = analyze(text)
+        for name in names:
+            with telemetry.stage(name):
+                self._stage_out[name] = EXTRACTORS[name](analysis)
+            self._stage_text[name] = text
+
+    def _process(self, text: str) -> None:
+        with telemetry.stage("intent"):
+            _, _, _, self.intent_scores = score_intents_avg(text)
+        intent = main_bot.normalize_intent(self.intent_scores)
+        self._streak = self._streak + 1 if intent == self.intent else 1
+        self.intent = intent
+
+        words = len(text.split())
+        run_models = words - self._model_words >= STREAM_MODEL_EVERY_WORDS or bool(_SENTENCE_END_RE.search(text))
+        names = [n for n in self._plan() if run_models or n not in MODEL_STAGES or n not in self._stage_out]
+        self._run_stages(text, names)
+        if run_models:
+            self._model_words = words
+        self.text = text
+
+    def _interim(self) -> dict:
+        plan = self._plan()
+        return {
+            "event": "interim",
+            "update": self.updates,
+            "transcript": self.text,
+            "intent": self.intent,
+            "committed_intent": self.committed,
+            "intent_scores": {k: round(v, 4) for k, v in self.intent_scores.items()},
+            "entities": assemble_entities({k: v for k, v in self._stage_out.items() if k in plan}),
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000.0, 2),
+        }
+
+    def feed(self, hypothesis: str) -> List[dict]:
+        """Events for one partial hypothesis (empty if its stable prefix did not change)."""
+        text = stable_prefix(hypothesis[:STREAM_MAX_CHARS])
+        if not text or text == self.text:
+            STREAM_UPDATES.inc("unchanged")
+            return []
+        STREAM_UPDATES.inc("processed")
+        self.updates += 1
+        self._process(text)
+
+        events = [self._interim()]
+        if self.committed is None and self.intent != "UNKNOWN" and self._streak >= STREAM_COMMIT_UPDATES:
+            self.committed = self.intent
+            events.append({
+                "event": "intent_committed",
+                "intent": self.committed,
+                "update": self.updates,
+                "transcript": self.text,
+                "elapsed_ms": round((time.perf_counter() - self._started) * 1000.0, 2),
+            })
+        return events
+
+    def finish(self, transcript: str) -> dict:
+        """The final event: process_request on the full transcript, reusing the last update when it matches."""
+        text = stable_prefix(transcript[:STREAM_MAX_CHARS], final=True)
+        if text and text == self.text:
+            # the plan and entities process_request would compute for this text: bring every stage up to date
+            plan = plan_extractors(main_bot.normalize_intent(self.intent_scores))
+            self._run_stages(text, [name for name in plan if self._stage_text.get(name) != text])
+            outputs = {name: self._stage_out[name] for name in plan}
+            main_bot._cache_pipeline_output(text, self.intent_scores, assemble_entities(outputs), plan, stage_details(outputs))
+
+        result = main_bot.process_request({"transcript": transcript, "metadata": self.metadata})
+        event = {
+            "event": "final",
+            "result": result,
+            "committed_intent": self.committed,
+            "updates": self.updates,
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000.0, 2),
+        }
+        self.reset()
+        return event
@@ -0,0 +1,112 @@
+# stub_models.py
+"""
+Deterministic stand-ins for the encoder, NER and zero-shot models (BOT_STUB_MODELS=1).
+
+No weights are downloaded and nothing touches the network, so the web,
+scheduling and serialization layers can be load-tested on their own. The
+outputs are cheap heuristics, stable across runs and processes:
+
+    StubEncoder          hashed bag-of-words embedding (texts sharing words are close)
+    StubNERPipeline      mid-sentence capitalized words: after from/in/at -> LOC, otherwise PER
+    StubZeroShotPipeline candidate labels ranked by word overlap with the text
+
+BOT_STUB_CALL_MS / BOT_STUB_ITEM_MS add a fixed per-call and per-text delay to
+every stub model call, to mimic model cost when testing batching and saturation.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+STUB_MODELS = os.getenv("BOT_STUB_MODELS", "0") == "1"
+STUB_DIM = 64
+STUB_CALL_MS = float(os.getenv("BOT_STUB_CALL_MS", "0"))
+STUB_ITEM_MS = float(os.getenv("BOT_STUB_ITEM_MS", "0"))
+
+_WORD_RE = re.compile(r"\w+")
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][a-z]+\b")
+_LOCATION_CUES = {"from", "in", "at", "to"}
+_SKIP_CUES = {"source", "via", "on", "through"}
+_CALENDAR = {"jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+             "mon", "tue", "wed", "thu", "fri", "sat", "sun"}
+
+
+def _simulate_cost(n_items: int) -> None:
+    delay_ms = STUB_CALL_MS + STUB_ITEM_MS * n_items
+    if delay_ms > 0:
+        time.sleep(delay_ms / 1000.0)
+
+
+def _bucket(token: str) -> int:
+    # stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little") % STUB_DIM
+
+
+class StubEncoder:
+    """Encoder backend interface (encode / get_sentence_embedding_dimension) over hashed word counts."""
+
+    name = "stub"
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        _simulate_cost(len(texts))
+        embs = np.zeros((len(texts), STUB_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _WORD_RE.findall(text.lower()):
+                embs[i, _bucket(token)] += 1.0
+            if not embs[i].any():
+                embs[i, _bucket(text)] = 1.0
+        if normalize_embeddings:
+            embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+        return embs
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return STUB_DIM
+
+
+class StubNERPipeline:
+    """Same call shape and output format as pipeline("ner", aggregation_strategy="simple")."""
+
+    def _entities(self, text: str) -> List[Dict[str, Any]]:
+        ents = []
+        for m in _CAPITALIZED_RE.finditer(text):
+            word = m.group(0)
+            before = text[:m.start()].rstrip()
+            # sentence-initial words are verbs ("Add", "Schedule"), not names
+            if not before or before[-1] in ".!?" or word[:3].lower() in _CALENDAR:
+                continue
+            cue = before.split()[-1].lower()
+            if cue in _SKIP_CUES:
+                continue
+            group = "LOC" if cue in _LOCATION_CUES else "PER"
+            ents.append({"entity_group": group, "word": word, "score": 0.99, "start": m.start(), "end": m.end()})
+        return ents
+
+    def __call__(self, inputs: Union[str, List[str]], **kwargs):
+        if isinstance(inputs, list):
+            _simulate_cost(len(inputs))
+            return [self._entities(t) for t in inputs]
+        _simulate_cost(1)
+        return self._entities(inputs)
+
+
+class StubZeroShotPipeline:
+    """Same call shape and output format as pipeline("zero-shot-classification")."""
+
+    def _classify(self, text: str, labels: List[str]) -> Dict[str, Any]:
+        words = set(_WORD_RE.findall(text.lower()))
+        overlap = [len(words & set(label.lower().split("_"))) + 1.0 for label in labels]
+        total = sum(overlap)
+        ranked = sorted(zip(labels, overlap), key=lambda item: -item[1])
+        return {"sequence": text, "labels": [l for l, _ in ranked], "scores": [s / total for _, s in ranked]}
+
+    def __call__(self, inputs: Union[str, List[str]], candidate_labels: List[str] = (), **kwargs):
+        labels = list(candidate_labels)
+        if isinstance(inputs, list):
+            _simulate_cost(len(inputs))
+            return [self._classify(t, labels) for t in inputs]
+        _simulate_cost(1)
+        return self._classify(inputs, labels)
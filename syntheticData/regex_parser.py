@@ -43,7 +43,54 @@ INTENT_REGEX = {
     "SCHEDULING": SCHEDULING_REGEX
 }
 
+# Prefilter gates: where in a transcript each pattern can possibly match.
+#   numeric : every match starts with a digit, "+" or "(" -> scan from the first such char
+#   digit   : every match contains a digit               -> skip texts without digits
+#   email   : every match contains "@"
+#   month   : every match contains a digit and a month name
+#   weekday : every match contains "day"
+# Patterns without a gate are always scanned in full.
+PATTERN_GATES = {
+    ADDING_REGEX[0]: "numeric",
+    ADDING_REGEX[1]: "numeric",
+    ADDING_REGEX[2]: "email",
+    ADDING_REGEX[3]: "numeric",
+    ADDING_REGEX[4]: "numeric",
+    SCHEDULING_REGEX[0]: "numeric",
+    SCHEDULING_REGEX[1]: "numeric",
+    SCHEDULING_REGEX[2]: "numeric",
+    SCHEDULING_REGEX[3]: "month",
+    SCHEDULING_REGEX[4]: "weekday",
+    SCHEDULING_REGEX[5]: "numeric",
+    SCHEDULING_REGEX[6]: "numeric",
+    SCHEDULING_REGEX[7]: "numeric",
+    SCHEDULING_REGEX[8]: "digit",
+}
+
+_NUMERIC_START = re.compile(r"[\d+(]")
+_DIGIT = re.compile(r"\d")
+_MONTH_PREFIXES = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+
+class _Rule:
+    """One compiled pattern: plain and overlapping (lookahead) forms plus its prefilter gate."""
+
+    __slots__ = ("intent", "pattern", "regex", "overlapping", "gate")
+
+    def __init__(self, intent: str, regex, gate: Optional[str]):
+        self.intent = intent
+        self.pattern = regex.pattern
+        self.regex = regex
+        self.gate = gate
+        try:
+            self.overlapping = re.compile(r"(?=(" + regex.pattern + r"))", flags=re.IGNORECASE)
+        except re.error:
+            # fall back to non-overlapping finditer if the lookahead form does not compile
+            self.overlapping = None
+
+
 _COMPILED = {}
+_RULES: List[_Rule] = []
 for intent, patterns in INTENT_REGEX.items():
     compiled_list = []
     for p in patterns:
@@ -52,9 +99,34 @@ for intent, patterns in INTENT_REGEX.items():
         except re.error:
             # if someone adds a bad regex, ignore it but warn in runtime
             print(f"[regex_parser] Warning: failed to compile pattern for {intent}: {p!r}")
+            continue
+        _RULES.append(_Rule(intent, compiled_list[-1], PATTERN_GATES.get(p)))
     _COMPILED[intent] = compiled_list
 
 
+def _gate_starts(text: str) -> Dict[str, Optional[int]]:
+    """For each gate, the position to start scanning from, or None if no match is possible."""
+    numeric = _NUMERIC_START.search(text)
+    numeric_start = numeric.start() if numeric else None
+    has_digit = numeric_start is not None and _DIGIT.search(text, numeric_start) is not None
+
+    if text.isascii():
+        lower = text.lower()
+        has_month = any(m in lower for m in _MONTH_PREFIXES)
+        has_weekday = "day" in lower
+    else:
+        # IGNORECASE folds some non-ASCII letters onto ASCII ones; don't gate on words then
+        has_month = has_weekday = True
+
+    return {
+        "numeric": numeric_start,
+        "digit": 0 if has_digit else None,
+        "email": 0 if "@" in text else None,
+        "month": 0 if (has_digit and has_month) else None,
+        "weekday": 0 if has_weekday else None,
+    }
+
+
 def regex_score(
     text: str,
     per_match_score: float = 0.5,
@@ -66,28 +138,27 @@ def regex_score(
     if not text:
         return ({intent: 0.0 for intent in _COMPILED.keys()}, [])
 
-    increments = {intent: 0.0 for intent in _COMPILED.keys()}
+    totals = {intent: 0.0 for intent in _COMPILED.keys()}
     matches_meta: List[Tuple[str, str, str]] = []
-
-    for intent, compiled_list in _COMPILED.items():
-        total = 0.0
-        for cre in compiled_list:
-            pattern = cre.pattern
-            if count_overlapping:
-                # attempt overlapping matches via lookahead
-                try:
-                    lookahead = re.compile(r"(?=(" + pattern + r"))", flags=re.IGNORECASE)
-                    found = [m.group(1) for m in lookahead.finditer(text)]
-                except re.error:
-                    # fallback to non-overlapping finditer if lookahead fails
-                    found = [m.group(0) for m in cre.finditer(text)]
-            else:
-                found = [m.group(0) for m in cre.finditer(text)]
-
-            for m in found:
-                total += per_match_score
-                matches_meta.append((intent, pattern, m))
-
+    starts = _gate_starts(text)
+
+    # Rules are in intent, then pattern order, so matches_meta keeps that order
+    for rule in _RULES:
+        pos = 0 if rule.gate is None else starts[rule.gate]
+        if pos is None:
+            continue
+        if count_overlapping and rule.overlapping is not None:
+            # overlapping matches via the precompiled lookahead
+            found = [m.group(1) for m in rule.overlapping.finditer(text, pos)]
+        else:
+            found = [m.group(0) for m in rule.regex.finditer(text, pos)]
+
+        for m in found:
+            totals[rule.intent] += per_match_score
+            matches_meta.append((rule.intent, rule.pattern, m))
+
+    increments = {}
+    for intent, total in totals.items():
         if (max_per_intent is not None) and (total > max_per_intent):
             total = float(max_per_intent)
         increments[intent] = float(total)
@@ -102,6 +173,16 @@ def regex_score(
     return normalized, matches_meta
 
 
+def regex_score_many(
+    texts: List[str],
+    per_match_score: float = 0.5,
+    max_per_intent: Optional[float] = None,
+    count_overlapping: bool = False,
+) -> List[Tuple[Dict[str, float], List[Tuple[str, str, str]]]]:
+    """regex_score for every text, in order."""
+    return [regex_score(t, per_match_score, max_per_intent, count_overlapping) for t in texts]
+
+
 
 # CLI (FOR TESTING)
 if __name__ == "__main__":
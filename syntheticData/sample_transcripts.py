@@ -0,0 +1,31 @@
+# synthetic_data/sample_transcripts.py
+"""
+Fixed transcript corpus covering every intent plus ambiguous prompts.
+Used by the encoder parity check, quantization reports and benchmarks.
+"""
+
+SAMPLE_TRANSCRIPTS = [
+    # --- ADDING / Lead Creation ---
+    "Add a new lead: Rohan Sharma from Gurgaon, phone 9876543210, source Instagram.",
+    "Create lead name Priya Nair, city Mumbai, contact 91234-56789.",
+    "Add a customer profile for Aarav Mehta in Pune, source LinkedIn.",
+    "Register new client Sneha Kapoor, number 8899776655, from Delhi.",
+
+    # --- SCHEDULING / Visit ---
+    "Update client 9c2d meeting on 12-10-2025 10am.",
+    "Schedule inspection 2025-10-15 18:30 for 3w2rq2345tt in Bengaluru.",
+    "Schedule a visit for lead 7b1b8f54 at 3 pm tomorrow.",
+    "Fix a site visit for lead 8f2a on Oct the 15th of 2025 at 5:00 pm IST.",
+    "Book an appointment with client 9c2d for property tour next Monday.",
+
+    # --- UPDATING / Status Change ---
+    "Update lead 7b1b8f54 to in progress.",
+    "Mark lead 7b1b8f54 as won. Notes: booked unit A2.",
+    "Change status of lead 7b1b8f54 to lost.",
+    "Modify lead 8c1d to follow up tomorrow.",
+
+    # --- Misc / Ambiguous ---
+    "Can you help me?",
+    "Check the status of lead 7b1b8f54.",
+    "Show me all leads created today."
+]
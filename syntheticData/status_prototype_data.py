@@ -0,0 +1,44 @@
+# synthetic_data/status_prototype_data.py
+"""
+Curated prototype phrases per lead status.
+Used by the embedding-prototype status classifier in status_prototypes.py
+"""
+
+# ---------- NEW ----------
+new_phrases = [
+    "new lead", "fresh enquiry", "just came in", "not contacted yet", "newly added",
+    "first contact", "new prospect", "new customer"
+]
+
+# ---------- IN_PROGRESS ----------
+in_progress_phrases = [
+    "in progress", "working on it", "ongoing", "under discussion", "in negotiation",
+    "being processed", "in talks", "proposal sent", "site visit done"
+]
+
+# ---------- FOLLOW_UP ----------
+follow_up_phrases = [
+    "follow up", "call back later", "remind me", "check in again", "reconnect next week",
+    "awaiting response", "pending reply", "get back to them"
+]
+
+# ---------- WON ----------
+won_phrases = [
+    "won", "deal closed", "converted", "booked", "signed the agreement",
+    "payment received", "purchase confirmed", "sale done"
+]
+
+# ---------- LOST ----------
+lost_phrases = [
+    "lost", "not interested", "dropped", "cancelled", "went with a competitor",
+    "rejected the offer", "no longer interested", "unreachable"
+]
+
+# ---------- Combined status mapping ----------
+STATUS_PROTOTYPES = {
+    "NEW": new_phrases,
+    "IN_PROGRESS": in_progress_phrases,
+    "FOLLOW_UP": follow_up_phrases,
+    "WON": won_phrases,
+    "LOST": lost_phrases,
+}
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmark import compare, print_rows
+
+
+def _report(p50, p95, rps, rss):
+    return {
+        "stages": {"ner": {"p50_ms": p50, "p95_ms": p95, "p99_ms": p95 * 2}},
+        "throughput": {"single_rps": rps, "batched_rps": rps * 2},
+        "peak_rss_mb": rss,
+    }
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = _report(p50=10.0, p95=20.0, rps=100.0, rss=1000.0)
+    current = _report(p50=11.0, p95=30.0, rps=70.0, rss=1100.0)
+    regressed = {r["metric"] for r in compare(baseline, current, threshold=0.2) if r["regressed"]}
+    assert regressed == {"ner.p95_ms", "throughput.single_rps", "throughput.batched_rps"}
+
+
+def test_compare_ignores_sub_noise_floor_slowdowns():
+    baseline = _report(p50=0.01, p95=0.02, rps=100.0, rss=1000.0)
+    current = _report(p50=0.03, p95=0.05, rps=100.0, rss=1000.0)
+    assert not any(r["regressed"] for r in compare(baseline, current, threshold=0.2))
+
+
+def test_compare_flags_a_stage_missing_from_the_current_report():
+    baseline = _report(p50=10.0, p95=20.0, rps=100.0, rss=1000.0)
+    baseline["stages"]["status"] = {"p50_ms": 5.0, "p95_ms": 8.0, "p99_ms": 9.0}
+    current = _report(p50=10.0, p95=20.0, rps=100.0, rss=1000.0)
+    rows = compare(baseline, current, threshold=0.2)
+
+    missing = [r for r in rows if r["metric"] == "status.missing"]
+    assert missing == [{"metric": "status.missing", "baseline": 5.0, "current": None, "change": None, "regressed": True}]
+    assert {r["metric"] for r in rows if r["regressed"]} == {"status.missing"}
+    print_rows(rows)  # the missing row prints without a current value
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import crm_client
+from crm_client import CRMClient, CircuitBreaker
+from crm_store import MemoryStore
+import mock_crm
+
+
+def _in_process_client(**kwargs) -> CRMClient:
+    mock_crm.use_store(MemoryStore())
+    transport = httpx.ASGITransport(app=mock_crm.app)
+    return CRMClient(async_client=httpx.AsyncClient(transport=transport, base_url="http://crm"), **kwargs)
+
+
+def test_dispatch_against_mock_crm():
+    async def run():
+        client = _in_process_client()
+        lead = await client.adispatch("LEAD_CREATE", {"name": "Rohan Sharma", "phone": "+919876543210", "city": "Gurgaon", "source": "Instagram"})
+        assert lead["endpoint"] == "/crm/leads" and lead["status_code"] == 200 and lead["attempts"] == 1
+        assert lead["latency_ms"] >= 0
+        lead_id = lead["response"]["lead_id"]
+
+        again = await client.adispatch("LEAD_CREATE", {"name": "Rohan Sharma", "phone": "+919876543210", "city": "Gurgaon"})
+        assert again["response"]["existing"] and again["response"]["lead_id"] == lead_id
+
+        visit = await client.adispatch("VISIT_SCHEDULE", {"lead_id": lead_id, "visit_time": "2026-10-17T15:00:00"})
+        assert visit["status_code"] == 200 and visit["response"]["status"] == "SCHEDULED"
+
+        update = await client.adispatch("LEAD_UPDATE", {"lead_id": lead_id, "status": "WON"})
+        assert update["endpoint"] == f"/crm/leads/{lead_id}/status" and update["response"]["status"] == "WON"
+
+        # a 4xx is the CRM's answer: reported as is, not retried, not a breaker failure
+        missing = await client.adispatch("LEAD_UPDATE", {"lead_id": "00000000-0000-4000-8000-000000000000", "status": "WON"})
+        assert missing["status_code"] == 404 and missing["attempts"] == 1
+        assert client.breaker.state == "closed"
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_retries_then_circuit_opens_and_fails_fast(monkeypatch):
+    monkeypatch.setattr(crm_client, "_backoff", lambda attempt: 0.0)
+    calls = []
+
+    def down(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_s=60)
+    client = CRMClient(max_retries=2, breaker=breaker, sync_client=httpx.Client(transport=httpx.MockTransport(down), base_url="http://crm"))
+    first = client.dispatch("LEAD_UPDATE", {"lead_id": "abc", "status": "WON"})
+    assert first["status_code"] is None and first["attempts"] == 3 and "ConnectError" in first["error"]
+    assert breaker.state == "open"
+
+    second = client.dispatch("LEAD_UPDATE", {"lead_id": "abc", "status": "WON"})
+    assert second["attempts"] == 0 and "CircuitOpen" in second["error"]
+    assert len(calls) == 3
+
+
+def test_circuit_opening_mid_retry_reports_the_last_real_attempt(monkeypatch):
+    monkeypatch.setattr(crm_client, "_backoff", lambda attempt: 0.0)
+
+    def unavailable(request):
+        return httpx.Response(503, json={"detail": "overloaded"})
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=60)
+    client = CRMClient(max_retries=2, breaker=breaker, sync_client=httpx.Client(transport=httpx.MockTransport(unavailable), base_url="http://crm"))
+    result = client.dispatch("LEAD_UPDATE", {"lead_id": "00000000-0000-4000-8000-000000000000", "status": "WON"})
+    assert result["attempts"] == 1 and result["status_code"] == 503 and "error" not in result
+    assert result["response"] == {"detail": "overloaded"}
+
+
+def test_half_open_probe_closes_circuit():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10.0
+    assert breaker.allow() and not breaker.allow()  # one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_non_idempotent_call_is_not_resent_after_read_timeout(monkeypatch):
+    monkeypatch.setattr(crm_client, "_backoff", lambda attempt: 0.0)
+    calls = []
+
+    def slow(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = CRMClient(max_retries=2, sync_client=httpx.Client(transport=httpx.MockTransport(slow), base_url="http://crm"))
+    client.dispatch("LEAD_CREATE", {"name": "A", "phone": "1", "city": "B"})
+    assert len(calls) == 1
+    client.dispatch("LEAD_UPDATE", {"lead_id": "abc", "status": "WON"})
+    assert len(calls) == 4
+
+
+def test_short_lead_ids_are_resolved_before_dispatch(monkeypatch):
+    import crm_store
+    ids = iter(["8f2a0000-0000-4000-8000-000000000001", "8f2a1111-0000-4000-8000-000000000002"])
+    monkeypatch.setattr(crm_store, "uuid4", lambda: next(ids))
+
+    async def run():
+        client = _in_process_client()
+        lead_id = (await client.adispatch("LEAD_CREATE", {"name": "A", "phone": "1", "city": "Pune"}))["response"]["lead_id"]
+        await client.adispatch("LEAD_CREATE", {"name": "B", "phone": "2", "city": "Pune"})  # shares "8f2a"
+
+        update = await client.adispatch("LEAD_UPDATE", {"lead_id": lead_id[:8], "status": "WON"})
+        assert update["status_code"] == 200 and update["lead_resolution"]["lead_id"] == lead_id
+        assert update["endpoint"] == f"/crm/leads/{lead_id}/status"
+
+        ambiguous = await client.adispatch("VISIT_SCHEDULE", {"lead_id": lead_id[:4], "visit_time": "2026-10-17T15:00:00"})
+        assert ambiguous["status_code"] == 409 and "matches several leads" in ambiguous["error"]
+
+        missing = await client.adispatch("LEAD_UPDATE", {"lead_id": "ffff0000", "status": "WON"})
+        assert missing["status_code"] == 404 and "no lead matches" in missing["error"]
+        await client.aclose()
+
+    asyncio.run(run())
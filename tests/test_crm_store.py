@@ -0,0 +1,114 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crm_store import MemoryStore, SQLiteStore, InvalidCursor
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    s = MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "crm.db"))
+    yield s
+    s.close()
+
+
+def _leads(n):
+    cities = ["Pune", "Noida", "Delhi"]
+    return [{"name": f"Lead {i}", "phone": f"+91980000{i:04d}", "city": cities[i % 3]} for i in range(n)]
+
+
+def _drain(fetch, limit):
+    items, cursor, pages = [], None, 0
+    while True:
+        page, cursor = fetch(limit=limit, cursor=cursor)
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+def test_bulk_insert_and_filtered_cursor_pages(store):
+    created = store.create_leads(_leads(25))
+    assert store.counts() == {"leads": 25, "visits": 0}
+
+    pune, _ = _drain(lambda **kw: store.list_leads(city="Pune", **kw), limit=4)
+    assert [l["lead_id"] for l in pune] == [l["lead_id"] for l in created if l["city"] == "Pune"]
+
+    everyone, pages = _drain(store.list_leads, limit=10)
+    assert len(everyone) == 25 and pages == 3
+
+    assert store.list_leads(phone="+919800000007")[0][0]["lead_id"] == created[7]["lead_id"]
+
+    store.update_status(created[3]["lead_id"], "WON", notes="booked A2")
+    won = store.list_leads(status="WON")[0]
+    assert [l["lead_id"] for l in won] == [created[3]["lead_id"]] and won[0]["notes"] == "booked A2"
+    assert created[3]["lead_id"] not in {l["lead_id"] for l in store.list_leads(status="NEW", limit=1000)[0]}
+
+    with pytest.raises(InvalidCursor):
+        store.list_leads(cursor="not-a-cursor")
+
+
+def test_visits_by_time_range_and_lead(store):
+    a, b = store.create_leads(_leads(2))
+    assert store.create_visit({"lead_id": "missing", "visit_time": "2026-10-17T10:00:00"}) is None
+    for day, lead in [(19, a), (17, b), (18, a), (20, b)]:
+        store.create_visit({"lead_id": lead["lead_id"], "visit_time": f"2026-10-{day}T10:00:00"})
+
+    visits, _ = _drain(lambda **kw: store.list_visits(**kw), limit=3)
+    assert [v["visit_time"][8:10] for v in visits] == ["17", "18", "19", "20"]
+
+    window = store.list_visits(start="2026-10-18T00:00:00", end="2026-10-20T00:00:00")[0]
+    assert [v["visit_time"][8:10] for v in window] == ["18", "19"]
+
+    mine, _ = _drain(lambda **kw: store.list_visits(lead_id=a["lead_id"], **kw), limit=1)
+    assert [v["visit_time"][8:10] for v in mine] == ["18", "19"]
+
+    # mixed offsets are compared as instants: 2026-10-21 01:00+05:30 is 2026-10-20 19:30 UTC
+    c = store.create_leads(_leads(1))[0]
+    store.create_visit({"lead_id": c["lead_id"], "visit_time": "2026-10-21T01:00:00+05:30"})
+    store.create_visit({"lead_id": c["lead_id"], "visit_time": "2026-10-20T21:00:00Z"})
+    late = store.list_visits(lead_id=c["lead_id"], start="2026-10-20T20:00:00Z")[0]
+    assert [v["visit_time"] for v in late] == ["2026-10-20T21:00:00+00:00"]
+    ordered, _ = _drain(lambda **kw: store.list_visits(start="2026-10-20T12:00:00", **kw), limit=1)
+    assert [v["visit_time"] for v in ordered] == ["2026-10-20T19:30:00+00:00", "2026-10-20T21:00:00+00:00"]
+
+
+def test_prefix_resolution_is_incremental_and_reports_ambiguity(store, monkeypatch):
+    import crm_store
+    ids = iter(["8f2a0000-0000-4000-8000-000000000001", "8f2a1111-0000-4000-8000-000000000002",
+                "9c2d0000-0000-4000-8000-000000000003"])
+    monkeypatch.setattr(crm_store, "uuid4", lambda: next(ids))
+    store.create_lead(_leads(1)[0])
+    assert store.resolve_prefix("8f2a") == ["8f2a0000-0000-4000-8000-000000000001"]
+
+    store.create_leads(_leads(2))
+    assert store.resolve_prefix("8f2a") == ["8f2a0000-0000-4000-8000-000000000001", "8f2a1111-0000-4000-8000-000000000002"]
+    assert store.resolve_prefix("8f2a1") == ["8f2a1111-0000-4000-8000-000000000002"]
+    assert store.resolve_prefix("9c2d0000-0000") == ["9c2d0000-0000-4000-8000-000000000003"]
+    assert store.resolve_prefix("8f2a", limit=1) == ["8f2a0000-0000-4000-8000-000000000001"]
+    assert store.resolve_prefix("7b1b") == []
+
+
+def test_duplicate_leads_match_by_phone_or_similar_name_in_city(store):
+    rohan, _ = store.create_or_match({"name": "Rohan Sharma", "phone": "+91 98765-43210", "city": "Gurgaon"})
+    store.create_or_match({"name": "Priya Verma", "phone": "+919811111111", "city": "Pune"})
+
+    same, match = store.create_or_match({"name": "R. Sharma", "phone": "+919876543210", "city": "Delhi"})
+    assert same["lead_id"] == rohan["lead_id"] and match["by"] == "phone"
+
+    similar = store.find_duplicate({"name": "rohan sharmaa", "phone": "", "city": "gurgaon"})
+    assert similar["lead"]["lead_id"] == rohan["lead_id"] and similar["by"] == "name_city" and similar["score"] >= 0.7
+    assert similar["existing"]
+
+    # same name and city but another phone: a new lead, with the old one as a possible duplicate
+    other, hint = store.create_or_match({"name": "Rohan Sharma", "phone": "+919800000000", "city": "Gurgaon"})
+    assert other["lead_id"] != rohan["lead_id"] and other["phone"] == "+919800000000"
+    assert hint["lead"]["lead_id"] == rohan["lead_id"] and not hint["existing"]
+
+    # same name in another city, or a different name in the same city: a new lead
+    assert store.find_duplicate({"name": "Rohan Sharma", "phone": "+919811112222", "city": "Pune"}) is None
+    assert store.find_duplicate({"name": "Mohit Kapoor", "phone": "+919811112222", "city": "Gurgaon"}) is None
+    assert store.counts()["leads"] == 3
@@ -0,0 +1,41 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime_grammar import parse_datetime
+
+NOW = datetime(2026, 10, 16, 11, 20, 5)  # a Friday
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Schedule a visit for lead 7b1b8f54 at 3 pm tomorrow.", "2026-10-17T15:00:00"),
+    ("Schedule inspection 2025-10-15 18:30 for 3w2rq2345tt", "2025-10-15T18:30:00"),
+    ("Update client 9c2d meeting on 12-10-2025 10am.", "2025-10-12T10:00:00"),
+    ("Fix a site visit on Oct the 15th of 2025 at 5:30 pm", "2025-10-15T17:30:00"),
+    ("visit on 12th March at 3.30 p.m. IST", "2027-03-12T15:30:00+05:30"),
+    ("day after tomorrow at 9 am", "2026-10-18T09:00:00"),
+    ("next monday 4pm", "2026-10-19T16:00:00"),
+    ("friday", "2026-10-23T00:00:00"),
+    ("call at 10am", "2026-10-17T10:00:00"),
+])
+def test_grammar_resolves_common_forms(text, expected):
+    assert parse_datetime(text, now=NOW).isoformat() == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Mark lead 7b1b8f54 as won.",
+    "tomorrow at 5",          # bare hour
+    "in 3 days",              # relative offsets go to dateparser
+    "next week on monday",
+    "31-02-2026 at 3 pm",     # not a real date
+    "Visit Oct the fifteenth at 5 pm",
+    "visit 10/11 at 3pm",     # year-less day/month
+    "sat 5pm",                # abbreviated weekday
+    "visit on mon at 4pm",
+])
+def test_grammar_declines_what_it_does_not_model(text):
+    assert parse_datetime(text, now=NOW) is None
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import intent_transformer_knn as knn
+from intent_transformer_knn import EmbeddingCache
+from stub_models import StubEncoder
+
+
+class CountingEncoder(StubEncoder):
+    """StubEncoder that records every batch it encodes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, normalize_embeddings=True):
+        self.calls.append(list(texts))
+        return super().encode(texts, normalize_embeddings=normalize_embeddings)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    enc = CountingEncoder()
+    monkeypatch.setattr(knn, "get_encoder", lambda: enc)
+    monkeypatch.setattr(knn, "embedding_cache", EmbeddingCache(maxsize=8))
+    return enc
+
+
+def _row(key):
+    return np.full((1, 4), float(len(key)), dtype=np.float32)
+
+
+def test_lru_evicts_least_recently_used_at_capacity():
+    cache = EmbeddingCache(maxsize=2)
+    cache.put("a", _row("a"))
+    cache.put("bb", _row("bb"))
+    assert cache.get("a") is not None  # "a" is now the most recent
+    cache.put("ccc", _row("ccc"))
+
+    assert cache.get("bb") is None
+    assert cache.get("a") is not None and cache.get("ccc") is not None
+    assert cache.stats()["size"] == 2
+
+    # re-putting an existing key refreshes it instead of growing the cache
+    cache.put("a", _row("a"))
+    cache.put("dddd", _row("dddd"))
+    assert cache.get("ccc") is None and cache.get("a") is not None
+
+
+def test_hit_and_miss_counts():
+    cache = EmbeddingCache(maxsize=4)
+    assert cache.get("x") is None
+    cache.put("x", _row("x"))
+    cache.get("x")
+    cache.get("x")
+    cache.get("y")
+    assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 2, "misses": 2, "hit_ratio": 0.5}
+
+    cache.clear()
+    assert cache.stats() == {"size": 0, "maxsize": 4, "hits": 0, "misses": 0, "hit_ratio": 0.0}
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = EmbeddingCache(maxsize=0)
+    cache.put("x", _row("x"))
+    assert cache.get("x") is None and cache.stats()["size"] == 0
+
+
+def test_embed_texts_encodes_only_misses_and_keeps_order(encoder):
+    warm = ["schedule a visit", "mark lead as won"]
+    knn.embed_texts(warm)
+    assert encoder.calls == [warm]
+
+    texts = ["add a new lead", "  schedule   a visit ", "call back tomorrow", "add a new lead", "mark lead as won"]
+    embs = knn.embed_texts(texts)
+
+    # one batch with each distinct miss once; cached and whitespace-variant texts are not re-encoded
+    assert encoder.calls[1:] == [["add a new lead", "call back tomorrow"]]
+    expected = StubEncoder().encode([knn.normalize_text(t) for t in texts], normalize_embeddings=True)
+    np.testing.assert_allclose(embs, expected, rtol=1e-6)
+
+    stats = knn.embedding_cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 + 3
+
+
+def test_embed_texts_all_cached_makes_no_encoder_call(encoder):
+    texts = ["add a new lead", "mark lead as won"]
+    first = knn.embed_texts(texts)
+    again = knn.embed_texts(texts[::-1])
+    assert len(encoder.calls) == 1
+    np.testing.assert_array_equal(again, first[::-1])
+    assert knn.embed_texts([]).shape == (0, StubEncoder().get_sentence_embedding_dimension())
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import embedding_store
+from embedding_store import MANIFEST_NAME, load_embeddings, load_or_build, read_manifest, save_embeddings
+from stub_models import StubEncoder
+
+MODEL = "stub-encoder"
+VOCABULARIES = {
+    "verbs": ["add", "schedule", "update"],
+    "keywords": ["new lead", "site visit", "mark as won", "follow up"],
+}
+
+
+class CountingEncoder:
+    """StubEncoder that records every batch it is asked to encode."""
+
+    def __init__(self):
+        self.encoder = StubEncoder()
+        self.calls = []
+
+    def __call__(self, tokens):
+        self.calls.append(list(tokens))
+        return self.encoder.encode(tokens, normalize_embeddings=True)
+
+
+@pytest.fixture
+def artifact_dir(tmp_path):
+    return str(tmp_path / "embeddings" / "intent")
+
+
+def test_unchanged_hash_loads_npy_without_encoding(artifact_dir):
+    first = CountingEncoder()
+    built = load_or_build(MODEL, VOCABULARIES, first, artifact_dir=artifact_dir)
+    assert len(first.calls) == len(VOCABULARIES)
+    assert read_manifest(artifact_dir)["hash"] == embedding_store.vocabulary_hash(MODEL, VOCABULARIES)
+
+    second = CountingEncoder()
+    loaded = load_or_build(MODEL, VOCABULARIES, second, artifact_dir=artifact_dir)
+    assert second.calls == []
+    for name, tokens in VOCABULARIES.items():
+        assert isinstance(loaded[name], np.memmap)
+        assert loaded[name].shape[0] == len(tokens)
+        np.testing.assert_array_equal(loaded[name], built[name])
+
+
+@pytest.mark.parametrize("model, vocabularies", [
+    ("other-encoder", VOCABULARIES),
+    (MODEL, {**VOCABULARIES, "verbs": VOCABULARIES["verbs"] + ["register"]}),
+    (MODEL, {**VOCABULARIES, "verbs": list(reversed(VOCABULARIES["verbs"]))}),
+    (MODEL, {**VOCABULARIES, "sources": ["instagram", "linkedin"]}),
+])
+def test_model_or_vocabulary_change_forces_rebuild(artifact_dir, model, vocabularies):
+    load_or_build(MODEL, VOCABULARIES, CountingEncoder(), artifact_dir=artifact_dir)
+
+    encoder = CountingEncoder()
+    rebuilt = load_or_build(model, vocabularies, encoder, artifact_dir=artifact_dir)
+    assert sorted(map(tuple, encoder.calls)) == sorted(tuple(t) for t in vocabularies.values())
+    assert read_manifest(artifact_dir)["hash"] == embedding_store.vocabulary_hash(model, vocabularies)
+    assert {name: arr.shape[0] for name, arr in rebuilt.items()} == {n: len(t) for n, t in vocabularies.items()}
+
+
+def test_edited_manifest_forces_rebuild(artifact_dir):
+    load_or_build(MODEL, VOCABULARIES, CountingEncoder(), artifact_dir=artifact_dir)
+    path = os.path.join(artifact_dir, MANIFEST_NAME)
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["hash"] = "0" * 64
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    encoder = CountingEncoder()
+    load_or_build(MODEL, VOCABULARIES, encoder, artifact_dir=artifact_dir)
+    assert len(encoder.calls) == len(VOCABULARIES)
+
+
+def test_failed_save_leaves_previous_artifact_in_place(artifact_dir, monkeypatch):
+    original = load_or_build(MODEL, VOCABULARIES, CountingEncoder(), artifact_dir=artifact_dir)
+    original = {name: np.array(arr) for name, arr in original.items()}
+
+    # crash after the first array of a rebuild has been written
+    real_save = np.save
+    written = []
+
+    def failing_save(path, arr):
+        if written:
+            raise OSError("disk full")
+        written.append(path)
+        real_save(path, arr)
+
+    monkeypatch.setattr(embedding_store.np, "save", failing_save)
+    changed = {**VOCABULARIES, "verbs": VOCABULARIES["verbs"] + ["register"]}
+    arrays = {name: CountingEncoder()(tokens) for name, tokens in changed.items()}
+    with pytest.raises(OSError):
+        save_embeddings(MODEL, changed, arrays, artifact_dir=artifact_dir)
+    monkeypatch.undo()
+
+    # the half-written build never replaced the live directory and was cleaned up
+    parent = os.path.dirname(artifact_dir)
+    assert os.listdir(parent) == [os.path.basename(artifact_dir)]
+    assert load_embeddings(MODEL, changed, artifact_dir) is None
+    loaded = load_embeddings(MODEL, VOCABULARIES, artifact_dir)
+    for name in VOCABULARIES:
+        np.testing.assert_array_equal(loaded[name], original[name])
+
+
+def test_half_written_directory_is_never_loaded(artifact_dir):
+    load_or_build(MODEL, VOCABULARIES, CountingEncoder(), artifact_dir=artifact_dir)
+
+    # arrays present but the manifest never made it
+    os.remove(os.path.join(artifact_dir, MANIFEST_NAME))
+    assert load_embeddings(MODEL, VOCABULARIES, artifact_dir) is None
+
+    # manifest present but an array is missing
+    load_or_build(MODEL, VOCABULARIES, CountingEncoder(), artifact_dir=artifact_dir)
+    os.remove(os.path.join(artifact_dir, "keywords.npy"))
+    assert load_embeddings(MODEL, VOCABULARIES, artifact_dir) is None
+
+    encoder = CountingEncoder()
+    load_or_build(MODEL, VOCABULARIES, encoder, artifact_dir=artifact_dir)
+    assert len(encoder.calls) == len(VOCABULARIES)
+    assert load_embeddings(MODEL, VOCABULARIES, artifact_dir) is not None
@@ -0,0 +1,119 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import encoder_backends
+from encoder_backends import BACKENDS, create_encoder
+from stub_models import STUB_DIM, StubEncoder
+
+TEXTS = [
+    "Add a new lead: Rohan Sharma from Gurgaon, phone 9876543210.",
+    "Schedule a visit for lead 7b1b8f54 at 3 pm tomorrow.",
+    "Mark lead 7b1b8f54 as won.",
+    "",
+    "!!!",
+]
+
+
+class FakeBackend:
+    """Records how create_encoder constructed it instead of loading weights."""
+
+    def __init__(self, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        self.meta = {"model": "fake-model"}
+
+
+def test_stub_backend_is_selected_without_weights():
+    encoder = create_encoder("any-model", "stub")
+    assert isinstance(encoder, StubEncoder)
+    assert encoder.get_sentence_embedding_dimension() == STUB_DIM
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown EMBED_BACKEND"):
+        create_encoder("any-model", "tensorrt")
+
+
+def test_sentence_transformers_backend_gets_the_model_name(monkeypatch):
+    monkeypatch.setattr(encoder_backends, "SentenceTransformerBackend", FakeBackend)
+    encoder = create_encoder("fake-model", "sentence-transformers")
+    assert isinstance(encoder, FakeBackend) and encoder.args == ("fake-model",)
+
+
+@pytest.mark.parametrize("backend, quantized", [("onnx", False), ("onnx-int8", True)])
+def test_onnx_backends_select_the_quantized_file(monkeypatch, tmp_path, backend, quantized):
+    monkeypatch.setattr(encoder_backends, "OnnxEncoderBackend", FakeBackend)
+    encoder = create_encoder("fake-model", backend, str(tmp_path))
+    assert encoder.args == (str(tmp_path),) and encoder.kwargs == {"quantized": quantized}
+
+
+def test_every_backend_name_is_handled(monkeypatch):
+    monkeypatch.setattr(encoder_backends, "SentenceTransformerBackend", FakeBackend)
+    monkeypatch.setattr(encoder_backends, "OnnxEncoderBackend", FakeBackend)
+    for backend in BACKENDS:
+        assert create_encoder("fake-model", backend) is not None
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_backend_without_export_names_the_missing_file(tmp_path, backend):
+    with pytest.raises(FileNotFoundError, match=encoder_backends.ONNX_FILES[backend]):
+        create_encoder("fake-model", backend, str(tmp_path))
+
+
+class FakeTokenizer:
+    """Pads every text to the longest one; a token per word."""
+
+    def __call__(self, texts, padding, truncation, max_length, return_tensors):
+        lengths = [max(len(t.split()), 1) for t in texts]
+        width = max(lengths)
+        mask = np.array([[1] * n + [0] * (width - n) for n in lengths], dtype=np.int64)
+        return {"input_ids": mask.copy(), "attention_mask": mask}
+
+
+class FakeSession:
+    """Token embedding = (position + 1) in every dimension, so the mean over real tokens is easy to check."""
+
+    dim = 4
+
+    def run(self, outputs, feeds):
+        batch, width = feeds["input_ids"].shape
+        tokens = np.arange(1, width + 1, dtype=np.float32)[None, :, None]
+        return [np.broadcast_to(tokens, (batch, width, self.dim)).copy()]
+
+
+def test_onnx_encode_mean_pools_real_tokens_and_normalizes(monkeypatch):
+    monkeypatch.setattr(encoder_backends, "ONNX_BATCH_SIZE", 2)
+    encoder = object.__new__(encoder_backends.OnnxEncoderBackend)
+    encoder.meta, encoder.max_seq_length = {"dim": FakeSession.dim}, 16
+    encoder.session, encoder.tokenizer = FakeSession(), FakeTokenizer()
+    encoder.input_names = {"input_ids", "attention_mask"}
+
+    texts = ["one", "one two three", "one two", "a b c d e"]
+    raw = encoder.encode(texts, normalize_embeddings=False)
+    # padding positions are excluded: the mean of 1..n is (n + 1) / 2, whatever the batch width
+    np.testing.assert_allclose(raw[:, 0], [1.0, 2.0, 1.5, 3.0])
+    assert raw.shape == (len(texts), FakeSession.dim) and raw.dtype == np.float32
+
+    embs = encoder.encode(texts)
+    np.testing.assert_allclose(np.linalg.norm(embs, axis=1), 1.0, rtol=1e-6)
+    assert encoder.encode([]).shape == (0, FakeSession.dim)
+
+
+def test_stub_encoder_shape_and_normalization():
+    encoder = StubEncoder()
+    embs = encoder.encode(TEXTS, normalize_embeddings=True)
+    assert embs.shape == (len(TEXTS), STUB_DIM) and embs.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(embs, axis=1), 1.0, rtol=1e-6)
+
+    # deterministic, per-row independent of the batch, and unnormalized rows are raw word counts
+    np.testing.assert_array_equal(encoder.encode(TEXTS[::-1]), embs[::-1])
+    np.testing.assert_array_equal(encoder.encode(TEXTS[1:2]), embs[1:2])
+    raw = encoder.encode(TEXTS, normalize_embeddings=False)
+    np.testing.assert_allclose(raw / np.linalg.norm(raw, axis=1, keepdims=True), embs, rtol=1e-6)
+    assert raw[2].sum() == 5  # mark, lead, 7b1b8f54, as, won
+
+    assert encoder.encode([]).shape == (0, STUB_DIM)
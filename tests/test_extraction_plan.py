@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main_bot
+from extract_entities_tools import EXTRACTORS, FIELD_STAGES, MODEL_STAGES, plan_extractors
+from main_bot import process_request
+from validators.validate_output import REQUIRED_FIELDS, OPTIONAL_FIELDS
+
+
+@pytest.mark.parametrize("intent", sorted(REQUIRED_FIELDS))
+def test_plan_covers_required_and_optional_fields_only(intent):
+    fields = REQUIRED_FIELDS[intent] + OPTIONAL_FIELDS.get(intent, [])
+    plan = plan_extractors(intent)
+    assert len(plan) == len(set(plan))
+    assert set(plan) == {FIELD_STAGES[f] for f in fields}
+    # stages keep the EXTRACTORS order so outputs assemble the same way
+    assert plan == [stage for stage in EXTRACTORS if stage in plan]
+
+
+@pytest.mark.parametrize("intent", [None, "UNKNOWN"])
+def test_unknown_intent_gets_the_full_plan(intent):
+    assert plan_extractors(intent) == list(EXTRACTORS)
+
+
+def test_async_path_gates_model_stages_on_the_plan():
+    data = {"transcript": "Mark lead 7b1b8f54 as won.", "metadata": {"debug": True}}
+    main_bot.response_cache.clear()
+    result = asyncio.run(main_bot.process_request_async(data))
+    plan = result["debug"]["extraction_plan"]
+    ran = {stage for stage in result["debug"]["stages_ms"] if stage in EXTRACTORS}
+    # rule stages overlap intent scoring; model stages outside the plan never start
+    assert {s for s in ran if s in MODEL_STAGES} == {s for s in plan if s in MODEL_STAGES}
+    assert set(plan) <= ran
+
+    main_bot.response_cache.clear()
+    expected = process_request({"transcript": data["transcript"], "metadata": {}}, dispatch=False)
+    actual = asyncio.run(main_bot.process_request_async({"transcript": data["transcript"], "metadata": {}}))
+    assert actual == expected  # outputs outside the plan are discarded
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from inference_scheduler import InferenceScheduler, SchedulerOverloaded
+
+
+def test_requests_inside_the_window_are_batched_and_split_at_max_size():
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    sched = InferenceScheduler(batch_fn, window_ms=200, max_batch_size=4, workers=1)
+    futures = [sched.submit(i) for i in range(6)]  # queued before the worker starts
+    sched.start()
+    try:
+        assert [f.result(timeout=5) for f in futures] == [i * 10 for i in range(6)]
+    finally:
+        sched.stop()
+    assert batches == [[0, 1, 2, 3], [4, 5]]
+    assert sched.stats()["batch_size_distribution"] == {2: 1, 4: 1}
+
+
+def test_full_queue_raises_overloaded():
+    sched = InferenceScheduler(lambda items: items, max_queue=2)
+    sched.submit(1)
+    sched.submit(2)
+    with pytest.raises(SchedulerOverloaded):
+        sched.submit(3)
+    assert sched.stats()["rejected"] == 1
+
+
+def test_raising_batch_fn_fails_every_future_in_the_batch():
+    def batch_fn(items):
+        raise ValueError("model crashed")
+
+    sched = InferenceScheduler(batch_fn, window_ms=200, max_batch_size=8)
+    futures = [sched.submit(i) for i in range(3)]
+    sched.start()
+    try:
+        for f in futures:
+            with pytest.raises(ValueError, match="model crashed"):
+                f.result(timeout=5)
+    finally:
+        sched.stop()
+    assert sched.stats()["failed_batches"] == 1
+
+
+def test_stop_fails_pending_futures_and_stops_every_worker():
+    started, release = threading.Event(), threading.Event()
+
+    def batch_fn(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    sched = InferenceScheduler(batch_fn, window_ms=0, max_batch_size=1, max_queue=2, workers=1)
+    sched.start()
+    running = sched.submit("a")
+    assert started.wait(5)
+    queued = [sched.submit("b"), sched.submit("c")]  # the queue is now full
+
+    sched.stop(timeout=0.2)
+    for f in queued:
+        with pytest.raises(SchedulerOverloaded):
+            f.result(timeout=1)
+    release.set()
+    assert running.result(timeout=5) == "a"
+
+    # idle workers notice stop() on their own, without sentinels
+    idle = InferenceScheduler(lambda items: items, workers=3)
+    idle.start()
+    threads = list(idle._threads)
+    start = time.perf_counter()
+    idle.stop(timeout=2)
+    assert not any(t.is_alive() for t in threads) and time.perf_counter() - start < 1.0
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from keyword_automaton import KeywordAutomaton
+
+
+def test_whole_word_hits_with_spans_and_labels():
+    automaton = KeywordAutomaton([("fb", "Facebook"), ("walk in", "Walk-in"), ("in", "IN"), ("linkedin.com", "LinkedIn")]).build()
+    text = "FB lead, offbeat fbi, walk in from linkedin.com"
+    hits = automaton.find_all(text)
+    assert [(h.keyword, h.label) for h in hits] == [
+        ("FB", "Facebook"),
+        ("walk in", "Walk-in"),
+        ("in", "IN"),
+        ("linkedin.com", "LinkedIn"),
+    ]
+    for h in hits:
+        assert text[h.start:h.end] == h.keyword
+
+
+def test_overlapping_keywords_and_shared_labels():
+    automaton = KeywordAutomaton([("details", "ADDING"), ("details", "UPDATING"), ("set up", "SCHEDULING"), ("up", "X")]).build()
+    assert automaton.labels("set up the details") == ["SCHEDULING", "X", "ADDING", "UPDATING"]
+    assert automaton.find_all("") == []
+    assert automaton.find_all("setup detailsx") == []
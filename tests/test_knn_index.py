@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from knn_index import FusedIntentIndex
+
+NearestNeighbors = pytest.importorskip("sklearn.neighbors").NearestNeighbors
+
+INTENTS = ["ADDING", "SCHEDULING", "UPDATING"]
+K = 4
+
+
+def _normalized(rng, n, dim=64):
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _sklearn_scores(query, nn, labels):
+    # The aggregation score_intents_avg used on top of sklearn's cosine kNN
+    dists, idxs = nn.kneighbors(query, n_neighbors=K, return_distance=True)
+    sims = np.clip(1.0 - dists[0], 0.0, None)
+    agg = {intent: 0.0 for intent in INTENTS}
+    for sim, idx in zip(sims, idxs[0]):
+        agg[labels[idx]] += float(sim)
+    total = sum(agg.values())
+    return {intent: float(score / total) for intent, score in agg.items()}
+
+
+def test_fused_index_matches_sklearn_bit_for_bit():
+    rng = np.random.default_rng(7)
+    verb_embs, kw_embs = _normalized(rng, 28), _normalized(rng, 54)
+    verb_labels = [INTENTS[i % 3] for i in range(28)]
+    kw_labels = [INTENTS[(i * 5) % 3] for i in range(54)]
+
+    nn_verbs = NearestNeighbors(n_neighbors=K, metric="cosine").fit(verb_embs)
+    nn_keywords = NearestNeighbors(n_neighbors=K, metric="cosine").fit(kw_embs)
+    index = (
+        FusedIntentIndex(INTENTS, K)
+        .add("verbs", [f"v{i}" for i in range(28)], verb_labels, verb_embs)
+        .add("keywords", [f"k{i}" for i in range(54)], kw_labels, kw_embs)
+        .build()
+    )
+
+    for i in range(200):
+        query = _normalized(rng, 1)
+        if i % 2:
+            # queries close to a reference vector
+            query = verb_embs[i % 28][None, :] + 0.2 * query
+        scores = index.score(query)
+        assert scores["verbs"][0] == _sklearn_scores(query, nn_verbs, verb_labels)
+        assert scores["keywords"][0] == _sklearn_scores(query, nn_keywords, kw_labels)
+
+
+def test_fused_index_batch_query():
+    rng = np.random.default_rng(3)
+    embs = _normalized(rng, 30)
+    labels = [INTENTS[i % 3] for i in range(30)]
+    index = FusedIntentIndex(INTENTS, K).add("verbs", [str(i) for i in range(30)], labels, embs).build()
+
+    queries = _normalized(rng, 16)
+    batch = index.score(queries)["verbs"]
+    assert len(batch) == 16
+    for row, query in zip(batch, queries):
+        single = index.score(query[None, :])["verbs"][0]
+        assert set(row) == set(INTENTS)
+        assert sum(row.values()) == pytest.approx(1.0)
+        for intent in INTENTS:
+            assert row[intent] == pytest.approx(single[intent], abs=1e-6)
+
+
+def test_shared_index_scores_identically_and_is_read_only():
+    rng = np.random.default_rng(11)
+    embs = _normalized(rng, 40)
+    labels = [INTENTS[i % 3] for i in range(40)]
+    queries = _normalized(rng, 5)
+
+    index = FusedIntentIndex(INTENTS, K).add("verbs", [f"v{i}" for i in range(40)], labels, embs).build()
+    before = index.score(queries)
+    index.share()
+
+    assert index.score(queries) == before
+    assert not index.matrix.flags.writeable
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from loadtest import find_saturation
+
+
+def _step(target, rps, error_rate=0.0, p95=10.0):
+    return {"target": target, "rps": rps, "error_rate": error_rate, "latency_ms": {"p95": p95}}
+
+
+def test_closed_loop_saturates_when_throughput_stops_growing():
+    steps = [_step(1, 100), _step(4, 350), _step(16, 370), _step(64, 360)]
+    sat = find_saturation(steps, "concurrency", max_error_rate=0.01, slo_ms=None)
+    assert sat["saturated"] and sat["at"] == 16
+    assert sat["max_sustained_rps"] == 350
+
+
+def test_open_loop_saturates_on_missed_rate_errors_or_slo():
+    steps = [_step(50, 50), _step(100, 99), _step(200, 150)]
+    assert find_saturation(steps, "rate", 0.01, None)["at"] == 200
+    steps = [_step(50, 50), _step(100, 100, error_rate=0.05)]
+    assert find_saturation(steps, "rate", 0.01, None)["at"] == 100
+    steps = [_step(50, 50, p95=20.0), _step(100, 100, p95=400.0)]
+    assert find_saturation(steps, "rate", 0.01, slo_ms=250.0)["at"] == 100
+    assert not find_saturation(steps, "rate", 0.01, None)["saturated"]
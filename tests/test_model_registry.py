@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import model_registry
+from model_registry import ModelRegistry
+
+
+def test_lazy_registry_is_ready_without_preload_or_warmup():
+    reg = ModelRegistry(lazy=True)
+    reg.register("encoder", lambda: "model")
+    assert reg.is_ready() and not reg.warmed
+    assert reg.get("encoder") == "model" and reg.is_ready()
+
+    eager = ModelRegistry()
+    eager.register("encoder", lambda: "model")
+    eager.get("encoder")
+    assert not eager.is_ready()  # preload mode also waits for the warmup pass
+
+
+def test_failed_load_is_retried_on_use_after_backoff(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(model_registry.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(model_registry, "MODEL_RETRY_BACKOFF_S", 10.0)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("download failed")
+        return "model"
+
+    reg = ModelRegistry(lazy=True)
+    reg.register("ner", flaky)
+    assert reg.get("ner") is None and not reg.is_ready()
+    assert reg.get("ner") is None and len(attempts) == 1  # within the backoff: no new attempt
+
+    now[0] += 10.0
+    assert reg.is_ready()  # the retry is due on the next use
+    assert reg.get("ner") is None and len(attempts) == 2
+
+    now[0] += 10.0
+    assert reg.get("ner") is None and len(attempts) == 2  # backoff doubled to 20s
+    now[0] += 10.0
+    assert reg.get("ner") == "model" and reg.report()["models"]["ner"]["failures"] == 0
+
+
+def test_preload_retries_until_load_and_warmup_succeed(monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_RETRY_BACKOFF_S", 10.0)
+    attempts, warmups, sleeps = [], [], []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise OSError("download failed")
+        return "model"
+
+    def warmup():
+        warmups.append(1)
+        if len(warmups) < 2:
+            raise RuntimeError("warmup failed")
+
+    reg = ModelRegistry()
+    reg.register("encoder", flaky)
+    assert not reg.preload(warmup, max_attempts=1, sleep=sleeps.append) and not reg.is_ready()
+
+    # startup failed; the preload keeps retrying with backoff until both steps succeed
+    assert reg.preload(warmup, sleep=sleeps.append)
+    assert reg.is_ready() and len(attempts) == 2 and len(warmups) == 2
+    assert sleeps == [10.0]
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+torch = pytest.importorskip("torch")
+
+import pipeline_optim
+from pipeline_optim import OptimizedPipeline, configure_torch_threads, optimize_pipeline
+
+
+@pytest.fixture
+def fresh_threads(monkeypatch):
+    """Each test configures torch threads from scratch; the process-wide setting is restored after."""
+    before = torch.get_num_threads()
+    monkeypatch.setattr(pipeline_optim, "_threads_configured", False)
+    monkeypatch.setattr(pipeline_optim, "TORCH_INTER_OP_THREADS", 0)  # settable only once per process
+    yield
+    torch.set_num_threads(before)
+
+
+class FakePipeline:
+    """Stands in for a transformers pipeline: a model attribute and a call that reports the grad mode."""
+
+    def __init__(self):
+        self.model = torch.nn.Sequential(torch.nn.Linear(8, 8), torch.nn.ReLU(), torch.nn.Linear(8, 2))
+        self.task = "fake"
+
+    def __call__(self, texts):
+        return {"inference_mode": torch.is_inference_mode_enabled(), "texts": texts}
+
+
+def test_configured_threads_are_not_overridden_without_force(fresh_threads, monkeypatch):
+    monkeypatch.setattr(pipeline_optim, "TORCH_INTRA_OP_THREADS", 2)
+    assert configure_torch_threads()["intra_op"] == 2
+
+    # a later call (e.g. from another pipeline loader) only reports the settings
+    assert configure_torch_threads(intra=3)["intra_op"] == 2
+    assert torch.get_num_threads() == 2
+
+    assert configure_torch_threads(intra=3, force=True)["intra_op"] == 3
+
+
+def test_unset_thread_env_keeps_torchs_choice(fresh_threads, monkeypatch):
+    monkeypatch.setattr(pipeline_optim, "TORCH_INTRA_OP_THREADS", 0)
+    before = torch.get_num_threads()
+    assert configure_torch_threads()["intra_op"] == before
+
+
+def test_inference_mode_wraps_pipeline_calls():
+    assert OptimizedPipeline(FakePipeline(), inference_mode=True)(["x"])["inference_mode"] is True
+    assert OptimizedPipeline(FakePipeline(), inference_mode=False)(["x"])["inference_mode"] is False
+    # everything else is forwarded to the wrapped pipeline
+    assert OptimizedPipeline(FakePipeline()).task == "fake"
+
+
+def test_int8_quantizes_linear_layers(fresh_threads):
+    pipe = optimize_pipeline(FakePipeline(), quantize="int8")
+    assert pipe.quantization == "int8"
+    linears = [m for m in pipe.model.modules() if type(m).__name__ == "Linear"]
+    assert linears and all(type(m) is not torch.nn.Linear for m in linears)
+
+    x = torch.randn(3, 8)
+    assert pipe.model(x).shape == (3, 2)
+
+
+def test_no_quantization_keeps_fp32_model(fresh_threads):
+    fake = FakePipeline()
+    model = fake.model
+    pipe = optimize_pipeline(fake, quantize="none")
+    assert pipe.quantization == "none" and pipe.model is model
+
+
+def test_unknown_quantization_is_rejected(fresh_threads):
+    with pytest.raises(ValueError, match="Unknown NLP_QUANTIZE"):
+        optimize_pipeline(FakePipeline(), quantize="fp8")
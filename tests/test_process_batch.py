@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main_bot
+from main_bot import process_batch, process_request
+from stub_models import STUB_MODELS
+from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+
+# Real models can differ in the last float bits between batch sizes (padding),
+# which may flip a near-tie; the stub models are exact
+pytestmark = pytest.mark.skipif(not STUB_MODELS, reason="needs BOT_STUB_MODELS=1")
+
+
+def _items(transcripts):
+    return [{"transcript": t, "metadata": {"user_id": f"batch-{i}", "debug": True}} for i, t in enumerate(transcripts)]
+
+
+def _without_timings(result):
+    # stage timings differ run to run, and relative dates ("tomorrow") resolve against the clock
+    if "debug" in result:
+        result = {**result, "debug": {k: v for k, v in result["debug"].items() if k != "stages_ms"}}
+    visit_time = (result.get("entities") or {}).get("visit_time")
+    if visit_time:
+        result = {**result, "entities": {**result["entities"], "visit_time": visit_time[:16]}}
+    return result
+
+
+def _one_by_one(items):
+    out = []
+    for item in items:
+        main_bot.response_cache.clear()
+        out.append(process_request(item, dispatch=False))
+    return out
+
+
+def test_batch_matches_per_item_results_in_order():
+    items = _items(SAMPLE_TRANSCRIPTS)
+    expected = _one_by_one(items)
+
+    main_bot.response_cache.clear()
+    actual = process_batch(items, dispatch=False)
+    assert [_without_timings(r) for r in actual] == [_without_timings(r) for r in expected]
+
+    # a reordered batch returns the same results, reordered
+    main_bot.response_cache.clear()
+    reordered = process_batch(items[::-1], dispatch=False)
+    assert [_without_timings(r) for r in reordered] == [_without_timings(r) for r in expected[::-1]]
+
+
+@pytest.mark.parametrize("bad", [None, {"metadata": {}}, {"transcript": ""}, {"transcript": 42}])
+def test_invalid_item_does_not_fail_its_neighbours(bad):
+    items = _items(SAMPLE_TRANSCRIPTS[:4])
+    items.insert(2, bad)
+    main_bot.response_cache.clear()
+    results = process_batch(items, dispatch=False)
+
+    assert len(results) == len(items)
+    assert results[2]["intent"] == "UNKNOWN"
+    assert results[2]["error"]["type"] == "VALIDATION_ERROR"
+
+    neighbours = items[:2] + items[3:]
+    expected = _one_by_one(neighbours)
+    assert [_without_timings(r) for r in results[:2] + results[3:]] == [_without_timings(r) for r in expected]
+
+
+def test_item_failing_after_inference_only_fails_itself(monkeypatch):
+    items = _items(SAMPLE_TRANSCRIPTS[:5])
+    expected = _one_by_one(items)
+
+    bad_text = items[2]["transcript"]
+    real_build = main_bot._build_result
+
+    def build(intent_scores, entities, metadata, *args):
+        if metadata.get("user_id") == "batch-2":
+            raise ValueError(f"cannot build result for {bad_text!r}")
+        return real_build(intent_scores, entities, metadata, *args)
+
+    monkeypatch.setattr(main_bot, "_build_result", build)
+    main_bot.response_cache.clear()
+    results = process_batch(items, dispatch=False)
+
+    assert results[2]["error"]["type"] == "PARSING_ERROR"
+    assert [_without_timings(r) for i, r in enumerate(results) if i != 2] == \
+        [_without_timings(r) for i, r in enumerate(expected) if i != 2]
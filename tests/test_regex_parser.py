@@ -0,0 +1,52 @@
+import os
+import re
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from syntheticData.regex_parser import INTENT_REGEX, regex_score, regex_score_many
+from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+
+EXTRA_TEXTS = [
+    "",
+    "no numbers or dates here",
+    "Meet on Monday at 5, or Sunday 10:30 am",
+    "Call +91 98765-43210 or (080) 2345 6789, mail a.b@example.com",
+    "Visit on 12th March, 2026-01-02 or 12/3/26 at 3 o'clock",
+    "ſunday and İstanbul on may 4",
+    "lead 7b1b8f54 +1",
+]
+
+
+def _reference_score(text, per_match_score=0.5, max_per_intent=None, count_overlapping=False):
+    # Straightforward per-pattern scan: every pattern over the whole text
+    increments, meta = {}, []
+    for intent, patterns in INTENT_REGEX.items():
+        total = 0.0
+        for pattern in patterns:
+            if count_overlapping:
+                cre = re.compile(r"(?=(" + pattern + r"))", flags=re.IGNORECASE)
+                found = [m.group(1) for m in cre.finditer(text)]
+            else:
+                found = [m.group(0) for m in re.finditer(pattern, text, flags=re.IGNORECASE)]
+            for m in found:
+                total += per_match_score
+                meta.append((intent, pattern, m))
+        if max_per_intent is not None and total > max_per_intent:
+            total = float(max_per_intent)
+        increments[intent] = float(total)
+    total_inc = sum(increments.values())
+    if total_inc <= 0:
+        return {intent: 0.0 for intent in increments}, meta
+    return {intent: float(v / total_inc) for intent, v in increments.items()}, meta
+
+
+def test_regex_score_matches_full_scan():
+    for text in SAMPLE_TRANSCRIPTS + EXTRA_TEXTS:
+        for kwargs in ({}, {"max_per_intent": 2.0}, {"count_overlapping": True}):
+            assert regex_score(text, **kwargs) == _reference_score(text, **kwargs), (text, kwargs)
+
+
+def test_regex_score_many():
+    texts = SAMPLE_TRANSCRIPTS + EXTRA_TEXTS
+    assert regex_score_many(texts, max_per_intent=2.0) == [regex_score(t, max_per_intent=2.0) for t in texts]
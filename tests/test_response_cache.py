@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from response_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def test_ttl_lru_and_normalized_keys():
+    clock = FakeClock()
+    cache = ResponseCache(maxsize=2, ttl_s=10, time_bucket_s=60, clock=clock, wall_clock=clock)
+    cache.put("Mark lead 7b1b8f54 as won.", "won")
+    assert cache.get("  Mark lead   7b1b8f54 as won. ") == "won"
+
+    cache.put("b", "B")
+    cache.put("c", "C")  # evicts the least recently used entry
+    assert cache.get("Mark lead 7b1b8f54 as won.") is None
+    assert cache.get("b") == "B"
+
+    clock.t = 11
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (2, 2, 1, 1)
+
+
+def test_time_dependent_entries_only_live_within_their_bucket():
+    clock = FakeClock(100.0)
+    cache = ResponseCache(maxsize=8, ttl_s=1000, time_bucket_s=60, clock=clock, wall_clock=clock)
+    cache.put("visit tomorrow at 3 pm", "tomorrow 15:00", time_dependent=True)
+    assert cache.get("visit tomorrow at 3 pm") == "tomorrow 15:00"
+    clock.t = 121.0  # next bucket
+    assert cache.get("visit tomorrow at 3 pm") is None
+
+
+def test_disabled_cache():
+    cache = ResponseCache(maxsize=0, ttl_s=10, time_bucket_s=60)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["enabled"] is False
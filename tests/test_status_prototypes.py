@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main_bot
+import status_prototypes
+from main_bot import process_request
+
+TRANSCRIPTS = [
+    "Mark lead 7b1b8f54 as won. Notes: booked unit A2.",
+    "Change status of lead 7b1b8f54 to lost.",
+    "Update lead 7b1b8f54 to in progress.",
+    "Modify lead 8c1d to follow up tomorrow.",
+]
+
+
+def test_prototype_results_carry_label_and_margin():
+    results = status_prototypes.classify_status_batch(TRANSCRIPTS)
+    assert len(results) == len(TRANSCRIPTS)
+    for text, res in zip(TRANSCRIPTS, results):
+        assert res["label"] in status_prototypes.STATUS_LABELS
+        assert set(res["scores"]) == set(status_prototypes.STATUS_LABELS)
+        ranked = sorted(res["scores"].values(), reverse=True)
+        assert res["label"] == max(res["scores"], key=res["scores"].get)
+        assert res["confidence"] == pytest.approx(ranked[0])
+        assert res["margin"] == pytest.approx(ranked[0] - ranked[1])
+        assert res["margin"] >= 0.0
+        assert res["method"] == "prototype"
+        # the single-text entry point agrees with the batch
+        assert status_prototypes.classify_status(text) == res
+
+
+def test_low_margin_switches_to_zero_shot_when_fallback_enabled(monkeypatch):
+    text = TRANSCRIPTS[0]
+    prototype = status_prototypes.classify_status(text)
+
+    # fallback off: low margin alone does not change the method
+    monkeypatch.setattr(status_prototypes, "STATUS_MIN_MARGIN", 2.0)
+    assert status_prototypes.classify_status(text)["method"] == "prototype"
+
+    monkeypatch.setattr(status_prototypes, "STATUS_BART_FALLBACK", True)
+    res = status_prototypes.classify_status(text)
+    assert res["method"] == "zero-shot"
+    assert res["label"] in status_prototypes.STATUS_LABELS
+    assert res["prototype"] == {k: prototype[k] for k in ("label", "confidence", "margin")}
+
+    # fallback on but margin above the threshold: prototype result stands
+    monkeypatch.setattr(status_prototypes, "STATUS_MIN_MARGIN", -1.0)
+    assert status_prototypes.classify_status(text)["method"] == "prototype"
+
+
+def test_debug_reports_status_classification():
+    data = {"transcript": TRANSCRIPTS[0], "metadata": {"debug": True}}
+    main_bot.response_cache.clear()
+    fresh = process_request(data, dispatch=False)
+    status = fresh["debug"]["status"]
+    assert status["label"] == fresh["entities"]["status"]
+    assert status["method"] in ("prototype", "zero-shot") and status["margin"] is not None
+
+    # cached, batched and async responses carry the same detail
+    assert process_request(data, dispatch=False)["debug"]["status"] == status
+    main_bot.response_cache.clear()
+    assert main_bot.process_batch([data], dispatch=False)[0]["debug"]["status"] == status
+    main_bot.response_cache.clear()
+    assert asyncio.run(main_bot.process_request_async(data))["debug"]["status"] == status
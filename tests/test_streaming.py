@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from streaming import stable_prefix, StreamSession
+import app
+import main_bot
+
+TRANSCRIPT = "Add a new lead: Rohan Sharma from Gurgaon, phone 9876543210, source Instagram."
+
+
+def test_stable_prefix_drops_the_word_still_being_recognized():
+    assert stable_prefix("add a new le") == "add a new"
+    assert stable_prefix("add a new lead ") == "add a new lead"
+    assert stable_prefix("add a new lead.") == "add a new lead."
+    assert stable_prefix("add") == ""
+    assert stable_prefix("add  a new le", final=True) == "add a new le"
+
+
+def test_streamed_final_matches_process_request():
+    session = StreamSession({"user_id": "stream-test"})
+    events = []
+    words = TRANSCRIPT.split()
+    for n in range(1, len(words) + 1):
+        # one growing partial per word, with the last word half-recognized
+        events += session.feed(" ".join(words[:n - 1] + [words[n - 1][:3]]))
+    events += session.feed(TRANSCRIPT)
+    final = session.finish(TRANSCRIPT)
+
+    assert events and all(e["event"] in ("interim", "intent_committed") for e in events)
+    assert sum(e["event"] == "intent_committed" for e in events) <= 1
+    assert final["committed_intent"] in (None, final["result"]["intent"], *(e["intent"] for e in events))
+
+    main_bot.response_cache.clear()
+    expected = main_bot.process_request({"transcript": TRANSCRIPT, "metadata": {"user_id": "stream-test"}})
+    assert final["result"] == expected
+
+
+def test_binary_frame_ends_the_stream_with_an_error():
+    with TestClient(app.app).websocket_connect("/bot/stream") as ws:
+        ws.send_bytes(b"\x00\x01")
+        event = ws.receive_json()
+        assert event["event"] == "error" and event["error"]["type"] == "VALIDATION_ERROR"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+        assert closed.value.code == 1003
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from telemetry import MetricsRegistry, traced, stage, record, server_timing, STAGE_SECONDS
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = MetricsRegistry()
+    h = reg.histogram("t_seconds", "test", ("stage",), buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.5):
+        h.observe(value, "ner")
+    text = reg.render()
+    assert 't_seconds_bucket{stage="ner",le="0.01"} 1' in text
+    assert 't_seconds_bucket{stage="ner",le="0.1"} 2' in text
+    assert 't_seconds_bucket{stage="ner",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="ner"} 3' in text
+
+
+def test_counter_and_collector_render():
+    reg = MetricsRegistry()
+    c = reg.counter("t_total", "test", ("intent",))
+    c.inc("UNKNOWN")
+    c.inc("UNKNOWN")
+    reg.register_collector(lambda: [("t_queue_depth", "gauge", "test", [({}, 4)])])
+    text = reg.render()
+    assert "# TYPE t_total counter" in text
+    assert 't_total{intent="UNKNOWN"} 2' in text
+    assert "t_queue_depth 4" in text
+
+
+def test_trace_collects_stages_and_nested_traces_share_it():
+    before = STAGE_SECONDS.count("t_stage")
+    with traced() as outer:
+        with stage("t_stage"):
+            pass
+        with traced() as inner:
+            record("t_stage", 0.002)
+    assert inner is outer
+    assert set(outer) == {"t_stage"} and outer["t_stage"] >= 2.0
+    assert STAGE_SECONDS.count("t_stage") == before + 2
+    assert server_timing({"ner": 1.234}) == "ner;dur=1.23"
+
+
+def test_metrics_disabled_skips_stage_and_request_latency(monkeypatch):
+    import telemetry
+    from telemetry import REQUEST_SECONDS, observe_request
+
+    observe_request(0.01, "sync")
+    stages, requests = STAGE_SECONDS.count("off-stage"), REQUEST_SECONDS.count("sync")
+    assert requests >= 1
+
+    monkeypatch.setattr(telemetry, "METRICS_ENABLED", False)
+    record("off-stage", 0.01)
+    observe_request(0.01, "sync")
+    assert STAGE_SECONDS.count("off-stage") == stages
+    assert REQUEST_SECONDS.count("sync") == requests
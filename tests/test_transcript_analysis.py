@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from extract_entities_tools import EXTRACTORS, extract_status
+from syntheticData.sample_transcripts import SAMPLE_TRANSCRIPTS
+from transcript_analysis import analyze
+
+EXTRA_TRANSCRIPTS = [
+    "Add lead Kavya Rao, email kavya.rao@example.com, phone +91 98765 43210, from Chennai.",
+    "Call 080-2345-6789 or 9988776655 about lead 4f2c, visit on 2025-11-02 at 11:30.",
+    "Lead a1b2c3d4 reached out via website form; mail ops@crm.example.in",
+    "",
+    "   ",
+]
+
+EXTRACTOR_FNS = dict(EXTRACTORS, status_label=extract_status)
+
+
+def _comparable(name, value):
+    # relative dates ("tomorrow") resolve against the clock, which moves between the two calls
+    if name == "visit_time" and isinstance(value, str):
+        return value[:16]
+    return value
+
+
+@pytest.mark.parametrize("text", SAMPLE_TRANSCRIPTS + EXTRA_TRANSCRIPTS)
+@pytest.mark.parametrize("name", sorted(EXTRACTOR_FNS))
+def test_extractor_gives_same_result_for_str_and_analysis(name, text):
+    fn = EXTRACTOR_FNS[name]
+    assert _comparable(name, fn(analyze(text))) == _comparable(name, fn(text))
+
+
+def test_analysis_is_reusable_across_extractors():
+    text = EXTRA_TRANSCRIPTS[0]
+    analysis = analyze(text)
+    first = {name: fn(analysis) for name, fn in EXTRACTOR_FNS.items()}
+    # extractors only read the shared analysis, so running them again changes nothing
+    assert {name: fn(analysis) for name, fn in EXTRACTOR_FNS.items()} == first
+    assert analysis.text == text
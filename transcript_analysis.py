@@ -0,0 +1,80 @@
+# transcript_analysis.py
+"""
+Single-pass analysis of a transcript, shared by every entity extractor.
+
+The phone matcher, the email scan, lowercasing, tokenization and phone masking
+run once per request here; extractors read the results instead of re-scanning
+(and each re-masking) the raw string.
+"""
+
+import re
+from typing import List, NamedTuple, Union
+
+import phonenumbers
+
+PHONE_REGION = "IN"
+
+EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+TOKEN_RE = re.compile(r"\w+")
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    value: str  # E.164 number for phones, matched text otherwise
+
+
+def find_phones(text: str, region: str = PHONE_REGION) -> List[Span]:
+    """Phone numbers found by phonenumbers, in order, formatted as E.164."""
+    spans = []
+    try:
+        for match in phonenumbers.PhoneNumberMatcher(text, region):
+            e164 = phonenumbers.format_number(match.number, phonenumbers.PhoneNumberFormat.E164)
+            spans.append(Span(match.start, match.end, e164))
+    except Exception:
+        # phonenumbers failing on odd input just means no phone spans
+        pass
+    return spans
+
+
+def _remove_spans(text: str, spans: List[Span]) -> str:
+    pieces, pos = [], 0
+    for span in spans:
+        pieces.append(text[pos:span.start])
+        pos = span.end
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+class TranscriptAnalysis:
+    """
+    text          original transcript
+    lower         text.lower()
+    phones        phone Spans (start, end, E.164) over text
+    emails        email Spans over text
+    tokens        (start, end, lowercased token) for every \\w+ run in text
+    masked        text with the phone spans removed (numbers no longer look like times, dates or IDs)
+    masked_lower  masked.lower()
+    """
+
+    __slots__ = ("text", "lower", "phones", "emails", "tokens", "masked", "masked_lower")
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        self.lower = self.text.lower()
+        self.phones = find_phones(self.text) if self.text else []
+        self.emails = [Span(m.start(), m.end(), m.group(0)) for m in EMAIL_RE.finditer(self.text)]
+        self.tokens = [(m.start(), m.end(), self.lower[m.start():m.end()]) for m in TOKEN_RE.finditer(self.text)]
+        self.masked = _remove_spans(self.text, self.phones)
+        self.masked_lower = self.masked.lower()
+
+    def in_phone(self, start: int, end: int) -> bool:
+        """True if [start, end) overlaps a phone span."""
+        return any(start < span.end and span.start < end for span in self.phones)
+
+
+def analyze(text: Union[str, TranscriptAnalysis, None]) -> TranscriptAnalysis:
+    """Analysis for text; an existing TranscriptAnalysis is returned as is."""
+    if isinstance(text, TranscriptAnalysis):
+        return text
+    return TranscriptAnalysis(text)
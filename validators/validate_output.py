@@ -17,6 +17,14 @@ REQUIRED_FIELDS = {
     "LEAD_UPDATE": ["lead_id", "status"],
 }
 
+# Entity fields worth extracting for each intent even though validation does not require them.
+# Anything outside REQUIRED_FIELDS + OPTIONAL_FIELDS is skipped by the extraction planner.
+OPTIONAL_FIELDS = {
+    "LEAD_CREATE": ["email", "source"],
+    "VISIT_SCHEDULE": ["name", "city"],
+    "LEAD_UPDATE": ["visit_time"],
+}
+
 def validate_intent_output(output: Dict[str, Any]) -> Dict[str, Any]:
     
     intent = output.get("intent", "UNKNOWN")